@@ -0,0 +1,275 @@
+"""
+Lambda Adapter Module for Text-to-SQL Chatbot
+Translates API Gateway proxy events (REST API and HTTP API v2 payloads) to
+WSGI requests and WSGI responses back to proxy results, compressing bodies
+according to Accept-Encoding
+"""
+
+import io
+import os
+import sys
+import gzip
+import base64
+from urllib.parse import unquote, urlencode
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESS_MIN_BYTES', '1024'))
+
+# gzip level; 6 is zlib's default balance of speed and size
+GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', '6'))
+
+# Brotli quality; low qualities compress about as fast as gzip but smaller
+BROTLI_QUALITY = int(os.environ.get('RESPONSE_BROTLI_QUALITY', '4'))
+
+# Content types worth compressing
+_COMPRESSIBLE = ('text/', 'application/json', 'application/javascript', 'application/xml',
+                 'image/svg+xml')
+
+# Content types returned as text rather than base64
+_TEXT = ('text/', 'application/json', 'application/javascript', 'application/xml')
+
+# Headers WSGI passes without the HTTP_ prefix
+_UNPREFIXED = {'CONTENT_TYPE', 'CONTENT_LENGTH'}
+
+_brotli = None
+
+def _get_brotli():
+    """Import brotli on first use; False when it is not installed"""
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            _brotli = False
+    return _brotli
+
+def is_v2(event):
+    """Check whether an event uses the HTTP API payload format 2.0"""
+    return event.get('version') == '2.0'
+
+def _request_headers(event):
+    """
+    Collect request headers, joining repeated ones with commas
+
+    Returns:
+        dict: Lowercase header name -> value
+    """
+    headers = {}
+    multi = event.get('multiValueHeaders') or {}
+    if multi:
+        for name, values in multi.items():
+            if values:
+                headers[name.lower()] = ', '.join(values)
+    else:
+        for name, value in (event.get('headers') or {}).items():
+            if value is not None:
+                headers[name.lower()] = value
+
+    # HTTP API v2 moves cookies out of the headers
+    if event.get('cookies'):
+        headers['cookie'] = '; '.join(event['cookies'])
+    return headers
+
+def _query_string(event):
+    """Rebuild the raw query string of a request"""
+    if is_v2(event):
+        return event.get('rawQueryString') or ''
+
+    multi = event.get('multiValueQueryStringParameters')
+    if multi:
+        return urlencode(multi, doseq=True)
+    return urlencode(event.get('queryStringParameters') or {})
+
+def event_to_environ(event, context=None):
+    """
+    Build a WSGI environ from an API Gateway proxy event
+
+    Args:
+        event (dict): REST API (v1) or HTTP API (v2) proxy event
+        context: Lambda context, exposed as environ['lambda.context']
+
+    Returns:
+        dict: WSGI environ
+    """
+    request_context = event.get('requestContext') or {}
+    if is_v2(event):
+        http = request_context.get('http') or {}
+        method = http.get('method', 'GET')
+        # rawPath is still percent-encoded; the v1 path is not
+        path = unquote(event.get('rawPath') or '/')
+        source_ip = http.get('sourceIp', '')
+    else:
+        method = event.get('httpMethod', 'GET')
+        path = event.get('path') or '/'
+        source_ip = (request_context.get('identity') or {}).get('sourceIp', '')
+
+    body = event.get('body') or b''
+    if isinstance(body, str):
+        body = base64.b64decode(body) if event.get('isBase64Encoded') else body.encode('utf-8')
+
+    headers = _request_headers(event)
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        # WSGI carries the path as latin-1 decoded bytes
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': _query_string(event),
+        'CONTENT_LENGTH': str(len(body)),
+        'CONTENT_TYPE': headers.get('content-type', ''),
+        'SERVER_NAME': headers.get('host', 'lambda').split(':')[0],
+        'SERVER_PORT': headers.get('x-forwarded-port', '443'),
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': source_ip,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': headers.get('x-forwarded-proto', 'https'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'lambda.event': event,
+        'lambda.context': context,
+    }
+    for name, value in headers.items():
+        key = name.upper().replace('-', '_')
+        if key not in _UNPREFIXED:
+            environ['HTTP_' + key] = value
+    return environ
+
+def run_wsgi(app, environ):
+    """
+    Call a WSGI application and collect its whole response
+
+    Returns:
+        tuple: (status code, list of (name, value) headers, body bytes)
+    """
+    captured = {}
+
+    def start_response(status, headers, exc_info=None):
+        captured['status'] = status
+        captured['headers'] = headers
+        return lambda data: chunks.append(data)
+
+    chunks = []
+    result = app(environ, start_response)
+    try:
+        chunks.extend(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+    return int(captured['status'].split(' ', 1)[0]), list(captured['headers']), b''.join(chunks)
+
+def _accepted_encodings(accept_encoding):
+    """Parse Accept-Encoding into the set of encodings with a non-zero q-value"""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+def _header(headers, name):
+    """Get the first value of a response header, or ''"""
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return ''
+
+def compress(headers, body, accept_encoding):
+    """
+    Compress a response body with brotli or gzip if the client accepts it
+
+    Bodies that are small, already encoded, or of a binary content type are
+    left alone. Brotli is preferred when installed.
+
+    Returns:
+        tuple: (headers, body)
+    """
+    content_type = _header(headers, 'content-type').lower()
+    if (len(body) < COMPRESS_MIN_BYTES or _header(headers, 'content-encoding')
+            or not content_type.startswith(_COMPRESSIBLE)):
+        return headers, body
+
+    accepted = _accepted_encodings(accept_encoding)
+    brotli = _get_brotli() if 'br' in accepted else None
+    if brotli:
+        encoding, body = 'br', brotli.compress(body, quality=BROTLI_QUALITY)
+    elif 'gzip' in accepted or '*' in accepted:
+        encoding, body = 'gzip', gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return headers, body
+
+    headers = [(key, value) for key, value in headers if key.lower() != 'content-length']
+    headers.append(('Content-Encoding', encoding))
+    headers.append(('Content-Length', str(len(body))))
+    vary = _header(headers, 'vary')
+    if 'accept-encoding' not in vary.lower():
+        headers = [(key, value) for key, value in headers if key.lower() != 'vary']
+        headers.append(('Vary', f"{vary}, Accept-Encoding" if vary else 'Accept-Encoding'))
+    return headers, body
+
+def to_proxy_result(event, status, headers, body):
+    """
+    Build the proxy integration result for a response
+
+    Text bodies are returned as strings; compressed and binary bodies are
+    base64 encoded (REST APIs need binary media types enabled for these).
+
+    Returns:
+        dict: Lambda proxy result in the event's payload format
+    """
+    content_type = _header(headers, 'content-type').lower()
+    binary = bool(_header(headers, 'content-encoding')) or not content_type.startswith(_TEXT)
+    result = {
+        'statusCode': status,
+        'isBase64Encoded': binary,
+        'body': base64.b64encode(body).decode('ascii') if binary else body.decode('utf-8'),
+    }
+
+    if is_v2(event):
+        # v2 joins repeated headers with commas and returns cookies separately
+        joined = {}
+        cookies = []
+        for key, value in headers:
+            if key.lower() == 'set-cookie':
+                cookies.append(value)
+            elif key in joined:
+                joined[key] = f"{joined[key]},{value}"
+            else:
+                joined[key] = value
+        result['headers'] = joined
+        if cookies:
+            result['cookies'] = cookies
+    else:
+        multi = {}
+        for key, value in headers:
+            multi.setdefault(key, []).append(value)
+        result['headers'] = {key: values[-1] for key, values in multi.items()}
+        result['multiValueHeaders'] = multi
+    return result
+
+def handle_event(app, event, context=None):
+    """
+    Serve one API Gateway proxy event with a WSGI application
+
+    Args:
+        app: WSGI application (e.g. a Flask app)
+        event (dict): REST API or HTTP API proxy event
+        context: Lambda context
+
+    Returns:
+        dict: Proxy integration result
+    """
+    environ = event_to_environ(event, context)
+    status, headers, body = run_wsgi(app, environ)
+    headers, body = compress(headers, body, environ.get('HTTP_ACCEPT_ENCODING'))
+    return to_proxy_result(event, status, headers, body)
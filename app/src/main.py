@@ -4,40 +4,40 @@ Lambda handler for Text-to-SQL Chatbot AWS deployment
 
 import json
 import os
-import boto3
+import time
 import base64
-from flask import Flask, request, jsonify, send_from_directory
+import threading
 import sys
 
 # Add the current directory to the path so that we can import our modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-# Import our modules
-from src.models.llm_provider import get_provider
-from src.models.s3_data_access import S3DataAccess
+from src.startup_profile import report_once, timed
+
+with timed('import flask'):
+    from flask import Flask, request, jsonify, send_from_directory
+
+# Import our modules; provider SDKs and boto3 are imported on first use
+from src.lambda_adapter import handle_event
+from src.models.client_pool import get_aws_client
+
+# Seconds before secrets are fetched again, so rotated values are picked up
+SECRETS_TTL = int(os.environ.get('SECRETS_TTL_SECONDS', '300'))
 
 # Initialize Flask app
 app = Flask(__name__)
 
-# Global configuration
-CONFIG = {
-    'default_provider': 'bedrock',
-    'default_model': 'anthropic.claude-3-sonnet-20240229-v1:0',
-    'bucket_name': None,
-    'api_keys': {}
-}
-
 def get_secrets():
     """Get secrets from AWS Secrets Manager"""
     secret_name = os.environ.get('SECRET_NAME', 'text-to-sql-chatbot-secret-key')
     region_name = os.environ.get('AWS_REGION', 'ap-south-1')
     
+    # An empty SECRET_NAME disables Secrets Manager (e.g. for local runs)
+    if not secret_name:
+        return {}
+    
     # Create a Secrets Manager client
-    session = boto3.session.Session()
-    client = session.client(
-        service_name='secretsmanager',
-        region_name=region_name
-    )
+    client = get_aws_client('secretsmanager', region_name=region_name)
     
     try:
         get_secret_value_response = client.get_secret_value(
@@ -55,19 +55,52 @@ def get_secrets():
         decoded_binary_secret = base64.b64decode(get_secret_value_response['SecretBinary'])
         return json.loads(decoded_binary_secret)
 
-# Load secrets on startup
-secrets = get_secrets()
-if 'S3_BUCKET_NAME' in secrets:
-    CONFIG['bucket_name'] = secrets['S3_BUCKET_NAME']
-if 'OPENAI_API_KEY' in secrets:
-    CONFIG['api_keys']['openai'] = secrets['OPENAI_API_KEY']
-if 'GEMINI_API_KEY' in secrets:
-    CONFIG['api_keys']['gemini'] = secrets['GEMINI_API_KEY']
-
-# Import routes
-from src.routes.api import api_bp
+# Import routes; the API blueprint owns the configuration the secrets fill in
+with timed('import routes'):
+    from src.routes.api import api_bp, CONFIG
 app.register_blueprint(api_bp, url_prefix='/api')
 
+# Secret values last applied to CONFIG, and when they were fetched
+_secrets = {'values': {}, 'loaded_at': None}
+_secrets_lock = threading.Lock()
+
+def load_secrets(force=False):
+    """
+    Fetch secrets on first use, and again once SECRETS_TTL has passed
+    
+    Only values that changed since the last fetch are applied, so settings
+    made through /api/config are kept until the secret itself changes.
+    """
+    with _secrets_lock:
+        now = time.time()
+        loaded_at = _secrets['loaded_at']
+        if not force and loaded_at is not None and now - loaded_at < SECRETS_TTL:
+            return
+        
+        with timed('load secrets'):
+            secrets = get_secrets()
+        _secrets['loaded_at'] = now
+        
+        # A failed fetch keeps the values already applied
+        if not secrets:
+            return
+        
+        previous = _secrets['values']
+        changed = {name: value for name, value in secrets.items() if previous.get(name) != value}
+        if 'S3_BUCKET_NAME' in changed:
+            CONFIG['bucket_name'] = changed['S3_BUCKET_NAME']
+        if 'OPENAI_API_KEY' in changed:
+            CONFIG['api_keys']['openai'] = changed['OPENAI_API_KEY']
+        if 'GEMINI_API_KEY' in changed:
+            CONFIG['api_keys']['gemini'] = changed['GEMINI_API_KEY']
+        _secrets['values'] = secrets
+
+@app.before_request
+def ensure_secrets():
+    """Load secrets before API requests; static files don't need them"""
+    if request.blueprint == api_bp.name:
+        load_secrets()
+
 # Serve static files
 @app.route('/', defaults={'path': 'index.html'})
 @app.route('/<path:path>')
@@ -75,45 +108,10 @@ def serve_static(path):
     return send_from_directory('src/static', path)
 
 def lambda_handler(event, context):
-    """AWS Lambda handler function"""
-    # Get HTTP method and path from the event
-    http_method = event['httpMethod']
-    path = event['path']
-    
-    # Process API Gateway event into Flask format
-    environ = {
-        'REQUEST_METHOD': http_method,
-        'PATH_INFO': path,
-        'QUERY_STRING': event.get('queryStringParameters', {}) or '',
-        'CONTENT_LENGTH': str(len(event.get('body', '') or '')),
-        'CONTENT_TYPE': event.get('headers', {}).get('Content-Type', ''),
-        'SERVER_NAME': 'lambda',
-        'SERVER_PORT': '80',
-        'SERVER_PROTOCOL': 'HTTP/1.1',
-        'wsgi.version': (1, 0),
-        'wsgi.url_scheme': 'http',
-        'wsgi.input': event.get('body', '') or '',
-        'wsgi.errors': sys.stderr,
-        'wsgi.multithread': False,
-        'wsgi.multiprocess': False,
-        'wsgi.run_once': False,
-    }
-    
-    # Handle request with Flask using WSGI interface
-    from werkzeug.test import EnvironBuilder
-
-    builder = EnvironBuilder(**environ)
-    env = builder.get_environ()
-    with app.request_context(env):
-        rv = app.full_dispatch_request()
-        response = app.make_response(rv)
-    
-    # Convert Flask response to Lambda response format
-    return {
-        'statusCode': response.status_code,
-        'headers': dict(response.headers),
-        'body': response.get_data(as_text=True)
-    }
+    """AWS Lambda handler function for REST API and HTTP API proxy events"""
+    result = handle_event(app, event, context)
+    report_once()
+    return result
 
 if __name__ == '__main__':
     # For local development
@@ -0,0 +1,194 @@
+"""
+Client Pool Module for Text-to-SQL Chatbot
+Shares AWS and LLM SDK clients across requests so warm Lambda invocations
+reuse their TLS connections and resolved credentials
+
+SDKs are imported on first use, so a cold start only pays for the ones the
+request actually needs.
+"""
+
+import os
+import hashlib
+import threading
+from contextlib import contextmanager
+from src.startup_profile import timed
+
+# Default connection pool size of each AWS client (botocore's own default is 10)
+DEFAULT_AWS_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '10'))
+
+# Connections each LLM HTTP client keeps open
+DEFAULT_LLM_POOL_CONNECTIONS = int(os.environ.get('LLM_MAX_POOL_CONNECTIONS', '10'))
+
+# Region used when neither the caller nor the environment names one
+DEFAULT_REGION = os.environ.get('AWS_REGION', 'ap-south-1')
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+# boto3 sessions are not thread-safe, so the shared one is only used under the lock
+_session = None
+
+# API key genai was last configured with; genai holds one global configuration
+_genai_key = None
+
+# Calls running with _genai_key, and a condition signalled as they finish
+_genai_calls = 0
+_genai_changed = threading.Condition()
+
+def fingerprint(secret):
+    """Hash a credential so it can be part of a registry key without being kept in it"""
+    if not secret:
+        return None
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()
+
+def get_aws_client(service_name, region_name=None, max_pool_connections=None,
+                   aws_access_key_id=None, aws_secret_access_key=None,
+                   read_timeout=None, max_attempts=None):
+    """
+    Get a shared boto3 client, creating it on first use
+
+    boto3 clients are thread-safe once created, so one client per service,
+    region, credentials and pool size serves every request in the process.
+
+    Args:
+        service_name (str): AWS service, e.g. 's3'
+        region_name (str, optional): Region; the session default for S3,
+            AWS_REGION for other services
+        max_pool_connections (int, optional): Connection pool size
+        aws_access_key_id (str, optional): Explicit credentials instead of
+            the default provider chain
+        aws_secret_access_key (str, optional): Secret for aws_access_key_id
+        read_timeout (float, optional): Socket read timeout in seconds
+            (botocore's default is 60)
+        max_attempts (int, optional): Attempts per call including the first,
+            for callers that retry on their own
+
+    Returns:
+        botocore.client.BaseClient: Client for the service
+    """
+    global _session
+
+    if region_name is None and service_name != 's3':
+        region_name = DEFAULT_REGION
+    pool_size = max_pool_connections or DEFAULT_AWS_POOL_CONNECTIONS
+    key = ('aws', service_name, region_name, aws_access_key_id, pool_size, read_timeout, max_attempts)
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            with timed('import boto3'):
+                import boto3
+                from botocore.config import Config
+            if aws_access_key_id:
+                session = boto3.Session(
+                    aws_access_key_id=aws_access_key_id,
+                    aws_secret_access_key=aws_secret_access_key
+                )
+            else:
+                if _session is None:
+                    _session = boto3.Session()
+                session = _session
+            options = {'max_pool_connections': pool_size, 'tcp_keepalive': True}
+            if read_timeout is not None:
+                options['read_timeout'] = read_timeout
+            if max_attempts is not None:
+                options['retries'] = {'total_max_attempts': max_attempts, 'mode': 'standard'}
+            with timed(f"create {service_name} client"):
+                client = session.client(
+                    service_name,
+                    region_name=region_name,
+                    config=Config(**options)
+                )
+            _clients[key] = client
+        return client
+
+def get_openai_client(api_key, max_connections=None, timeout=None, max_retries=None):
+    """
+    Get a shared OpenAI client for an API key
+
+    Each key gets its own client instead of setting the module-level
+    openai.api_key, which concurrent requests with different keys would race on.
+    timeout and max_retries override the SDK defaults (600 seconds, 2 retries).
+    """
+    pool_size = max_connections or DEFAULT_LLM_POOL_CONNECTIONS
+    key = ('openai', fingerprint(api_key), pool_size, timeout, max_retries)
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            with timed('import openai'):
+                import httpx
+                import openai
+            options = {}
+            if timeout is not None:
+                options['timeout'] = timeout
+            if max_retries is not None:
+                options['max_retries'] = max_retries
+            with timed('create openai client'):
+                client = openai.OpenAI(
+                    api_key=api_key,
+                    http_client=openai.DefaultHttpxClient(limits=httpx.Limits(
+                        max_connections=pool_size,
+                        max_keepalive_connections=pool_size
+                    )),
+                    **options
+                )
+            _clients[key] = client
+        return client
+
+@contextmanager
+def genai_session(api_key):
+    """
+    Use the genai SDK configured for an API key while a call runs
+
+    genai keeps a single global configuration, and its models pick up the
+    configured key when they first call out. Calls with one key therefore
+    wait for calls with another key to finish before genai is reconfigured;
+    calls with the same key run side by side, and genai (which discards its
+    clients when reconfigured) is only reconfigured when the key changes.
+
+    Yields:
+        module: google.generativeai
+    """
+    global _genai_key, _genai_calls
+
+    with timed('import google.generativeai'):
+        import google.generativeai as genai
+
+    key = fingerprint(api_key)
+    with _genai_changed:
+        while _genai_calls and _genai_key != key:
+            _genai_changed.wait()
+        if _genai_key != key:
+            genai.configure(api_key=api_key)
+            _genai_key = key
+        _genai_calls += 1
+    try:
+        yield genai
+    finally:
+        with _genai_changed:
+            _genai_calls -= 1
+            _genai_changed.notify_all()
+
+def memoize(kind, key, factory):
+    """
+    Get a shared object from the registry, building it with factory() on first use
+
+    Args:
+        kind (str): Namespace of the object, e.g. 'provider'
+        key (tuple): Identity of the object within its namespace; secrets in
+            it should already be fingerprinted
+        factory (callable): Builds the object
+
+    Returns:
+        object: Shared object
+    """
+    with _clients_lock:
+        value = _clients.get((kind,) + key)
+    if value is not None:
+        return value
+
+    # Built outside the lock, since factories may create clients themselves
+    value = factory()
+    with _clients_lock:
+        return _clients.setdefault((kind,) + key, value)
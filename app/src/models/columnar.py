@@ -0,0 +1,140 @@
+"""
+Columnar Storage Module for Text-to-SQL Chatbot
+Converts gzipped CSV partitions to Parquet/Arrow files and reads them back
+column-selectively
+
+Run as a script to backfill Parquet copies of historical partitions:
+
+    python -m src.models.columnar --bucket my-bucket --start 2025-01-01 --end 2025-03-31
+"""
+
+import io
+import os
+import sys
+import argparse
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from datetime import datetime
+
+# Sibling prefix holding Parquet copies of the csv-data/ partitions
+DEFAULT_COLUMNAR_PATH = os.environ.get('COLUMNAR_PREFIX', 'columnar-data/')
+
+# Suffix of uncompressed Arrow IPC files in the local partition cache
+FEATHER_SUFFIX = '.arrow'
+
+# Parquet key/value metadata entry recording the CSV object it came from
+SOURCE_ETAG_KEY = b'source_etag'
+
+def columnar_key_for(csv_key, base_path, columnar_path):
+    """
+    Map a CSV partition key to the key of its Parquet copy
+
+    csv-data/year=2025/month=01/day=01/part-0.csv.gz becomes
+    columnar-data/year=2025/month=01/day=01/part-0.parquet
+    """
+    relative = csv_key[len(base_path):] if csv_key.startswith(base_path) else csv_key
+    if relative.endswith('.csv.gz'):
+        relative = relative[:-len('.csv.gz')]
+    return f"{columnar_path}{relative}.parquet"
+
+def _select_columns(names, columns):
+    """Keep the requested columns that exist, in file order"""
+    if columns is None:
+        return None
+    wanted = set(columns)
+    return [name for name in names if name in wanted]
+
+def to_arrow_table(df):
+    """Convert a parsed partition to an Arrow table"""
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def write_feather(df, path):
+    """
+    Write a partition as an uncompressed Arrow IPC (Feather v2) file
+
+    Uncompressed buffers can be memory-mapped and read without copying.
+    """
+    feather.write_feather(to_arrow_table(df), path, compression='uncompressed')
+
+def read_feather(path, columns=None):
+    """
+    Memory-map an Arrow IPC file and load only the requested columns
+
+    Args:
+        path (str): Path of the Feather file
+        columns (list, optional): Columns to load; all columns when None
+
+    Returns:
+        pandas.DataFrame: Loaded data
+    """
+    with pa.memory_map(path, 'r') as source:
+        reader = pa.ipc.open_file(source)
+        table = reader.read_all()
+        selected = _select_columns(table.schema.names, columns)
+        if selected is not None:
+            table = table.select(selected)
+        # Files converted straight from CSV can hold second-resolution timestamps
+        return table.to_pandas(date_as_object=False, coerce_temporal_nanoseconds=True)
+
+def to_parquet_bytes(df, source_etag=None):
+    """
+    Serialize a partition as Parquet, tagging it with the source CSV ETag
+
+    Returns:
+        bytes: Parquet file contents
+    """
+    table = to_arrow_table(df)
+    if source_etag:
+        metadata = dict(table.schema.metadata or {})
+        metadata[SOURCE_ETAG_KEY] = source_etag.encode('utf-8')
+        table = table.replace_schema_metadata(metadata)
+
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression='snappy')
+    return buffer.getvalue()
+
+def read_parquet_bytes(data, columns=None):
+    """
+    Read only the requested columns from Parquet file contents
+
+    Returns:
+        pyarrow.Table: Loaded table
+    """
+    parquet_file = pq.ParquetFile(pa.BufferReader(data))
+    selected = _select_columns(parquet_file.schema_arrow.names, columns)
+    return parquet_file.read(columns=selected)
+
+def main(argv=None):
+    """Command-line entry point for backfilling Parquet partitions"""
+    parser = argparse.ArgumentParser(description='Backfill Parquet copies of CSV partitions')
+    parser.add_argument('--bucket', required=True, help='S3 bucket holding the partitions')
+    parser.add_argument('--start', required=True, help='First day to convert (YYYY-MM-DD)')
+    parser.add_argument('--end', required=True, help='Last day to convert (YYYY-MM-DD)')
+    parser.add_argument('--base-path', default='csv-data/', help='Prefix of the CSV partitions')
+    parser.add_argument('--columnar-path', default=DEFAULT_COLUMNAR_PATH,
+                        help='Prefix to write Parquet partitions under')
+    parser.add_argument('--workers', type=int, default=None, help='Concurrent conversions')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='Rewrite partitions that already have an up-to-date copy')
+    args = parser.parse_args(argv)
+
+    from src.models.s3_data_access import S3DataAccess
+
+    s3_access = S3DataAccess(
+        args.bucket,
+        base_path=args.base_path,
+        max_workers=args.workers,
+        columnar_path=args.columnar_path
+    )
+    converted, skipped = s3_access.backfill_columnar(
+        datetime.strptime(args.start, '%Y-%m-%d'),
+        datetime.strptime(args.end, '%Y-%m-%d'),
+        overwrite=args.overwrite
+    )
+    print(f"Converted {converted} partitions, skipped {skipped}")
+    return 0
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    sys.exit(main())
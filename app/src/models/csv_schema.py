@@ -0,0 +1,238 @@
+"""
+CSV Schema Module for Text-to-SQL Chatbot
+Pins the column types of a dataset once and parses CSV partitions against
+them with Arrow's multithreaded CSV reader, so every partition loads with
+the same dtypes
+"""
+
+import os
+import re
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from src.models.frame_memory import combine_frames
+
+# Bytes of decompressed CSV parsed per block when streaming a partition
+DEFAULT_BLOCK_BYTES = int(os.environ.get('CSV_BLOCK_BYTES', str(4 * 1024 * 1024)))
+
+# Arrow types of the pinned column types; each converts to one pandas dtype
+ARROW_TYPES = {
+    'int64': pa.int64(),
+    'float64': pa.float64(),
+    'bool': pa.bool_(),
+    'string': pa.string(),
+    'timestamp': pa.timestamp('ns'),
+    'timestamp_utc': pa.timestamp('ns', tz='UTC'),
+}
+
+# Text values that look like ISO-8601 dates or timestamps without a zone
+_ISO_TIMESTAMP = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$')
+
+class SchemaViolation(ValueError):
+    """Raised when a partition's values do not match the pinned column types"""
+    pass
+
+def pinned_type(dtype, examples=()):
+    """
+    Choose the pinned type for a column from the pandas dtype it was seen with
+
+    Text columns whose examples are all ISO-8601 dates or timestamps are
+    pinned as timestamps, so catalogs built before types were pinned still
+    get native date columns.
+
+    Args:
+        dtype (str): pandas dtype name
+        examples (list): Example values of the column
+
+    Returns:
+        str: Key of ARROW_TYPES
+    """
+    dtype = dtype or 'object'
+    if dtype.startswith(('int', 'uint')):
+        return 'int64'
+    if dtype.startswith('float'):
+        return 'float64'
+    if dtype.startswith('bool'):
+        return 'bool'
+    if dtype.startswith('datetime64'):
+        return 'timestamp_utc' if ',' in dtype else 'timestamp'
+    if examples and all(isinstance(value, str) and _ISO_TIMESTAMP.match(value) for value in examples):
+        return 'timestamp'
+    return 'string'
+
+def widen_integers(column_types):
+    """Get column types with integer pins widened to float64, to parse a partition with decimals in them"""
+    return {
+        column: 'float64' if name == 'int64' else name
+        for column, name in column_types.items()
+    }
+
+def narrow_integers(df, column_types):
+    """
+    Restore the integer pins of a frame parsed with widen_integers()
+
+    Columns holding only whole numbers go back to int64 unless they have
+    nulls, as they would have parsed with their pins.
+
+    Args:
+        df (pandas.DataFrame): Parsed data
+        column_types (dict): Column -> key of ARROW_TYPES it was pinned as
+
+    Returns:
+        tuple: (frame, dict of the columns with fractional values -> 'float64')
+    """
+    widened = {}
+    for column, name in column_types.items():
+        if name != 'int64' or column not in df.columns:
+            continue
+        series = df[column]
+        if (series.dropna() % 1 != 0).any():
+            widened[column] = 'float64'
+        elif not series.isna().any():
+            df[column] = series.astype('int64')
+    return df, widened
+
+def _to_pandas(table):
+    """Convert parsed CSV to pandas, with dates as datetime64 rather than objects"""
+    return table.to_pandas(date_as_object=False, coerce_temporal_nanoseconds=True)
+
+def read_csv(stream, column_types=None, columns=None, batch_filter=None,
+             block_bytes=DEFAULT_BLOCK_BYTES, source=None):
+    """
+    Parse a gzipped CSV stream against pinned column types
+
+    The stream is decompressed and parsed block by block on Arrow's thread
+    pool. Pinned columns are converted straight to their types, so a value
+    that does not fit fails the read instead of turning the column into
+    objects; columns that are not pinned yet are inferred. A pinned column
+    missing from the file is loaded as nulls of its type.
+
+    Args:
+        stream: Readable binary file-like object of gzipped CSV
+        column_types (dict, optional): Column -> key of ARROW_TYPES
+        columns (list, optional): Columns to parse; all columns when None
+        batch_filter (callable, optional): Applied to each parsed block's
+            frame before it is kept, e.g. to filter rows
+        block_bytes (int): Decompressed bytes per block
+        source (str, optional): Name of the stream for error messages
+
+    Returns:
+        pandas.DataFrame: Parsed data
+
+    Raises:
+        SchemaViolation: If a value does not convert to its column's pinned type
+    """
+    column_types = column_types or {}
+    include_columns = None
+    if columns is not None and column_types:
+        # Only pinned columns are known to exist before the header is read
+        wanted = set(columns)
+        include_columns = [column for column in column_types if column in wanted]
+
+    wanted = None if columns is None or include_columns is not None else set(columns)
+    frames = []
+    for batch in _read_batches(stream, column_types, include_columns, block_bytes, source):
+        df = _to_pandas(pa.Table.from_batches([batch]))
+        if wanted is not None:
+            df = df[[column for column in df.columns if column in wanted]]
+        frames.append(batch_filter(df) if batch_filter else df)
+
+    if not frames:
+        return pd.DataFrame()
+    return combine_frames(frames)
+
+def convert_csv(stream, path, column_types=None, block_bytes=DEFAULT_BLOCK_BYTES, source=None):
+    """
+    Convert a gzipped CSV stream to an uncompressed Arrow IPC (Feather v2)
+    file with every column, one block at a time
+
+    Only one parsed block is held in memory, so whole partitions can be
+    converted next to requests without counting against their budgets.
+
+    Args:
+        stream: Readable binary file-like object of gzipped CSV
+        path (str): Path to write
+        column_types (dict, optional): Column -> key of ARROW_TYPES
+        block_bytes (int): Decompressed bytes per block
+        source (str, optional): Name of the stream for error messages
+
+    Raises:
+        SchemaViolation: If a value does not convert to its column's pinned type
+    """
+    writer = None
+    try:
+        for batch in _read_batches(stream, column_types or {}, None, block_bytes, source):
+            if writer is None:
+                writer = pa.ipc.new_file(path, batch.schema)
+            writer.write_batch(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def _read_batches(stream, column_types, include_columns, block_bytes, source):
+    """Parse a gzipped CSV stream into record batches on Arrow's thread pool"""
+    convert_options = pacsv.ConvertOptions(
+        column_types={column: ARROW_TYPES[name] for column, name in column_types.items()},
+        include_columns=include_columns,
+        include_missing_columns=True,
+        # Empty fields are nulls in text columns too, as with pandas
+        strings_can_be_null=True,
+    )
+    read_options = pacsv.ReadOptions(use_threads=True, block_size=block_bytes)
+
+    compressed = pa.PythonFile(stream, mode='r')
+    try:
+        with pa.CompressedInputStream(compressed, 'gzip') as csv_input:
+            reader = pacsv.open_csv(csv_input, read_options=read_options,
+                                    convert_options=convert_options)
+            yield from reader
+    except pa.ArrowInvalid as e:
+        if 'conversion error' in str(e).lower():
+            raise SchemaViolation(
+                f"{source or 'Partition'} does not match the dataset's column types: {str(e)}"
+            ) from e
+        raise
+
+def conform_frame(df, column_types, source=None):
+    """
+    Cast a frame loaded from another format (Arrow or Parquet copies) to the
+    pinned column types
+
+    Columns that already match are left alone, so frames parsed with the
+    same types cost nothing. Integer columns read as floats because of
+    nulls are kept as they are.
+
+    Args:
+        df (pandas.DataFrame): Loaded data
+        column_types (dict): Column -> key of ARROW_TYPES
+        source (str, optional): Name of the data for error messages
+
+    Returns:
+        pandas.DataFrame: Data with the pinned dtypes
+
+    Raises:
+        SchemaViolation: If a column's values do not convert to its pinned type
+    """
+    converted = {}
+    for column, name in (column_types or {}).items():
+        if column not in df.columns:
+            continue
+        series = df[column]
+        arrow_type = ARROW_TYPES[name]
+        if series.dtype == arrow_type.to_pandas_dtype():
+            continue
+        if name == 'int64' and series.dtype.kind == 'f':
+            continue
+        try:
+            array = pa.array(series, from_pandas=True).cast(arrow_type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            raise SchemaViolation(
+                f"{source or 'Partition'} does not match the dataset's column types: "
+                f"column {column} is not {name}: {str(e)}"
+            ) from e
+        converted[column] = _to_pandas(pa.table({column: array}))[column].set_axis(df.index)
+
+    if not converted:
+        return df
+    columns = {column: converted.get(column, df[column]) for column in df.columns}
+    return pd.DataFrame(columns, index=df.index, copy=False)
@@ -0,0 +1,249 @@
+"""
+Frame Memory Module for Text-to-SQL Chatbot
+Shrinks loaded partitions to compact dtypes, combines them without a full
+copy, and enforces a per-request memory budget
+"""
+
+import os
+import resource
+import numpy as np
+import pandas as pd
+from src.models import result_cache, result_store
+
+# Downcast numbers and dictionary-encode repetitive strings as partitions load
+COMPACTION = os.environ.get('FRAME_COMPACTION', 'true').lower() in ('1', 'true', 'yes')
+
+# String columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_RATIO = float(os.environ.get('CATEGORY_MAX_RATIO', '0.5'))
+
+# Bytes the frames of one request, including partitions loaded ahead, may take;
+# 0 disables the budget. Defaults to half of the Lambda function's memory less
+# the in-memory result store and result cache, which live in the other half
+# with the runtime, the query and the response; never below an eighth.
+_lambda_bytes = int(os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE', '0')) * 1024 * 1024
+_default_budget = max(
+    _lambda_bytes // 2 - result_store.DEFAULT_MAX_BYTES - result_cache.DEFAULT_MAX_BYTES,
+    _lambda_bytes // 8,
+) if _lambda_bytes else 0
+DEFAULT_BUDGET_BYTES = int(os.environ.get('MEMORY_BUDGET_BYTES', str(_default_budget)))
+
+# At the budget, 'degrade' keeps the partitions loaded so far and 'fail' stops the request
+DEFAULT_BUDGET_MODE = os.environ.get('MEMORY_BUDGET_MODE', 'degrade').lower()
+
+class MemoryBudgetExceeded(Exception):
+    """Raised when data for a request does not fit its memory budget"""
+    pass
+
+class MemoryBudget:
+    """Bytes reserved by the frames one request loads, against a limit"""
+
+    def __init__(self, limit_bytes=DEFAULT_BUDGET_BYTES, mode=DEFAULT_BUDGET_MODE):
+        """Initialize an empty budget; a limit of 0 never runs out"""
+        self.limit_bytes = limit_bytes
+        self.mode = mode
+        self.used_bytes = 0
+
+    def available(self):
+        """Get the bytes left, or None when the budget has no limit"""
+        if not self.limit_bytes:
+            return None
+        return max(self.limit_bytes - self.used_bytes, 0)
+
+    def reserve(self, nbytes):
+        """
+        Account for a loaded frame
+
+        Returns:
+            bool: True if it fits. False if it does not and the budget
+            degrades; the frame should then be dropped.
+
+        Raises:
+            MemoryBudgetExceeded: If it does not fit and the budget fails
+            requests, or nothing has fit yet
+        """
+        if not self.limit_bytes or self.used_bytes + nbytes <= self.limit_bytes:
+            self.used_bytes += nbytes
+            return True
+
+        if self.mode == 'fail' or not self.used_bytes:
+            raise MemoryBudgetExceeded(
+                f"Data for this request needs more than the {self.limit_bytes / (1024 * 1024):.1f} MB "
+                f"memory budget. Please choose a shorter date range."
+            )
+        return False
+
+    def resize(self, nbytes):
+        """
+        Replace the reservation with nbytes, for state that is rebuilt
+        rather than added to (e.g. partial aggregates)
+
+        Raises:
+            MemoryBudgetExceeded: If it does not fit; state cannot be dropped
+        """
+        self.used_bytes = 0
+        if self.limit_bytes and nbytes > self.limit_bytes:
+            raise MemoryBudgetExceeded(
+                f"Data for this request needs more than the {self.limit_bytes / (1024 * 1024):.1f} MB "
+                f"memory budget. Please choose a shorter date range."
+            )
+        self.used_bytes = nbytes
+
+def frame_bytes(df):
+    """Get the memory a frame takes, including the strings it points to"""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+def process_memory():
+    """
+    Get the process's resident memory
+
+    Returns:
+        dict: Current and peak resident bytes (current is None where
+        /proc is not available)
+    """
+    current = None
+    try:
+        with open('/proc/self/statm') as statm:
+            current = int(statm.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        pass
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return {'rss_bytes': current, 'peak_rss_bytes': peak}
+
+def _compact_series(series):
+    """Narrow one column where that loses nothing"""
+    dtype = series.dtype
+
+    if dtype.kind == 'i' and dtype.itemsize > 1:
+        return pd.to_numeric(series, downcast='integer')
+
+    if dtype.kind == 'f' and dtype.itemsize > 4:
+        # Only when every value survives the round trip, e.g. whole numbers with nulls
+        narrow = series.astype('float32')
+        if np.array_equal(narrow.to_numpy(dtype='float64'), series.to_numpy(), equal_nan=True):
+            return narrow
+        return series
+
+    if dtype == object and len(series):
+        if series.nunique(dropna=True) <= CATEGORY_MAX_RATIO * len(series):
+            return series.astype('category')
+    return series
+
+def compact_frame(df):
+    """
+    Shrink a frame's dtypes
+
+    Integers are downcast to the smallest type holding their range, floats
+    to float32 when that is exact, and string columns with few distinct
+    values become categoricals. The SQL engine widens these back, so query
+    semantics are unchanged.
+
+    Returns:
+        pandas.DataFrame: Compacted frame
+    """
+    if not COMPACTION or df.empty:
+        return df
+
+    columns = {name: _compact_series(df[name]) for name in df.columns}
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+def _combined_dtypes(frames):
+    """
+    Get the dtype each column takes in the combined frame
+
+    Categoricals keep their categories, merged across partitions, and a
+    string column that only some partitions made categorical is categorical
+    throughout, with the other partitions' values added to its categories;
+    other columns take the numpy type that holds every partition's values.
+
+    Returns:
+        dict or None: Column -> dtype, or None when pd.concat has to combine
+        the frames (differing columns, extension dtypes, mixed kinds)
+    """
+    names = list(frames[0].columns)
+    if len(set(names)) != len(names) or any(list(df.columns) != names for df in frames[1:]):
+        return None
+
+    dtypes = {}
+    for i, name in enumerate(names):
+        column_dtypes = [df.dtypes.iloc[i] for df in frames]
+        categorical = [isinstance(dtype, pd.CategoricalDtype) for dtype in column_dtypes]
+        if any(categorical) and all(
+            is_categorical or dtype == object
+            for is_categorical, dtype in zip(categorical, column_dtypes)
+        ):
+            if any(dtype.ordered for dtype in column_dtypes if isinstance(dtype, pd.CategoricalDtype)):
+                return None
+            # Each partition decides on its own, so the same column can be
+            # categorical in one and object in another
+            categories = pd.unique(np.concatenate([
+                dtype.categories.to_numpy(dtype=object) if is_categorical
+                else df.iloc[:, i].dropna().unique()
+                for is_categorical, dtype, df in zip(categorical, column_dtypes, frames)
+            ]))
+            dtypes[name] = pd.CategoricalDtype(categories)
+            continue
+
+        if not all(isinstance(dtype, np.dtype) for dtype in column_dtypes):
+            return None
+        kinds = {dtype.kind for dtype in column_dtypes}
+        if len(kinds) == 1 or kinds <= {'i', 'u', 'f'}:
+            dtypes[name] = np.result_type(*column_dtypes)
+        elif 'O' in kinds:
+            dtypes[name] = np.dtype(object)
+        else:
+            return None
+    return dtypes
+
+def combine_frames(frames):
+    """
+    Concatenate partitions without holding two full copies
+
+    The combined columns are allocated once and filled partition by
+    partition, and each partition is released as soon as it is copied, so
+    memory peaks at the combined frame plus one partition rather than
+    twice the data as with pd.concat. Falls back to pd.concat for frames
+    whose columns differ or that use extension dtypes.
+
+    Args:
+        frames (list): Partitions in order; the list is emptied
+
+    Returns:
+        pandas.DataFrame: Combined frame with a fresh index
+    """
+    if len(frames) == 1:
+        return frames.pop().reset_index(drop=True)
+
+    dtypes = _combined_dtypes(frames)
+    if dtypes is None:
+        combined = pd.concat(frames, ignore_index=True)
+        frames.clear()
+        return combined
+
+    total = sum(len(df) for df in frames)
+    columns = {}
+    for name, dtype in dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            # Categoricals are filled as codes against the merged categories
+            dtype = np.min_scalar_type(-max(len(dtype.categories), 1))
+        columns[name] = np.empty(total, dtype=dtype)
+
+    position = 0
+    while frames:
+        df = frames.pop(0)
+        end = position + len(df)
+        for name, dtype in dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype) and isinstance(df[name].dtype, pd.CategoricalDtype):
+                columns[name][position:end] = df[name].cat.set_categories(dtype.categories).cat.codes
+            elif isinstance(dtype, pd.CategoricalDtype):
+                columns[name][position:end] = pd.Categorical(df[name], dtype=dtype).codes
+            else:
+                columns[name][position:end] = df[name].to_numpy(dtype=dtype)
+        position = end
+        del df
+
+    for name, dtype in dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            columns[name] = pd.Categorical.from_codes(columns[name], dtype=dtype)
+    # Without copy=False pandas would consolidate the columns into 2D blocks, copying them
+    return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,754 @@
+"""
+Incremental Query Module for Text-to-SQL Chatbot
+Runs single-table queries one partition at a time, keeping only partial
+aggregates, the rows a LIMIT can still return, or the rows the WHERE clause
+keeps between partitions, so date ranges that do not fit in memory can
+still be queried
+"""
+
+import os
+import copy
+import json
+import threading
+import duckdb
+import numpy as np
+import pandas as pd
+from src.models.frame_memory import MemoryBudget, combine_frames, frame_bytes
+from src.models.sql_engine import QueryError
+
+# Partial aggregates per group, merged after every partition
+AGGREGATE = 'aggregate'
+
+# The rows ORDER BY ... LIMIT can still return, at most LIMIT + OFFSET
+TOP_K = 'top_k'
+
+# The first rows a LIMIT without ORDER BY returns; loading stops once they are found
+LIMIT = 'limit'
+
+# The rows the WHERE clause keeps; the query runs on them at the end
+FILTER = 'filter'
+
+# Smallest hashes kept per group to estimate distinct counts (KMV sketch);
+# counts below this are exact
+DISTINCT_SKETCH_SIZE = int(os.environ.get('DISTINCT_SKETCH_SIZE', '1024'))
+
+# Evenly spaced quantiles kept per group to approximate medians and quantiles
+QUANTILE_POINTS = int(os.environ.get('QUANTILE_SKETCH_POINTS', '101'))
+
+# Aggregates merged by summing, taking the minimum or the maximum of partials
+_MERGED_AS = {'count_star': 'sum', 'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max'}
+
+# Aggregates merged from partial sums and counts
+_AVERAGES = {'avg', 'mean'}
+
+# Aggregates estimated from a KMV sketch of value hashes
+_DISTINCT_COUNTS = {'count', 'approx_count_distinct'}
+
+# Aggregates approximated from merged quantile points, with the quantile's argument position
+_QUANTILES = {'median', 'quantile', 'quantile_cont', 'quantile_disc', 'approx_quantile'}
+
+_parser = None
+_parser_lock = threading.Lock()
+_aggregate_names = None
+
+class _Unsupported(Exception):
+    """Raised while planning when a query shape cannot run as a smaller strategy"""
+    pass
+
+def _call(function, argument):
+    """Run a single-argument DuckDB function on the shared parsing connection"""
+    global _parser, _aggregate_names
+    with _parser_lock:
+        if _parser is None:
+            _parser = duckdb.connect(':memory:')
+            _aggregate_names = {
+                row[0] for row in _parser.execute(
+                    "SELECT DISTINCT function_name FROM duckdb_functions() "
+                    "WHERE function_type = 'aggregate'"
+                ).fetchall()
+            }
+        return _parser.execute(f"SELECT {function}(?)", [argument]).fetchone()[0]
+
+def _parse(sql):
+    """Parse SQL into DuckDB's JSON syntax tree, or None if it is not one statement"""
+    try:
+        tree = json.loads(_call('json_serialize_sql', sql))
+    except (duckdb.Error, ValueError):
+        return None
+    if tree.get('error') or len(tree.get('statements', [])) != 1:
+        return None
+    return tree
+
+def _render(tree):
+    """Turn a syntax tree back into SQL"""
+    return _call('json_deserialize_sql', json.dumps(tree))
+
+def _node(tree):
+    """Get the top SELECT node of a parsed statement"""
+    return tree['statements'][0]['node']
+
+def _with_node(tree, **fields):
+    """Copy a parsed statement with some fields of its SELECT node replaced"""
+    tree = copy.deepcopy(tree)
+    _node(tree).update(copy.deepcopy(fields))
+    return tree
+
+def _expression(sql):
+    """Parse a SQL expression into a syntax tree node"""
+    return _node(_parse(f"SELECT {sql}"))['select_list'][0]
+
+def _aliased(expression, alias):
+    """Copy an expression node with a new alias"""
+    expression = copy.deepcopy(expression)
+    expression['alias'] = alias
+    return expression
+
+def _quote(name):
+    """Quote an identifier"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _walk(value):
+    """Yield every syntax tree node under a node, itself included"""
+    if isinstance(value, dict):
+        if 'class' in value or 'type' in value:
+            yield value
+        for child in value.values():
+            yield from _walk(child)
+    elif isinstance(value, list):
+        for child in value:
+            yield from _walk(child)
+
+def _key(expression):
+    """Identify an expression regardless of alias, position and identifier case"""
+    def strip(value):
+        if isinstance(value, dict):
+            stripped = {k: strip(v) for k, v in value.items() if k not in ('alias', 'query_location')}
+            if value.get('class') == 'COLUMN_REF':
+                stripped['column_names'] = [name.lower() for name in value['column_names']]
+            return stripped
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+    return json.dumps(strip(expression), sort_keys=True)
+
+def _is_aggregate(expression):
+    """Check whether a node is a call of an aggregate function"""
+    return expression.get('class') == 'FUNCTION' and expression.get('function_name') in _aggregate_names
+
+def _aggregates_in(value):
+    """Find the outermost aggregate calls under a node"""
+    found = []
+    if isinstance(value, dict):
+        if _is_aggregate(value):
+            return [value]
+        for child in value.values():
+            found.extend(_aggregates_in(child))
+    elif isinstance(value, list):
+        for child in value:
+            found.extend(_aggregates_in(child))
+    return found
+
+def _substitute(value, replacements):
+    """Replace the expressions keyed in replacements with column references"""
+    if isinstance(value, dict):
+        if ('class' in value) and _key(value) in replacements:
+            return _aliased(replacements[_key(value)], value.get('alias', ''))
+        return {k: _substitute(v, replacements) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, replacements) for v in value]
+    return value
+
+def _constant(expression):
+    """Get the value of a numeric constant node, or None"""
+    if not expression or expression.get('class') != 'CONSTANT':
+        return None
+    value = expression['value']
+    if value.get('is_null') or not isinstance(value.get('value'), (int, float)):
+        return None
+    type_info = value['type'].get('type_info') or {}
+    if value['type'].get('id') == 'DECIMAL':
+        # Decimals are serialized as unscaled integers
+        return value['value'] / 10 ** type_info.get('scale', 0)
+    return value['value']
+
+def _constant_int(expression):
+    """Get the value of an integer constant node, or None"""
+    value = _constant(expression)
+    return value if isinstance(value, int) else None
+
+def _resolve(expression, select_list, aliases_first, columns):
+    """
+    Resolve a GROUP BY or ORDER BY term that refers to the select list
+
+    Positions (1-based) and select-list aliases are replaced with the
+    expression they name. ORDER BY prefers aliases over table columns and
+    GROUP BY the reverse, as in DuckDB.
+    """
+    position = _constant_int(expression)
+    if position is not None:
+        if not 1 <= position <= len(select_list):
+            raise _Unsupported()
+        return _aliased(select_list[position - 1], '')
+
+    if expression.get('class') == 'COLUMN_REF' and len(expression['column_names']) == 1:
+        name = expression['column_names'][0].lower()
+        is_column = name in {str(column).lower() for column in columns}
+        if aliases_first or not is_column:
+            for item in select_list:
+                if item.get('alias', '').lower() == name:
+                    return _aliased(item, '')
+    return expression
+
+class _AggregatePlan:
+    """How one aggregate is computed per partition, merged and finished"""
+
+    def __init__(self, kind, partials, merges, quantile=None):
+        """
+        Args:
+            kind (str): 'merged', 'avg', 'distinct' or 'quantile'
+            partials (list): Partial expression nodes, one per partial column
+            merges (list): How each partial column merges ('sum', 'min',
+                'max', 'hashes' or 'points')
+            quantile (float, optional): Quantile of a quantile aggregate
+        """
+        self.kind = kind
+        self.partials = partials
+        self.merges = merges
+        self.quantile = quantile
+
+def _plan_aggregate(call, render_expression):
+    """
+    Plan the partial and merge steps of an aggregate call
+
+    Raises:
+        _Unsupported: If the aggregate cannot be computed from partials
+    """
+    name = call['function_name']
+    children = call.get('children', [])
+    if (call.get('order_bys') or {}).get('orders') or call.get('export_state'):
+        raise _Unsupported()
+
+    distinct = call.get('distinct')
+    filter_sql = f" AND ({render_expression(call['filter'])})" if call.get('filter') else ''
+
+    if name in _DISTINCT_COUNTS and len(children) == 1 and (distinct or name == 'approx_count_distinct'):
+        # The smallest hashes of the distinct non-null values
+        value = render_expression(children[0])
+        sketch = _expression(
+            f"list_slice(list_sort(list(DISTINCT hash({value})) "
+            f"FILTER (WHERE ({value}) IS NOT NULL{filter_sql})), 1, {DISTINCT_SKETCH_SIZE})"
+        )
+        return _AggregatePlan('distinct', [sketch], ['hashes'])
+
+    if name in _MERGED_AS and (not distinct or name in ('min', 'max')):
+        return _AggregatePlan('merged', [_aliased(call, '')], [_MERGED_AS[name]])
+
+    if name in _AVERAGES and not distinct and len(children) == 1:
+        total = _aliased(call, '')
+        total['function_name'] = 'sum'
+        count = _aliased(call, '')
+        count['function_name'] = 'count'
+        return _AggregatePlan('avg', [total, count], ['sum', 'sum'])
+
+    if name in _QUANTILES and not distinct:
+        if name == 'median' and len(children) == 1:
+            quantile = 0.5
+        elif len(children) == 2 and _constant(children[1]) is not None:
+            quantile = float(_constant(children[1]))
+            if not 0 <= quantile <= 1:
+                raise _Unsupported()
+        else:
+            raise _Unsupported()
+
+        value = render_expression(children[0])
+        grid = ', '.join(repr(round(float(q), 6)) for q in np.linspace(0, 1, QUANTILE_POINTS))
+        filter_clause = f" FILTER (WHERE true{filter_sql})" if filter_sql else ''
+        # A cast literal, since duckdb.get_table_names cannot bind a list of quantiles
+        points = _expression(f"quantile_disc({value}, CAST('[{grid}]' AS DOUBLE[])){filter_clause}")
+        count = _expression(f"count({value}){filter_clause}")
+        return _AggregatePlan('quantile', [points, count], ['points', 'sum'], quantile)
+
+    raise _Unsupported()
+
+class IncrementalPlan:
+    """
+    How a query runs one partition at a time
+
+    strategy is AGGREGATE, TOP_K, LIMIT or FILTER. partial_sql runs on each
+    partition. Every plan also has filter_sql, the FILTER strategy's
+    partial query, to fall back to.
+    """
+
+    def __init__(self, query, tree, filter_sql):
+        """Initialize a FILTER plan; the planner upgrades it where it can"""
+        self.query = query
+        self.tree = tree
+        self.filter_sql = filter_sql
+        self.strategy = FILTER
+        self.partial_sql = filter_sql
+        self.row_limit = None
+        self.group_count = 0
+        self.aggregates = []
+        self.final_items = None
+        self.final_fields = None
+
+    def final_sql(self, names):
+        """
+        Render the AGGREGATE strategy's final query over merged partials
+
+        Args:
+            names (list): Output column names of the original query
+        """
+        items = [_aliased(item, name) for item, name in zip(self.final_items, names)]
+        return _render(_with_node(self.tree, select_list=items, **self.final_fields))
+
+def _single_table(node):
+    """Check that a query reads one table, without CTEs, subqueries or set operations"""
+    if node.get('type') != 'SELECT_NODE':
+        return False
+    from_table = node.get('from_table') or {}
+    if from_table.get('type') != 'BASE_TABLE' or from_table.get('sample') or node.get('sample'):
+        return False
+    if (node.get('cte_map') or {}).get('map') or node.get('qualify'):
+        return False
+    return not any(item.get('class') == 'SUBQUERY' for item in _walk(node))
+
+def _filters_on_alias(node, columns):
+    """
+    Check whether the WHERE clause refers to a SELECT alias
+
+    The per-partition queries select from the table without the original
+    SELECT list, so such a reference would not bind there.
+    """
+    where = node.get('where_clause')
+    if not where:
+        return False
+    # A table column of the same name takes precedence over an alias
+    names = {str(column).lower() for column in columns}
+    aliases = {item.get('alias', '').lower() for item in node['select_list']} - names - {''}
+    return any(
+        item.get('class') == 'COLUMN_REF' and len(item['column_names']) == 1
+        and item['column_names'][0].lower() in aliases
+        for item in _walk(where)
+    )
+
+def plan_query(query, columns):
+    """
+    Plan how a query can run one partition at a time
+
+    Aggregates over GROUP BY keys (count, sum, min, max, avg, distinct
+    counts and quantiles) run as partial aggregates; ORDER BY ... LIMIT and
+    plain LIMIT queries keep bounded rows; any other single-table query
+    keeps only the rows its WHERE clause matches.
+
+    Args:
+        query (str): SQL query
+        columns (list): Columns of the table
+
+    Returns:
+        IncrementalPlan or None: None for queries that join, use CTEs or
+        subqueries, filter on a SELECT alias, or do not parse
+    """
+    tree = _parse(query.strip().rstrip(';'))
+    if tree is None:
+        return None
+    node = _node(tree)
+    if not _single_table(node) or _filters_on_alias(node, columns):
+        return None
+
+    star = _expression('*')
+    empty = {
+        'modifiers': [], 'group_expressions': [], 'group_sets': [], 'having': None,
+        'aggregate_handling': 'STANDARD_HANDLING'
+    }
+    plan = IncrementalPlan(query, tree, _render(_with_node(tree, select_list=[star], **empty)))
+
+    try:
+        _upgrade(plan, tree, node, columns, star, empty)
+    except _Unsupported:
+        pass
+    return plan
+
+def _upgrade(plan, tree, node, columns, star, empty):
+    """
+    Switch a plan to the smallest strategy the query allows
+
+    Raises:
+        _Unsupported: If only the FILTER strategy applies
+    """
+    select_list = node['select_list']
+    modifiers = {modifier['type']: modifier for modifier in node.get('modifiers', [])}
+    order = modifiers.get('ORDER_MODIFIER')
+    limit = modifiers.get('LIMIT_MODIFIER')
+    if 'DISTINCT_MODIFIER' in modifiers or set(modifiers) - {'ORDER_MODIFIER', 'LIMIT_MODIFIER'}:
+        raise _Unsupported()
+    if any(item.get('class') == 'WINDOW' for item in _walk(select_list)):
+        raise _Unsupported()
+    if order and any(item.get('class') == 'WINDOW' for item in _walk(order)):
+        raise _Unsupported()
+
+    row_limit = None
+    if limit:
+        count = _constant_int(limit.get('limit'))
+        offset = _constant_int(limit.get('offset')) if limit.get('offset') else 0
+        if count is None or offset is None:
+            raise _Unsupported()
+        row_limit = count + offset
+
+    aggregating = (
+        node.get('group_expressions') or node.get('having')
+        or node.get('aggregate_handling') != 'STANDARD_HANDLING'
+        or _aggregates_in(select_list) or (order and _aggregates_in(order))
+    )
+    if aggregating:
+        _plan_aggregates(plan, tree, node, columns, order, limit, empty)
+        return
+
+    if row_limit is None:
+        raise _Unsupported()
+    limit_modifier = _node(_parse(f"SELECT 1 LIMIT {row_limit}"))['modifiers'][0]
+
+    if order:
+        # A position could refer into a star
+        has_star = any(item.get('class') in ('STAR', 'COLUMNS') for item in _walk(select_list))
+        if has_star and any(_constant_int(term['expression']) is not None for term in order['orders']):
+            raise _Unsupported()
+        order = copy.deepcopy(order)
+        for term in order['orders']:
+            term['expression'] = _resolve(term['expression'], select_list, True, columns)
+        plan.strategy = TOP_K
+        modifiers = [order, limit_modifier]
+    else:
+        plan.strategy = LIMIT
+        modifiers = [limit_modifier]
+
+    plan.row_limit = row_limit
+    plan.partial_sql = _render(_with_node(tree, select_list=[star], **dict(empty, modifiers=modifiers)))
+
+def _plan_aggregates(plan, tree, node, columns, order, limit, empty):
+    """Plan the AGGREGATE strategy: partial aggregates per group and a final query over them"""
+    select_list = node['select_list']
+    if any(item.get('class') in ('STAR', 'COLUMNS') for item in _walk(select_list)):
+        raise _Unsupported()
+
+    if node.get('aggregate_handling') == 'FORCE_AGGREGATES':
+        # GROUP BY ALL groups by every select item without an aggregate
+        groups = [_aliased(item, '') for item in select_list if not _aggregates_in(item)]
+    elif node.get('aggregate_handling') == 'STANDARD_HANDLING':
+        groups = [_resolve(term, select_list, False, columns) for term in node.get('group_expressions', [])]
+        if node.get('group_sets') and node['group_sets'] != [list(range(len(groups)))]:
+            # ROLLUP, CUBE and GROUPING SETS
+            raise _Unsupported()
+    else:
+        raise _Unsupported()
+    if any(_aggregates_in(group) for group in groups):
+        raise _Unsupported()
+
+    empty_from = _node(_parse("SELECT 1"))['from_table']
+    def render_expression(expression):
+        sql = _render(_with_node(tree, select_list=[_aliased(expression, '')], from_table=empty_from,
+                                 where_clause=None, **empty))
+        return sql[len('SELECT '):]
+
+    calls = {}
+    for call in _aggregates_in([select_list, node.get('having'), order]):
+        calls.setdefault(_key(call), call)
+    aggregates = [_plan_aggregate(call, render_expression) for call in calls.values()]
+
+    replacements = {}
+    partial_items = []
+    for k, group in enumerate(groups):
+        replacements.setdefault(_key(group), _expression(_quote(f"__g{k}")))
+        partial_items.append(_aliased(group, f"__g{k}"))
+    for i, (call_key, aggregate) in enumerate(zip(calls, aggregates)):
+        replacements[call_key] = _expression(_quote(f"__a{i}"))
+        for j, partial in enumerate(aggregate.partials):
+            partial_items.append(_aliased(partial, f"__p{i}_{j}"))
+
+    plan.strategy = AGGREGATE
+    plan.group_count = len(groups)
+    plan.aggregates = aggregates
+    plan.partial_sql = _render(_with_node(
+        tree, select_list=partial_items,
+        **dict(empty, group_expressions=[_aliased(group, '') for group in groups],
+               group_sets=[list(range(len(groups)))] if groups else [])
+    ))
+
+    modifiers = [_substitute(order, replacements)] if order else []
+    if limit:
+        modifiers.append(limit)
+    plan.final_items = _substitute(select_list, replacements)
+    plan.final_fields = dict(
+        empty, modifiers=modifiers,
+        where_clause=_substitute(node.get('having'), replacements)
+    )
+
+def _group_slices(codes, group_count):
+    """Get the row positions of each group, in group order"""
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(group_count + 1))
+    return [order[bounds[g]:bounds[g + 1]] for g in range(group_count)]
+
+def _missing(value):
+    """Check whether a partial list value is NULL (None, NaN or pd.NA)"""
+    return not isinstance(value, (list, tuple, np.ndarray))
+
+def _merge_hashes(sketches):
+    """Merge KMV sketches, keeping the smallest distinct hashes"""
+    arrays = [np.asarray(sketch, dtype=np.uint64) for sketch in sketches if not _missing(sketch) and len(sketch)]
+    if not arrays:
+        return np.array([], dtype=np.uint64)
+    return np.unique(np.concatenate(arrays))[:DISTINCT_SKETCH_SIZE]
+
+def _merge_points(points, counts):
+    """
+    Merge quantile points of several partitions
+
+    Each partition's points give its cumulative distribution by linear
+    interpolation; the merged points are the quantiles of the mixture of
+    those distributions, weighted by the partitions' row counts.
+    """
+    grid = np.linspace(0, 1, QUANTILE_POINTS)
+    partitions = [
+        (np.asarray(partition_points, dtype='float64'), count)
+        for partition_points, count in zip(points, counts)
+        if not _missing(partition_points) and count and len(partition_points)
+    ]
+    if not partitions:
+        return None
+    if len(partitions) == 1:
+        return partitions[0][0]
+    values = np.unique(np.concatenate([partition_points for partition_points, _ in partitions]))
+    total = sum(count for _, count in partitions)
+    cumulative = sum(count * np.interp(values, partition_points, grid) for partition_points, count in partitions)
+    return np.interp(grid, cumulative / total, values)
+
+def _estimate_distinct(sketch):
+    """Estimate a distinct count from a KMV sketch; exact when the sketch is not full"""
+    if _missing(sketch) or len(sketch) < DISTINCT_SKETCH_SIZE:
+        return (0 if _missing(sketch) else len(sketch)), False
+    kth = float(sketch[DISTINCT_SKETCH_SIZE - 1]) / 2.0 ** 64
+    return int(round((DISTINCT_SKETCH_SIZE - 1) / kth)), True
+
+class IncrementalQuery:
+    """
+    A query being run one partition at a time
+
+    Partitions are added in order with add(); result() runs the final step.
+    The state kept between partitions is counted against a memory budget.
+    """
+
+    def __init__(self, plan, engine, budget=None):
+        """
+        Args:
+            plan (IncrementalPlan): Plan from plan_query
+            engine (SQLEngine): Engine that runs the partial and final queries
+            budget (MemoryBudget, optional): Budget for the state kept
+                between partitions
+        """
+        self.plan = plan
+        self.engine = engine
+        self.budget = budget or MemoryBudget()
+        self.strategy = plan.strategy
+        self.names = None
+        self.empty = None
+        self.state = None
+        self.parts = []
+        self.partitions = 0
+        self.rows_read = 0
+        self.execution_ms = 0.0
+        self.peak_state_bytes = 0
+        self.approximate = False
+
+    @property
+    def done(self):
+        """True once a LIMIT query has all the rows it can return"""
+        return self.strategy == LIMIT and sum(len(part) for part in self.parts) >= self.plan.row_limit
+
+    def _execute(self, df, sql):
+        """Run SQL on a frame, adding up the engine time"""
+        result, elapsed_ms = self.engine.execute(df, sql)
+        self.execution_ms += elapsed_ms
+        return result
+
+    def _start(self, df):
+        """
+        Check the query and the plan against the first partition's columns
+
+        The original query runs on zero rows, so a query that cannot run
+        fails before any more data is read, and gives the output column
+        names. If the plan's own queries do not run, the FILTER strategy is
+        used instead.
+        """
+        self.empty = df.iloc[:0]
+        self.names = list(self._execute(self.empty, self.plan.query).columns)
+        if self.strategy == FILTER:
+            return
+        try:
+            partial = self._execute(self.empty, self.plan.partial_sql)
+            if self.strategy == AGGREGATE:
+                self._execute(self._finish(partial), self.plan.final_sql(self.names))
+        except QueryError as e:
+            print(f"Error planning incremental {self.strategy} query, filtering instead: {str(e)}")
+            self.strategy = FILTER
+
+    def _track(self, nbytes):
+        """Count the state against the budget"""
+        self.budget.resize(nbytes)
+        self.peak_state_bytes = max(self.peak_state_bytes, nbytes)
+
+    @property
+    def partition_sql(self):
+        """SQL run on each partition once the first has been added"""
+        return self.plan.filter_sql if self.strategy == FILTER else self.plan.partial_sql
+
+    def add(self, df):
+        """
+        Fold one partition into the state
+
+        Raises:
+            QueryError: If the query fails
+            MemoryBudgetExceeded: If the state outgrows the budget
+        """
+        if self.names is None:
+            self._start(df)
+        self.fold(self._execute(df, self.partition_sql), len(df))
+
+    def fold(self, partial, rows, elapsed_ms=0.0):
+        """
+        Fold the result of partition_sql on one partition into the state
+
+        Used directly when partitions are queried elsewhere, e.g. in worker
+        processes; the first partition must have been added with add().
+
+        Args:
+            partial (pandas.DataFrame): Result of partition_sql
+            rows (int): Rows of the partition
+            elapsed_ms (float): Time partition_sql took
+
+        Raises:
+            QueryError: If the query fails
+            MemoryBudgetExceeded: If the state outgrows the budget
+        """
+        self.partitions += 1
+        self.rows_read += rows
+        self.execution_ms += elapsed_ms
+
+        if self.strategy == AGGREGATE:
+            if self.state is not None:
+                partial = self._merge(pd.concat([self.state, partial], ignore_index=True))
+            self.state = partial
+            self._track(frame_bytes(self.state))
+        elif self.strategy == TOP_K:
+            if self.state is not None:
+                partial = self._execute(pd.concat([self.state, partial], ignore_index=True), self.plan.partial_sql)
+            self.state = partial
+            self._track(frame_bytes(self.state))
+        else:
+            self.parts.append(partial)
+            self._track(sum(frame_bytes(part) for part in self.parts))
+
+    def _merge(self, frame):
+        """Merge partial aggregate rows that belong to the same group"""
+        if frame.empty:
+            return frame
+        groups = [f"__g{k}" for k in range(self.plan.group_count)]
+        if groups:
+            codes = frame.groupby(groups, dropna=False, sort=False).ngroup().to_numpy()
+        else:
+            codes = np.zeros(len(frame), dtype=np.int64)
+        group_count = int(codes.max()) + 1
+        first = np.unique(codes, return_index=True)[1]
+
+        merged = {name: frame[name].iloc[first].reset_index(drop=True) for name in groups}
+        grouped = frame.groupby(codes, sort=True)
+        slices = None
+        for i, aggregate in enumerate(self.plan.aggregates):
+            for j, how in enumerate(aggregate.merges):
+                name = f"__p{i}_{j}"
+                if how == 'sum':
+                    merged[name] = grouped[name].sum(min_count=1).reset_index(drop=True)
+                elif how in ('min', 'max'):
+                    merged[name] = getattr(grouped[name], how)().reset_index(drop=True)
+                else:
+                    if slices is None:
+                        slices = _group_slices(codes, group_count)
+                    values = frame[name].to_numpy()
+                    if how == 'hashes':
+                        merged[name] = pd.Series([_merge_hashes(values[rows]) for rows in slices])
+                    else:
+                        counts = frame[f"__p{i}_{j + 1}"].to_numpy()
+                        try:
+                            merged[name] = pd.Series([
+                                _merge_points(values[rows], counts[rows]) for rows in slices
+                            ])
+                        except (TypeError, ValueError) as e:
+                            raise QueryError(
+                                f"Quantiles of non-numeric values cannot be merged across partitions: {str(e)}"
+                            ) from e
+        return pd.DataFrame(merged)
+
+    def _finish(self, state):
+        """Turn merged partials into one column of final values per aggregate"""
+        finished = {f"__g{k}": state[f"__g{k}"] for k in range(self.plan.group_count)}
+        for i, aggregate in enumerate(self.plan.aggregates):
+            first = state[f"__p{i}_0"]
+            if aggregate.kind == 'merged':
+                value = first
+            elif aggregate.kind == 'avg':
+                count = state[f"__p{i}_1"]
+                value = first / count.where(count > 0)
+            elif aggregate.kind == 'distinct':
+                estimates = [_estimate_distinct(sketch) for sketch in first]
+                self.approximate = self.approximate or any(estimated for _, estimated in estimates)
+                value = pd.Series([count for count, _ in estimates], index=state.index, dtype='int64')
+            else:
+                self.approximate = self.approximate or len(state) > 0
+                value = pd.Series([
+                    None if _missing(points) else
+                    float(np.interp(aggregate.quantile, np.linspace(0, 1, len(points)), points))
+                    for points in first
+                ], index=state.index, dtype=object).infer_objects()
+            finished[f"__a{i}"] = value
+        return pd.DataFrame(finished, index=state.index)
+
+    def result(self):
+        """
+        Run the final step of the query
+
+        Returns:
+            pandas.DataFrame or None: Query results, or None when no
+            partition was added
+
+        Raises:
+            QueryError: If the query fails
+        """
+        if self.names is None:
+            return None
+        if self.strategy == AGGREGATE:
+            return self._execute(self._finish(self.state), self.plan.final_sql(self.names))
+        if self.strategy == TOP_K:
+            return self._execute(self.state, self.plan.query)
+        rows = combine_frames(list(self.parts)) if self.parts else self.empty
+        return self._execute(rows, self.plan.query)
+
+    def stats(self):
+        """
+        Get counters of the run
+
+        Returns:
+            dict: Strategy, partitions and rows read, state rows and peak
+            state bytes, and whether any aggregate is approximate
+        """
+        if self.strategy in (AGGREGATE, TOP_K):
+            state_rows = 0 if self.state is None else len(self.state)
+        else:
+            state_rows = sum(len(part) for part in self.parts)
+        return {
+            'strategy': self.strategy,
+            'partitions_read': self.partitions,
+            'rows_read': self.rows_read,
+            'state_rows': state_rows,
+            'peak_state_bytes': self.peak_state_bytes,
+            'approximate': self.approximate,
+        }
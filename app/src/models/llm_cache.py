@@ -0,0 +1,287 @@
+"""
+LLM Cache Module for Text-to-SQL Chatbot
+Caches generated SQL so repeated questions over the same schema skip the LLM
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from src.models.llm_provider import LLMProvider
+from src.models.partition_cache import CACHE_ROOT
+
+# Backend for cached SQL: memory, sqlite or none (defaults to sqlite when a cache root is set)
+DEFAULT_BACKEND = os.environ.get('LLM_CACHE_BACKEND', 'sqlite' if CACHE_ROOT else 'memory')
+
+# Seconds before cached SQL expires
+DEFAULT_TTL = int(os.environ.get('LLM_CACHE_TTL_SECONDS', '3600'))
+
+# Entries kept before least-recently-used ones are evicted
+DEFAULT_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '1000'))
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def normalize_question(question):
+    """Lowercase a question and collapse whitespace and trailing punctuation"""
+    question = re.sub(r'\s+', ' ', question.strip().lower())
+    return question.rstrip(' ?.!')
+
+class MemoryCacheBackend:
+    """In-process LRU store with per-entry expiry"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        """Initialize an empty store"""
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get an unexpired value, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        """Store a value, evicting the least recently used entries if full"""
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a value if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteCacheBackend:
+    """
+    LRU store in a local SQLite file
+
+    Several processes (e.g. warm Lambda containers sharing a mounted volume,
+    or local workers) can share one file.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        """Open or create the cache database"""
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+
+    def get(self, key):
+        """Get an unexpired value, or None"""
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            self._connection.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return row[0]
+
+    def set(self, key, value, ttl):
+        """Store a value, evicting the least recently used entries if full"""
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now)
+            )
+            self._connection.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def delete(self, key):
+        """Remove a value if present"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+class SQLCache:
+    """Generated-SQL cache with a pluggable backend and hit/miss counters"""
+
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        """Initialize the cache over a backend"""
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(provider_name, model, question, schema):
+        """
+        Build a cache key from the provider, model, normalized question and
+        a hash of the schema, so schema changes invalidate cached SQL
+        """
+        schema_hash = hashlib.sha256(schema.encode('utf-8')).hexdigest()
+        payload = json.dumps([provider_name, model, normalize_question(question), schema_hash])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Look up SQL, counting the hit or miss"""
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, sql):
+        """Store generated SQL"""
+        self.backend.set(key, sql, self.ttl)
+
+    def delete(self, key):
+        """Remove SQL that turned out not to work"""
+        self.backend.delete(key)
+
+    def stats(self):
+        """Get hit/miss counters for this process"""
+        total = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+class CachedLLMProvider(LLMProvider):
+    """
+    LLMProvider wrapper that serves repeated SQL generation from a cache
+
+    Generated SQL is only stored once the caller reports with confirm_sql()
+    that it ran, so SQL that fails, or a reply that held no SQL, is not
+    served again; reject_sql() drops cached SQL that failed.
+    """
+
+    def __init__(self, provider, provider_name, model, cache):
+        """Wrap a provider instance"""
+        self.provider = provider
+        self.provider_name = provider_name
+        self.model = model
+        self.cache = cache
+        # Whether the last generate_sql call was served from the cache
+        self.last_hit = None
+        # SQL returned by this wrapper -> [(cache key, whether it came from the cache)];
+        # several questions of a batch can get the same SQL
+        self._returned = {}
+
+    def _lookup(self, question, schema):
+        """Get the cache key of a question and its cached SQL, or None"""
+        key = self.cache.make_key(self.provider_name, self.model, question, schema)
+        sql_query = self.cache.get(key)
+        self.last_hit = sql_query is not None
+        if sql_query is not None:
+            self._returned.setdefault(sql_query, []).append((key, True))
+        return key, sql_query
+
+    def generate_sql(self, question, schema, sample_data=None):
+        """Generate SQL, returning the cached query when there is one"""
+        key, sql_query = self._lookup(question, schema)
+        if sql_query is not None:
+            return sql_query
+
+        sql_query = self.provider.generate_sql(question, schema, sample_data)
+        self._returned.setdefault(sql_query, []).append((key, False))
+        return sql_query
+
+    async def agenerate_sql(self, question, schema, sample_data=None):
+        """Generate SQL without blocking the event loop, returning the cached query when there is one"""
+        key, sql_query = self._lookup(question, schema)
+        if sql_query is not None:
+            return sql_query
+
+        sql_query = await self.provider.agenerate_sql(question, schema, sample_data)
+        self._returned.setdefault(sql_query, []).append((key, False))
+        return sql_query
+
+    def confirm_sql(self, sql_query):
+        """Cache SQL generated by this wrapper now that it has run successfully"""
+        for key, cached in self._returned.pop(sql_query, []):
+            if not cached:
+                self.cache.set(key, sql_query)
+
+    def reject_sql(self, sql_query):
+        """Forget SQL that failed to run, removing it from the cache if it came from there"""
+        for key, cached in self._returned.pop(sql_query, []):
+            if cached:
+                self.cache.delete(key)
+
+    def explain_results(self, question, sql_query, query_results):
+        """Explain results with the wrapped provider (never cached)"""
+        return self.provider.explain_results(question, sql_query, query_results)
+
+    def explain_results_stream(self, question, sql_query, query_results):
+        """Stream an explanation with the wrapped provider (never cached)"""
+        return self.provider.explain_results_stream(question, sql_query, query_results)
+
+    async def aexplain_results(self, question, sql_query, query_results):
+        """Explain results with the wrapped provider without blocking the event loop"""
+        return await self.provider.aexplain_results(question, sql_query, query_results)
+
+    def __getattr__(self, name):
+        # Expose anything else the wrapped provider offers
+        return getattr(self.provider, name)
+
+def get_default_sql_cache():
+    """
+    Get the process-wide SQL cache configured from the environment
+
+    Returns:
+        SQLCache or None: None when LLM_CACHE_BACKEND is "none"
+    """
+    global _default_cache
+
+    with _default_cache_lock:
+        if _default_cache is None and DEFAULT_BACKEND != 'none':
+            backend = None
+            if DEFAULT_BACKEND == 'sqlite':
+                path = os.environ.get(
+                    'LLM_CACHE_PATH',
+                    os.path.join(CACHE_ROOT or '.', 'llm_cache.sqlite')
+                )
+                try:
+                    backend = SQLiteCacheBackend(path)
+                except sqlite3.Error as e:
+                    print(f"Error opening LLM cache database: {str(e)}")
+            if backend is None:
+                backend = MemoryCacheBackend()
+            _default_cache = SQLCache(backend)
+        return _default_cache
@@ -5,11 +5,44 @@ Handles integration with multiple LLM providers including Bedrock Claude, OpenAI
 
 import os
 import json
-import boto3
-import anthropic
-import openai
-import google.generativeai as genai
+import time
+import asyncio
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from src.models.client_pool import fingerprint, genai_session, get_aws_client, get_openai_client, memoize
+from src.models.prompt_builder import build_sql_prompt, record_usage
+
+# Seconds an LLM call may take, including retries and hedged requests
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT_SECONDS', '20'))
+
+# Worker threads for blocking SDK calls made from async code
+LLM_WORKERS = int(os.environ.get('LLM_WORKERS', '16'))
+
+# Bedrock models that accept cache_control prompt caching; others reject the field
+BEDROCK_CACHE_MODELS = [
+    name.strip() for name in os.environ.get(
+        'BEDROCK_PROMPT_CACHE_MODELS',
+        'claude-3-5-haiku,claude-3-7-sonnet,claude-sonnet-4,claude-opus-4'
+    ).split(',') if name.strip()
+]
+
+# Gemini only caches content of at least this many tokens (the 1.5 models' minimum)
+GEMINI_CACHE_MIN_TOKENS = int(os.environ.get('GEMINI_PROMPT_CACHE_MIN_TOKENS', '32768'))
+
+# Lifetime of Gemini cached content
+GEMINI_CACHE_TTL = int(os.environ.get('GEMINI_PROMPT_CACHE_TTL_SECONDS', '3600'))
+
+_executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix='llm')
+
+async def run_blocking(func, *args):
+    """
+    Run a blocking SDK call on the shared LLM worker threads
+    
+    The pool outlives event loops, so a call abandoned on timeout finishes
+    in the background instead of holding up asyncio.run() on exit.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
 
 class LLMProvider(ABC):
     """Abstract base class for LLM providers"""
@@ -23,31 +56,83 @@ class LLMProvider(ABC):
     def explain_results(self, question, sql_query, query_results):
         """Explain query results in natural language"""
         pass
+    
+    def explain_results_stream(self, question, sql_query, query_results):
+        """
+        Explain query results, yielding the text as it is generated
+        
+        Providers without a streaming API yield the whole explanation at once.
+        """
+        yield self.explain_results(question, sql_query, query_results)
+    
+    async def agenerate_sql(self, question, schema, sample_data=None):
+        """Generate SQL without blocking the event loop"""
+        return await run_blocking(self.generate_sql, question, schema, sample_data)
+    
+    async def aexplain_results(self, question, sql_query, query_results):
+        """Explain query results without blocking the event loop"""
+        return await run_blocking(self.explain_results, question, sql_query, query_results)
+    
+    def confirm_sql(self, sql_query):
+        """Report that generated SQL ran successfully (used by providers that cache SQL)"""
+        pass
+    
+    def reject_sql(self, sql_query):
+        """Report that generated SQL failed to run (used by providers that cache SQL)"""
+        pass
+    
+    def _create_sql_prompt(self, question, schema, sample_data=None):
+        """Create prompt for SQL generation, shared by all providers"""
+        return build_sql_prompt(question, schema, sample_data)
+    
+    def _create_explain_prompt(self, question, sql_query, query_results):
+        """Create prompt for explaining query results"""
+        return f"""
+        Question: {question}
+        
+        SQL Query: {sql_query}
+        
+        Query Results: {query_results}
+        
+        Please explain these results in simple terms that answer the original question.
+        """
 
 class BedrockClaudeProvider(LLMProvider):
     """AWS Bedrock Claude provider implementation"""
     
+    name = 'bedrock'
+    
     def __init__(self, api_key=None, model="anthropic.claude-3-sonnet-20240229-v1:0"):
         """Initialize Bedrock Claude provider"""
         self.model = model
-        # Use provided API key or default AWS credentials
-        self.session = boto3.Session()
-        self.bedrock_runtime = self.session.client(
-            service_name='bedrock-runtime',
-            region_name=os.environ.get('AWS_REGION', 'ap-south-1')
+        # Default AWS credentials, through the client shared by every request
+        # Retries are left to the resilience layer, which knows the deadline
+        self.bedrock_runtime = get_aws_client(
+            'bedrock-runtime',
+            region_name=os.environ.get('AWS_REGION', 'ap-south-1'),
+            read_timeout=LLM_TIMEOUT,
+            max_attempts=1
         )
+        self.prompt_caching = any(name in model for name in BEDROCK_CACHE_MODELS)
     
     def generate_sql(self, question, schema, sample_data=None):
         """Generate SQL query using Bedrock Claude"""
         prompt = self._create_sql_prompt(question, schema, sample_data)
         
+        # The schema prefix goes in the system prompt, marked for caching
+        # where the model supports it
+        system = {"type": "text", "text": prompt.prefix}
+        if self.prompt_caching:
+            system["cache_control"] = {"type": "ephemeral"}
+        
         response = self.bedrock_runtime.invoke_model(
             modelId=self.model,
             body=json.dumps({
                 "anthropic_version": "bedrock-2023-05-31",
                 "max_tokens": 1000,
+                "system": [system],
                 "messages": [
-                    {"role": "user", "content": prompt}
+                    {"role": "user", "content": prompt.question}
                 ]
             })
         )
@@ -55,20 +140,20 @@ class BedrockClaudeProvider(LLMProvider):
         response_body = json.loads(response.get('body').read())
         sql_query = response_body.get('content')[0].get('text')
         
+        # input_tokens only counts tokens after the last cache breakpoint
+        usage = response_body.get('usage') or {}
+        cached = usage.get('cache_read_input_tokens', 0)
+        record_usage(
+            usage.get('input_tokens', 0) + cached + usage.get('cache_creation_input_tokens', 0),
+            cached
+        )
+        
         # Extract just the SQL query from the response
         return self._extract_sql(sql_query)
     
     def explain_results(self, question, sql_query, query_results):
         """Explain query results using Bedrock Claude"""
-        prompt = f"""
-        Question: {question}
-        
-        SQL Query: {sql_query}
-        
-        Query Results: {query_results}
-        
-        Please explain these results in simple terms that answer the original question.
-        """
+        prompt = self._create_explain_prompt(question, sql_query, query_results)
         
         response = self.bedrock_runtime.invoke_model(
             modelId=self.model,
@@ -86,28 +171,31 @@ class BedrockClaudeProvider(LLMProvider):
         
         return explanation
     
-    def _create_sql_prompt(self, question, schema, sample_data=None):
-        """Create prompt for SQL generation"""
-        prompt = f"""
-        You are an expert SQL query generator. I need you to create a SQL query based on the following:
+    def explain_results_stream(self, question, sql_query, query_results):
+        """Stream an explanation of query results from Bedrock Claude"""
+        prompt = self._create_explain_prompt(question, sql_query, query_results)
         
-        Question: {question}
-        
-        Database Schema:
-        {schema}
-        """
-        
-        if sample_data:
-            prompt += f"""
-            Sample Data:
-            {sample_data}
-            """
-        
-        prompt += """
-        Please generate a SQL query that answers the question. Return only the SQL query without any explanations.
-        """
+        response = self.bedrock_runtime.invoke_model_with_response_stream(
+            modelId=self.model,
+            body=json.dumps({
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": 1000,
+                "messages": [
+                    {"role": "user", "content": prompt}
+                ]
+            })
+        )
         
-        return prompt
+        # Text arrives in content_block_delta events of the event stream
+        for event in response.get('body'):
+            chunk = event.get('chunk')
+            if not chunk:
+                continue
+            payload = json.loads(chunk.get('bytes'))
+            if payload.get('type') == 'content_block_delta':
+                text = payload.get('delta', {}).get('text')
+                if text:
+                    yield text
     
     def _extract_sql(self, response):
         """Extract SQL query from model response"""
@@ -140,42 +228,43 @@ class BedrockClaudeProvider(LLMProvider):
 class OpenAIProvider(LLMProvider):
     """OpenAI provider implementation"""
     
+    name = 'openai'
+    
     def __init__(self, api_key, model="gpt-4o-mini"):
         """Initialize OpenAI provider"""
         self.model = model
-        openai.api_key = api_key
+        self.client = get_openai_client(api_key, timeout=LLM_TIMEOUT, max_retries=0)
     
     def generate_sql(self, question, schema, sample_data=None):
         """Generate SQL query using OpenAI"""
         prompt = self._create_sql_prompt(question, schema, sample_data)
         
-        response = openai.chat.completions.create(
+        # OpenAI caches long prompt prefixes automatically, so the schema
+        # goes first and the question last
+        response = self.client.chat.completions.create(
             model=self.model,
             messages=[
-                {"role": "system", "content": "You are an expert SQL query generator."},
-                {"role": "user", "content": prompt}
+                {"role": "system", "content": prompt.prefix},
+                {"role": "user", "content": prompt.question}
             ],
             max_tokens=1000
         )
         
         sql_query = response.choices[0].message.content
         
+        usage = response.usage
+        if usage:
+            details = getattr(usage, 'prompt_tokens_details', None)
+            record_usage(usage.prompt_tokens, getattr(details, 'cached_tokens', 0) if details else 0)
+        
         # Extract just the SQL query from the response
         return self._extract_sql(sql_query)
     
     def explain_results(self, question, sql_query, query_results):
         """Explain query results using OpenAI"""
-        prompt = f"""
-        Question: {question}
-        
-        SQL Query: {sql_query}
+        prompt = self._create_explain_prompt(question, sql_query, query_results)
         
-        Query Results: {query_results}
-        
-        Please explain these results in simple terms that answer the original question.
-        """
-        
-        response = openai.chat.completions.create(
+        response = self.client.chat.completions.create(
             model=self.model,
             messages=[
                 {"role": "system", "content": "You are an expert at explaining SQL query results."},
@@ -188,28 +277,23 @@ class OpenAIProvider(LLMProvider):
         
         return explanation
     
-    def _create_sql_prompt(self, question, schema, sample_data=None):
-        """Create prompt for SQL generation"""
-        prompt = f"""
-        I need you to create a SQL query based on the following:
-        
-        Question: {question}
-        
-        Database Schema:
-        {schema}
-        """
-        
-        if sample_data:
-            prompt += f"""
-            Sample Data:
-            {sample_data}
-            """
+    def explain_results_stream(self, question, sql_query, query_results):
+        """Stream an explanation of query results from OpenAI"""
+        prompt = self._create_explain_prompt(question, sql_query, query_results)
         
-        prompt += """
-        Please generate a SQL query that answers the question. Return only the SQL query without any explanations.
-        """
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You are an expert at explaining SQL query results."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=1000,
+            stream=True
+        )
         
-        return prompt
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
     
     def _extract_sql(self, response):
         """Extract SQL query from model response"""
@@ -242,61 +326,105 @@ class OpenAIProvider(LLMProvider):
 class GeminiProvider(LLMProvider):
     """Google Gemini provider implementation"""
     
+    name = 'gemini'
+    
     def __init__(self, api_key, model="gemini-1.5-pro"):
         """Initialize Gemini provider"""
         self.model = model
-        genai.configure(api_key=api_key)
-        self.model_client = genai.GenerativeModel(self.model)
+        # genai is configured per call, since providers for other keys share it
+        self.api_key = api_key
+        with genai_session(api_key) as genai:
+            self.genai = genai
+            self.model_client = genai.GenerativeModel(self.model)
+        # Prefix key -> (model over the cached prefix or None, expiry time)
+        self.cached_models = {}
+        self.cached_models_lock = threading.Lock()
+    
+    def _cached_model(self, prompt):
+        """
+        Get a model whose context holds the prompt prefix as cached content
+        
+        Gemini only caches large contexts, so prefixes below
+        GEMINI_CACHE_MIN_TOKENS are sent inline. Called within genai_session.
+        
+        Returns:
+            GenerativeModel or None: Model over the cached prefix, or None
+            to send the whole prompt
+        """
+        # Imported here; result_summary loads pandas, which SQL generation does not need
+        from src.models.result_summary import estimate_tokens
+        if estimate_tokens(prompt.prefix, 'gemini') < GEMINI_CACHE_MIN_TOKENS:
+            return None
+        
+        key = prompt.prefix_key
+        with self.cached_models_lock:
+            model, expires_at = self.cached_models.get(key, (None, 0))
+            if time.time() < expires_at:
+                return model
+            
+            try:
+                content = self.genai.caching.CachedContent.create(
+                    model=self.model,
+                    system_instruction=prompt.prefix,
+                    ttl=GEMINI_CACHE_TTL
+                )
+                model = self.genai.GenerativeModel.from_cached_content(cached_content=content)
+            except Exception as e:
+                # e.g. a model without caching support; retried after the TTL
+                print(f"Error creating Gemini cached content: {str(e)}")
+                model = None
+            
+            # Renewed a minute early so requests never reference expired content;
+            # prefixes of older schemas are dropped once they expire
+            now = time.time()
+            self.cached_models = {
+                other: entry for other, entry in self.cached_models.items() if entry[1] > now
+            }
+            self.cached_models[key] = (model, now + GEMINI_CACHE_TTL - 60)
+            return model
     
     def generate_sql(self, question, schema, sample_data=None):
         """Generate SQL query using Gemini"""
         prompt = self._create_sql_prompt(question, schema, sample_data)
         
-        response = self.model_client.generate_content(prompt)
+        with genai_session(self.api_key):
+            model = self._cached_model(prompt)
+            if model is not None:
+                response = model.generate_content(prompt.question)
+            else:
+                response = self.model_client.generate_content(prompt.text)
         sql_query = response.text
         
+        usage = getattr(response, 'usage_metadata', None)
+        if usage:
+            record_usage(usage.prompt_token_count, getattr(usage, 'cached_content_token_count', 0))
+        
         # Extract just the SQL query from the response
         return self._extract_sql(sql_query)
     
     def explain_results(self, question, sql_query, query_results):
         """Explain query results using Gemini"""
-        prompt = f"""
-        Question: {question}
-        
-        SQL Query: {sql_query}
-        
-        Query Results: {query_results}
-        
-        Please explain these results in simple terms that answer the original question.
-        """
+        prompt = self._create_explain_prompt(question, sql_query, query_results)
         
-        response = self.model_client.generate_content(prompt)
+        with genai_session(self.api_key):
+            response = self.model_client.generate_content(prompt)
         explanation = response.text
         
         return explanation
     
-    def _create_sql_prompt(self, question, schema, sample_data=None):
-        """Create prompt for SQL generation"""
-        prompt = f"""
-        You are an expert SQL query generator. I need you to create a SQL query based on the following:
-        
-        Question: {question}
-        
-        Database Schema:
-        {schema}
-        """
-        
-        if sample_data:
-            prompt += f"""
-            Sample Data:
-            {sample_data}
-            """
-        
-        prompt += """
-        Please generate a SQL query that answers the question. Return only the SQL query without any explanations.
-        """
-        
-        return prompt
+    def explain_results_stream(self, question, sql_query, query_results):
+        """Stream an explanation of query results from Gemini"""
+        prompt = self._create_explain_prompt(question, sql_query, query_results)
+        
+        with genai_session(self.api_key):
+            for chunk in self.model_client.generate_content(prompt, stream=True):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. only safety ratings) carry nothing to show
+                    continue
+                if text:
+                    yield text
     
     def _extract_sql(self, response):
         """Extract SQL query from model response"""
@@ -326,16 +454,45 @@ class GeminiProvider(LLMProvider):
         # If all else fails, return the whole response
         return response
 
-def get_provider(provider_name, api_key=None, model=None):
-    """Factory function to get the appropriate LLM provider"""
+def get_provider(provider_name, api_key=None, model=None, use_cache=True, resilient=True, backup=None):
+    """
+    Factory function to get the appropriate LLM provider
+    
+    Providers are shared per (provider, model, API key) across requests.
+    Unless resilient is False, calls get a deadline and retries (see
+    ResilientLLMProvider), and slow calls are hedged to backup, a provider
+    from get_provider(..., use_cache=False, resilient=False), if given.
+    Unless use_cache is False, the provider is wrapped so that repeated SQL
+    generation is served from the process-wide SQL cache.
+    """
     if provider_name.lower() == "bedrock":
         model = model or "anthropic.claude-3-sonnet-20240229-v1:0"
-        return BedrockClaudeProvider(api_key, model)
+        provider_class = BedrockClaudeProvider
     elif provider_name.lower() == "openai":
         model = model or "gpt-4o-mini"
-        return OpenAIProvider(api_key, model)
+        provider_class = OpenAIProvider
     elif provider_name.lower() == "gemini":
         model = model or "gemini-1.5-pro"
-        return GeminiProvider(api_key, model)
+        provider_class = GeminiProvider
     else:
         raise ValueError(f"Unsupported provider: {provider_name}")
+    
+    provider = memoize(
+        'provider',
+        (provider_name.lower(), model, fingerprint(api_key)),
+        lambda: provider_class(api_key, model)
+    )
+    
+    if resilient:
+        # Imported here because the resilience module builds on LLMProvider
+        from src.models.llm_resilience import ResilientLLMProvider
+        provider = ResilientLLMProvider(provider, backup=backup)
+    
+    if use_cache:
+        # Imported here because the cache module builds on LLMProvider
+        from src.models.llm_cache import CachedLLMProvider, get_default_sql_cache
+        cache = get_default_sql_cache()
+        if cache is not None:
+            return CachedLLMProvider(provider, provider_name.lower(), model, cache)
+    
+    return provider
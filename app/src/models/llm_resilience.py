@@ -0,0 +1,249 @@
+"""
+LLM Resilience Module for Text-to-SQL Chatbot
+Gives LLM calls a deadline, retries throttled calls with jittered backoff,
+optionally hedges slow calls to a backup provider, and keeps latency
+histograms per provider
+"""
+
+import os
+import random
+import asyncio
+import threading
+from src.models.llm_provider import LLM_TIMEOUT, LLMProvider
+
+# Retries of a throttled or temporarily failing call
+DEFAULT_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '3'))
+
+# Backoff before the first retry; it doubles per retry, with full jitter
+RETRY_BASE_SECONDS = float(os.environ.get('LLM_RETRY_BASE_SECONDS', '0.5'))
+
+# Longest backoff between retries
+RETRY_MAX_SECONDS = float(os.environ.get('LLM_RETRY_MAX_SECONDS', '4'))
+
+# Seconds without an answer before a hedged request goes to the backup provider
+DEFAULT_HEDGE_DELAY = float(os.environ.get('LLM_HEDGE_DELAY_SECONDS', '3'))
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 20000, 30000)
+
+# Error codes SDKs use for throttling and temporary unavailability
+_RETRYABLE_CODES = {
+    'ThrottlingException', 'TooManyRequestsException', 'ServiceUnavailableException',
+    'ModelNotReadyException', 'InternalServerException', 'ModelTimeoutException',
+}
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+class LLMTimeoutError(TimeoutError):
+    """Raised when an LLM call does not finish before its deadline"""
+    pass
+
+def is_retryable(error):
+    """
+    Check whether an SDK error is throttling or a temporary failure
+
+    Covers botocore ClientErrors (error code), OpenAI errors (status_code)
+    and Google API errors (code) without importing the SDKs.
+    """
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        if response.get('Error', {}).get('Code') in _RETRYABLE_CODES:
+            return True
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    if status in _RETRYABLE_STATUS:
+        return True
+    # Connection errors and read timeouts of the SDKs' HTTP clients
+    return isinstance(error, (ConnectionError, TimeoutError)) or 'Timeout' in type(error).__name__
+
+class LatencyHistogram:
+    """Call latencies in fixed buckets, with counts of failures"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        """Initialize empty buckets"""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total_ms = 0.0
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.lock = threading.Lock()
+
+    def observe(self, elapsed_ms):
+        """Record the latency of a successful call"""
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if elapsed_ms <= bound:
+                index = i
+                break
+        with self.lock:
+            self.counts[index] += 1
+            self.total_ms += elapsed_ms
+
+    def count(self, outcome):
+        """Count an 'errors', 'timeouts', 'retries', 'hedged' or 'hedge_wins' event"""
+        with self.lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def _quantile(self, counts, q):
+        """Estimate a quantile as the upper bound of the bucket it falls in"""
+        target = q * sum(counts)
+        seen = 0
+        for i, count in enumerate(counts):
+            seen += count
+            if count and seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else None
+        return None
+
+    def snapshot(self):
+        """
+        Get the histogram
+
+        Returns:
+            dict: Bucket counts keyed by upper bound ('+Inf' for the last),
+            call count, mean and estimated p50/p95/p99 in milliseconds (None
+            above the largest bucket), and failure counters
+        """
+        with self.lock:
+            counts = list(self.counts)
+            total_ms = self.total_ms
+            counters = {
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'retries': self.retries,
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+            }
+        calls = sum(counts)
+        labels = [str(bound) for bound in self.buckets] + ['+Inf']
+        return dict({
+            'buckets_ms': dict(zip(labels, counts)),
+            'count': calls,
+            'mean_ms': round(total_ms / calls, 1) if calls else None,
+            'p50_ms': self._quantile(counts, 0.5),
+            'p95_ms': self._quantile(counts, 0.95),
+            'p99_ms': self._quantile(counts, 0.99),
+        }, **counters)
+
+def get_histogram(provider_name, model, operation):
+    """Get the process-wide latency histogram of a provider, model and operation"""
+    key = f"{provider_name}/{model}/{operation}"
+    with _histograms_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = LatencyHistogram()
+        return histogram
+
+def latency_stats():
+    """Get every latency histogram, keyed by provider/model/operation"""
+    with _histograms_lock:
+        histograms = dict(_histograms)
+    return {key: histogram.snapshot() for key, histogram in sorted(histograms.items())}
+
+class ResilientLLMProvider(LLMProvider):
+    """
+    LLMProvider wrapper that bounds, retries and hedges calls
+
+    Each call has a deadline of timeout seconds in total. Throttled and
+    temporarily failing calls are retried with exponential backoff and
+    full jitter while the deadline allows. With a backup provider, a call
+    that has not answered after hedge_delay seconds (or has failed) is also
+    sent to the backup, and whichever answers first wins.
+    """
+
+    def __init__(self, provider, backup=None, timeout=LLM_TIMEOUT,
+                 hedge_delay=DEFAULT_HEDGE_DELAY, max_retries=DEFAULT_MAX_RETRIES):
+        """Wrap a provider and, optionally, a backup provider"""
+        self.provider = provider
+        self.backup = backup
+        self.timeout = timeout
+        self.hedge_delay = hedge_delay
+        self.max_retries = max_retries
+
+    def generate_sql(self, question, schema, sample_data=None):
+        """Generate SQL within the deadline"""
+        return asyncio.run(self.agenerate_sql(question, schema, sample_data))
+
+    def explain_results(self, question, sql_query, query_results):
+        """Explain query results within the deadline"""
+        return asyncio.run(self.aexplain_results(question, sql_query, query_results))
+
+    def explain_results_stream(self, question, sql_query, query_results):
+        """Stream an explanation with the wrapped provider (not hedged)"""
+        return self.provider.explain_results_stream(question, sql_query, query_results)
+
+    async def agenerate_sql(self, question, schema, sample_data=None):
+        """Generate SQL within the deadline, without blocking the event loop"""
+        return await self._call('generate_sql', question, schema, sample_data)
+
+    async def aexplain_results(self, question, sql_query, query_results):
+        """Explain query results within the deadline, without blocking the event loop"""
+        return await self._call('explain_results', question, sql_query, query_results)
+
+    async def _attempt(self, provider, operation, deadline, *args):
+        """Call one provider, retrying retryable errors until the deadline"""
+        loop = asyncio.get_running_loop()
+        histogram = get_histogram(provider.name, provider.model, operation)
+        method = getattr(provider, 'a' + operation)
+        retries = 0
+
+        while True:
+            started = loop.time()
+            try:
+                result = await asyncio.wait_for(method(*args), max(0.0, deadline - started))
+            except asyncio.TimeoutError:
+                histogram.count('timeouts')
+                raise LLMTimeoutError(
+                    f"{provider.name} did not answer within {self.timeout:g} seconds"
+                )
+            except Exception as e:
+                delay = random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** retries))
+                if (not is_retryable(e) or retries >= self.max_retries
+                        or loop.time() + delay >= deadline):
+                    histogram.count('errors')
+                    raise
+                print(f"Retrying {provider.name} {operation} in {delay:.2f}s: {str(e)}")
+                histogram.count('retries')
+                retries += 1
+                await asyncio.sleep(delay)
+                continue
+
+            histogram.observe((loop.time() - started) * 1000)
+            return result
+
+    async def _call(self, operation, *args):
+        """Call the provider, hedging to the backup when it is slow or fails"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        primary = asyncio.ensure_future(self._attempt(self.provider, operation, deadline, *args))
+        if self.backup is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay)
+        if done and primary.exception() is None:
+            return primary.result()
+
+        histogram = get_histogram(self.provider.name, self.provider.model, operation)
+        histogram.count('hedged')
+        backup = asyncio.ensure_future(self._attempt(self.backup, operation, deadline, *args))
+        pending = {backup} if done else {primary, backup}
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if task is backup:
+                        histogram.count('hedge_wins')
+                    return task.result()
+
+        # Both failed; the primary's error is the one to report
+        raise primary.exception()
+
+    def __getattr__(self, name):
+        # Expose anything else the wrapped provider offers
+        return getattr(self.provider, name)
@@ -0,0 +1,185 @@
+"""
+Partition Cache Module for Text-to-SQL Chatbot
+Keeps downloaded S3 partitions on local disk so warm containers can reuse them
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+
+# Lambda only allows writes under /tmp, which survives between warm invocations
+CACHE_ROOT = os.environ.get(
+    'CACHE_ROOT',
+    '/tmp/text-to-sql-cache' if os.environ.get('AWS_LAMBDA_FUNCTION_NAME') else None
+)
+
+# Byte budget for cached partitions before least-recently-used files are evicted
+DEFAULT_MAX_BYTES = int(os.environ.get('PARTITION_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+class PartitionCache:
+    """On-disk LRU cache for immutable S3 objects, keyed by bucket, key and ETag"""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        """Initialize the cache in the given directory with a byte budget"""
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, bucket, key, etag, suffix=''):
+        """Build the cache file path for an object version"""
+        digest = hashlib.sha256(f"{bucket}/{key}@{etag}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest + suffix)
+
+    def open(self, bucket, key, etag, suffix=''):
+        """
+        Open a cached object for reading
+
+        Args:
+            bucket (str): S3 bucket name
+            key (str): S3 object key
+            etag (str): ETag from the listing, so a rewritten object misses
+            suffix (str): Variant of the object (e.g. a converted format)
+
+        Returns:
+            file object or None: Open binary file on a hit, None on a miss
+        """
+        path = self._path(bucket, key, etag, suffix)
+        try:
+            handle = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+
+        # Refresh the modification time so eviction sees this entry as recent
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return handle
+
+    def path(self, bucket, key, etag, suffix=''):
+        """
+        Get the path of a cached object for readers that need a file name
+        (e.g. to memory-map it)
+
+        Returns:
+            str or None: Path on a hit, None on a miss
+        """
+        path = self._path(bucket, key, etag, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except OSError:
+            pass
+
+        return path
+
+    def put_stream(self, bucket, key, etag, stream, suffix=''):
+        """
+        Copy a readable stream into the cache
+
+        The data is written to a temporary file and atomically renamed, so
+        concurrent readers never see a partially written entry.
+
+        Args:
+            bucket (str): S3 bucket name
+            key (str): S3 object key
+            etag (str): ETag of the object version being stored
+            stream: Readable binary file-like object
+            suffix (str): Variant of the object (e.g. a converted format)
+
+        Returns:
+            str: Path of the cached file
+        """
+        path = self._path(bucket, key, etag, suffix)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                shutil.copyfileobj(stream, out, 1024 * 1024)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.evict()
+        return path
+
+    def reserve(self):
+        """
+        Get a temporary file path in the cache directory for writers that
+        need a path rather than a stream. Pass it to commit() once written.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        return tmp_path
+
+    def commit(self, tmp_path, bucket, key, etag, suffix=''):
+        """Atomically move a file written to a reserved path into the cache"""
+        path = self._path(bucket, key, etag, suffix)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def discard(self, bucket, key, etag, suffix=''):
+        """Remove an object version from the cache if present"""
+        try:
+            os.remove(self._path(bucket, key, etag, suffix))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits its budget"""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.is_file() or entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+def get_default_cache():
+    """
+    Get the process-wide partition cache
+
+    The cache directory comes from PARTITION_CACHE_DIR, or a subdirectory of
+    CACHE_ROOT (which defaults to /tmp on Lambda). Returns None when neither
+    is configured, which disables caching.
+    """
+    global _default_cache
+
+    cache_dir = os.environ.get('PARTITION_CACHE_DIR')
+    if not cache_dir and CACHE_ROOT:
+        cache_dir = os.path.join(CACHE_ROOT, 'partitions')
+
+    if not cache_dir:
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PartitionCache(cache_dir)
+        return _default_cache
@@ -0,0 +1,253 @@
+"""
+Partition Manifest Module for Text-to-SQL Chatbot
+Maintains a compact, incrementally refreshed index of the daily partitions in
+a dataset prefix, so queries can be planned without listing S3 per day
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from src.models import columnar
+from src.models.partition_cache import CACHE_ROOT
+
+# A daily CSV partition, with the key of its Parquet copy when one is current
+Partition = namedtuple('Partition', ['key', 'etag', 'size', 'columnar_key'])
+
+# Seconds before the manifest is refreshed from S3
+DEFAULT_TTL = int(os.environ.get('MANIFEST_TTL_SECONDS', '300'))
+
+# Seconds between refreshes that re-list every month, not just new and recent ones
+DEFAULT_FULL_REFRESH = int(os.environ.get('MANIFEST_FULL_REFRESH_SECONDS', '86400'))
+
+_MONTH_PREFIX = re.compile(r'year=(\d{4})/month=(\d{2})/$')
+_DAY_OBJECT = re.compile(r'year=(\d{4})/month=(\d{2})/day=(\d{2})/([^/]+)$')
+
+# Manifests already loaded by this process
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+class PartitionManifest:
+    """
+    Index of day -> partition objects for one dataset prefix
+
+    Months are stored as {"YYYY-MM": {"days": {"DD": [[name, size, etag,
+    modified], ...]}, "columnar": {"DD": {name: modified}}}} with names
+    relative to the day prefix, which keeps the persisted index small.
+    """
+
+    def __init__(self, s3_client, bucket_name, base_path, columnar_path='',
+                 max_workers=8, ttl=DEFAULT_TTL, full_refresh=DEFAULT_FULL_REFRESH):
+        """Initialize an empty manifest; call refresh() to populate it"""
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.base_path = base_path
+        self.columnar_path = columnar_path
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.full_refresh = full_refresh
+        self.months = {}
+        self.refreshed_at = 0
+        self.full_refreshed_at = 0
+        self._lock = threading.Lock()
+
+        self.local_path = None
+        if CACHE_ROOT:
+            digest = hashlib.sha256(
+                f"{bucket_name}/{base_path}|{columnar_path}".encode('utf-8')
+            ).hexdigest()
+            self.local_path = os.path.join(CACHE_ROOT, 'manifest', f"{digest}.json")
+
+    @classmethod
+    def for_dataset(cls, s3_client, bucket_name, base_path, columnar_path='', max_workers=8):
+        """
+        Get the process-wide manifest for a dataset, loading any persisted copy
+
+        The manifest outlives the S3DataAccess that created it, so warm
+        containers keep planning from it until its TTL expires.
+        """
+        key = (bucket_name, base_path, columnar_path)
+        with _loaded_lock:
+            manifest = _loaded.get(key)
+            if manifest is None:
+                manifest = cls(s3_client, bucket_name, base_path, columnar_path, max_workers)
+                manifest._load_local()
+                _loaded[key] = manifest
+        return manifest
+
+    def _load_local(self):
+        """Load the manifest persisted in the local cache, if any"""
+        if not self.local_path or not os.path.exists(self.local_path):
+            return
+        try:
+            with open(self.local_path) as handle:
+                data = json.load(handle)
+        except (OSError, ValueError) as e:
+            print(f"Error reading partition manifest: {str(e)}")
+            return
+
+        self.months = data.get('months', {})
+        self.refreshed_at = data.get('refreshed_at', 0)
+        self.full_refreshed_at = data.get('full_refreshed_at', 0)
+
+    def _save_local(self):
+        """Persist the manifest to the local cache"""
+        if not self.local_path:
+            return
+        os.makedirs(os.path.dirname(self.local_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.local_path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as handle:
+            json.dump({
+                'months': self.months,
+                'refreshed_at': self.refreshed_at,
+                'full_refreshed_at': self.full_refreshed_at,
+            }, handle, separators=(',', ':'))
+        os.replace(tmp_path, self.local_path)
+
+    def _list_prefixes(self, prefix):
+        """List the common prefixes one level below a prefix, across all pages"""
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        prefixes = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter='/'):
+            prefixes.extend(item['Prefix'] for item in page.get('CommonPrefixes', []))
+        return prefixes
+
+    def _list_objects(self, prefix):
+        """List every object under a prefix, across all pages"""
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        objects = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            objects.extend(page.get('Contents', []))
+        return objects
+
+    def _list_month(self, month_path):
+        """
+        List one month of CSV partitions and their Parquet copies
+
+        Args:
+            month_path (str): Path relative to the dataset prefix, e.g. year=2025/month=01/
+
+        Returns:
+            dict: Month entry for the index
+        """
+        days = {}
+        for obj in self._list_objects(self.base_path + month_path):
+            match = _DAY_OBJECT.search(obj['Key'])
+            if not match or not obj['Key'].endswith('.csv.gz'):
+                continue
+            days.setdefault(match.group(3), []).append([
+                match.group(4), obj.get('Size'), obj.get('ETag'), obj['LastModified'].timestamp()
+            ])
+
+        copies = {}
+        if self.columnar_path and days:
+            for obj in self._list_objects(self.columnar_path + month_path):
+                match = _DAY_OBJECT.search(obj['Key'])
+                if match:
+                    copies.setdefault(match.group(3), {})[match.group(4)] = obj['LastModified'].timestamp()
+
+        for entries in days.values():
+            entries.sort()
+        return {'days': days, 'columnar': copies}
+
+    def refresh(self, force=False):
+        """
+        Bring the index up to date if its TTL has expired
+
+        Year and month prefixes are discovered with delimiter listings, then
+        months are listed concurrently with full pagination. Between full
+        refreshes, only months that are new or the latest indexed month are
+        re-listed, since older daily partitions do not change.
+
+        Args:
+            force (bool): Refresh even if the TTL has not expired
+        """
+        with self._lock:
+            now = time.time()
+            if not force and self.months and now - self.refreshed_at < self.ttl:
+                return
+
+            full = force or now - self.full_refreshed_at >= self.full_refresh
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                years = self._list_prefixes(self.base_path)
+                month_paths = []
+                for prefixes in executor.map(self._list_prefixes, years):
+                    for prefix in prefixes:
+                        match = _MONTH_PREFIX.search(prefix)
+                        if match:
+                            month_paths.append((f"{match.group(1)}-{match.group(2)}", prefix[len(self.base_path):]))
+
+                latest = max(self.months) if self.months else None
+                stale = [
+                    (month, path) for month, path in month_paths
+                    if full or month not in self.months or (latest and month >= latest)
+                ]
+                listed = executor.map(lambda item: self._list_month(item[1]), stale)
+                months = dict(self.months)
+                for (month, _), entry in zip(stale, listed):
+                    months[month] = entry
+
+            # Months whose prefixes disappeared are dropped
+            current = {month for month, _ in month_paths}
+            self.months = {month: entry for month, entry in months.items() if month in current}
+            self.refreshed_at = now
+            if full:
+                self.full_refreshed_at = now
+            self._save_local()
+
+    def days(self):
+        """Get every day that has at least one partition, in order"""
+        result = []
+        for month, entry in self.months.items():
+            year, month_number = month.split('-')
+            for day in entry['days']:
+                result.append(datetime(int(year), int(month_number), int(day)))
+        return sorted(result)
+
+    def date_range(self):
+        """
+        Get the first and last day with data
+
+        Returns:
+            tuple: (datetime, datetime), or (None, None) if there is no data
+        """
+        days = self.days()
+        if not days:
+            return None, None
+        return days[0], days[-1]
+
+    def partitions_for(self, date):
+        """
+        Get the partitions of one day
+
+        A Parquet copy is used only if it was written after its CSV.
+
+        Returns:
+            list: Partition tuples sorted by key
+        """
+        entry = self.months.get(f"{date.year}-{date.month:02d}")
+        if not entry:
+            return []
+
+        day = f"{date.day:02d}"
+        day_path = f"year={date.year}/month={date.month:02d}/day={day}/"
+        copies = entry.get('columnar', {}).get(day, {})
+
+        partitions = []
+        for name, size, etag, modified in entry['days'].get(day, []):
+            key = self.base_path + day_path + name
+            columnar_key = None
+            if self.columnar_path:
+                candidate = columnar.columnar_key_for(key, self.base_path, self.columnar_path)
+                copy_modified = copies.get(candidate[len(self.columnar_path + day_path):])
+                if copy_modified is not None and copy_modified >= modified:
+                    columnar_key = candidate
+            partitions.append(Partition(key, etag, size, columnar_key))
+        return partitions
@@ -0,0 +1,138 @@
+"""
+Partition Workers Module for Text-to-SQL Chatbot
+Loads partitions in worker processes, so parsing, filtering and per-partition
+queries use every core, and returns their frames as Arrow IPC buffers
+"""
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.models.serialization import arrow_stream
+
+# Worker processes that load partitions; 0 loads them on threads in the
+# request's process. Lambda has no /dev/shm, so pools fail there and loading
+# falls back to threads.
+DEFAULT_PROCESS_WORKERS = int(os.environ.get('PARTITION_PROCESS_WORKERS', '0'))
+
+# How worker processes start: 'forkserver' or 'spawn'. Both start workers from
+# a fresh single-threaded process, so they never inherit the app's threads,
+# held locks or open connections as forked workers would.
+START_METHOD = os.environ.get('PARTITION_PROCESS_START', 'forkserver').lower()
+
+# Imported by the fork server before it starts workers, so each worker does
+# not import pandas, pyarrow and duckdb again
+_PRELOAD = ['src.models.s3_data_access']
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# The worker process's S3DataAccess, built once by _init_worker
+_access = None
+
+def _context():
+    """Get the multiprocessing context workers are started with"""
+    methods = multiprocessing.get_all_start_methods()
+    method = START_METHOD if START_METHOD in ('forkserver', 'spawn') else 'forkserver'
+    if method not in methods:
+        method = 'spawn'
+    context = multiprocessing.get_context(method)
+    if method == 'forkserver':
+        context.set_forkserver_preload(_PRELOAD)
+    return context
+
+def get_pool(workers, dataset):
+    """
+    Get the shared worker pool of a dataset, starting it on first use
+
+    Args:
+        workers (int): Worker processes
+        dataset (tuple): (bucket_name, base_path, columnar_path,
+            partition_date_columns) the workers read
+
+    Returns:
+        ProcessPoolExecutor or None: The pool, or None when processes cannot
+        be started here
+    """
+    key = (workers,) + dataset
+    with _pools_lock:
+        if key not in _pools:
+            try:
+                _pools[key] = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=_context(),
+                    initializer=_init_worker, initargs=dataset
+                )
+            except (OSError, ValueError, NotImplementedError, ImportError) as e:
+                print(f"Error starting partition worker processes, loading on threads: {str(e)}")
+                _pools[key] = None
+        return _pools[key]
+
+def discard_pool(workers, dataset):
+    """Forget a pool whose workers died, so the next request starts a new one"""
+    with _pools_lock:
+        pool = _pools.pop((workers,) + dataset, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def submit(pool, partition, columns=None, predicates=None, query=None, column_types=None):
+    """
+    Queue a partition load on a pool
+
+    Raises:
+        BrokenProcessPool: If the pool's processes cannot be started
+    """
+    try:
+        return pool.submit(load_partition, partition, columns, predicates, query, column_types)
+    except OSError as e:
+        raise BrokenProcessPool(str(e))
+
+def _init_worker(bucket_name, base_path, columnar_path, partition_date_columns):
+    """Build the worker process's data access object"""
+    global _access
+    # Imported here; s3_data_access imports this module
+    from src.models.s3_data_access import S3DataAccess
+    _access = S3DataAccess(
+        bucket_name, base_path, max_workers=1, columnar_path=columnar_path,
+        partition_date_columns=list(partition_date_columns), process_workers=0
+    )
+    # The pool supplies the parallelism, so each worker's queries use one thread
+    _access.sql_engine.threads = 1
+
+def load_partition(partition, columns=None, predicates=None, query=None, column_types=None):
+    """
+    Load and compact one partition in a worker process, optionally running
+    a query on it
+
+    Args:
+        partition (Partition): Partition to load
+        columns (list, optional): Columns to load; all columns when None
+        predicates (list, optional): sql_analysis.Predicate filters
+        query (str, optional): SQL run on the partition before it is returned
+        column_types (dict, optional): The request's pinned column types, so
+            workers never parse against a stale catalog
+
+    Returns:
+        tuple: (Arrow IPC stream or the frame itself when Arrow cannot
+        encode it, rows loaded, query execution ms, bytes of the loaded
+        partition)
+
+    Raises:
+        QueryError: If the query fails
+    """
+    import pyarrow as pa
+    df, rows, elapsed_ms, nbytes = _access._load_partition(
+        partition, columns, predicates, query, column_types
+    )
+    try:
+        return arrow_stream(df), rows, elapsed_ms, nbytes
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return df, rows, elapsed_ms, nbytes
+
+def to_frame(data):
+    """Decode a frame returned by load_partition, reading the buffer in place"""
+    if not isinstance(data, bytes):
+        return data
+    import pyarrow as pa
+    table = pa.ipc.open_stream(pa.py_buffer(data)).read_all()
+    return table.to_pandas(date_as_object=False, coerce_temporal_nanoseconds=True)
@@ -0,0 +1,74 @@
+"""
+Prompt Builder Module for Text-to-SQL Chatbot
+Builds the SQL generation prompt shared by all providers, with the
+instructions, schema and sample rows as a stable prefix that providers can
+cache, and counts how much of each prompt was served from provider caches
+"""
+
+import hashlib
+import threading
+
+# Instructions at the start of every SQL generation prompt
+SQL_INSTRUCTIONS = (
+    "You are an expert SQL query generator. Write one SQL query that answers the "
+    "user's question about the table below. Return only the SQL query without any "
+    "explanations."
+)
+
+_usage = {'requests': 0, 'input_tokens': 0, 'cached_tokens': 0}
+_usage_lock = threading.Lock()
+
+class SQLPrompt:
+    """A SQL generation prompt split into a cacheable prefix and the question"""
+
+    def __init__(self, prefix, question):
+        """Initialize from the prefix text and the question"""
+        self.prefix = prefix
+        self.question = f"Question: {question}"
+
+    @property
+    def prefix_key(self):
+        """Hash identifying the prefix, e.g. to reuse a cache created for it"""
+        return hashlib.sha256(self.prefix.encode('utf-8')).hexdigest()
+
+    @property
+    def text(self):
+        """The whole prompt, for providers that take a single string"""
+        return f"{self.prefix}\n\n{self.question}"
+
+def build_sql_prompt(question, schema, sample_data=None):
+    """
+    Build the prompt for SQL generation
+
+    Everything that is the same for every question on a dataset comes first,
+    so repeat questions share a prefix that provider caches can match.
+
+    Args:
+        question (str): Natural language question
+        schema (str): Schema description
+        sample_data (str, optional): Sample rows
+
+    Returns:
+        SQLPrompt: The prompt
+    """
+    sections = [SQL_INSTRUCTIONS, schema.strip()]
+    if sample_data:
+        sections.append(f"Sample rows:\n{sample_data.strip()}")
+    return SQLPrompt('\n\n'.join(sections), question)
+
+def record_usage(input_tokens, cached_tokens):
+    """Count the input tokens of a request and how many were read from a prompt cache"""
+    with _usage_lock:
+        _usage['requests'] += 1
+        _usage['input_tokens'] += int(input_tokens or 0)
+        _usage['cached_tokens'] += int(cached_tokens or 0)
+
+def prompt_cache_stats():
+    """
+    Get SQL generation token counts since the process started
+
+    Returns:
+        dict: Requests, input tokens, and input tokens read from prompt caches
+    """
+    with _usage_lock:
+        return dict(_usage)
@@ -0,0 +1,228 @@
+"""
+Result Cache Module for Text-to-SQL Chatbot
+Caches query results keyed by the SQL and the exact partition versions it read,
+so repeated queries skip both loading and execution until new data arrives
+"""
+
+import io
+import os
+import json
+import hashlib
+import threading
+import pyarrow as pa
+from collections import OrderedDict
+from src.models.partition_cache import CACHE_ROOT, PartitionCache
+from src.models.sql_analysis import tokenize
+
+# Byte budget for compressed results held in memory; 1/32 of the Lambda
+# function's memory there, as it comes out of the same memory as the request's frames
+_lambda_mb = int(os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE', '0'))
+DEFAULT_MAX_BYTES = int(os.environ.get(
+    'RESULT_CACHE_MAX_BYTES', str((_lambda_mb // 32 or 32) * 1024 * 1024)
+))
+
+# Byte budget for results spilled to the local cache directory
+DEFAULT_MAX_DISK_BYTES = int(os.environ.get('RESULT_CACHE_DISK_MAX_BYTES', str(128 * 1024 * 1024)))
+
+# Results larger than this many bytes (compressed) are not cached
+DEFAULT_MAX_ENTRY_BYTES = int(os.environ.get('RESULT_CACHE_MAX_ENTRY_BYTES', str(8 * 1024 * 1024)))
+
+# Set RESULT_CACHE=none to disable the cache
+ENABLED = os.environ.get('RESULT_CACHE', '').lower() != 'none'
+
+# Suffix of cached results in the local cache directory
+RESULT_SUFFIX = '.arrows'
+
+# Keywords uppercased when normalizing SQL; identifiers keep their spelling
+# because DuckDB returns result column names as written. Words DuckDB also
+# accepts as column names (DATE, TIMESTAMP, INTERVAL, BETWEEN, ...) are left
+# out, since uppercasing such a column would change the result's column names.
+_KEYWORDS = {
+    'SELECT', 'DISTINCT', 'FROM', 'WHERE', 'AND', 'OR', 'NOT', 'IN', 'IS', 'NULL',
+    'LIKE', 'ILIKE', 'AS', 'GROUP', 'BY', 'ORDER', 'ASC', 'DESC', 'LIMIT',
+    'OFFSET', 'HAVING', 'CASE', 'WHEN', 'THEN', 'ELSE', 'JOIN', 'LEFT', 'RIGHT',
+    'INNER', 'OUTER', 'ON', 'WITH', 'UNION', 'CAST', 'TRUE', 'FALSE',
+}
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def normalize_sql(sql):
+    """
+    Normalize SQL so formatting differences share a cache entry
+
+    Whitespace, comments and a trailing semicolon are dropped, keywords are
+    uppercased and function names lowercased. String literals, quoted
+    identifiers and column names are kept exactly.
+    """
+    tokens = tokenize(sql.strip().rstrip(';'))
+    parts = []
+    for i, token in enumerate(tokens):
+        calls = i + 1 < len(tokens) and tokens[i + 1].value == '('
+        if token.kind == 'string':
+            parts.append("'" + token.value.replace("'", "''") + "'")
+        elif token.kind == 'quoted':
+            parts.append('"' + token.value.replace('"', '""') + '"')
+        elif token.kind == 'ident' and token.value.upper() in _KEYWORDS:
+            parts.append(token.value.upper())
+        elif token.kind == 'ident' and calls:
+            # DuckDB lowercases function names in result column names too
+            parts.append(token.value.lower())
+        else:
+            parts.append(token.value)
+    return ' '.join(parts)
+
+def serialize_result(df):
+    """
+    Serialize a result frame as a compressed Arrow IPC stream
+
+    Returns:
+        bytes: Stream contents
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    options = pa.ipc.IpcWriteOptions(compression='zstd')
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+def deserialize_result(data):
+    """Read a frame back from serialize_result() output"""
+    return pa.ipc.open_stream(pa.BufferReader(data)).read_all().to_pandas()
+
+class ResultCache:
+    """
+    Two-tier LRU cache of query results
+
+    Results are held as compressed Arrow buffers in memory and, when a cache
+    directory is given, also written to disk so they outlive the memory tier
+    and the process.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, cache_dir=None,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES, max_entry_bytes=DEFAULT_MAX_ENTRY_BYTES):
+        """Initialize an empty cache with its byte budgets"""
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.disk = PartitionCache(cache_dir, max_disk_bytes) if cache_dir else None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(bucket_name, sql_query, partitions):
+        """
+        Build a cache key from the normalized SQL and the partitions it read
+
+        Args:
+            bucket_name (str): S3 bucket name
+            sql_query (str): SQL query
+            partitions (list): (key, etag) pairs of the partitions loaded
+
+        Returns:
+            str: Cache key
+        """
+        payload = json.dumps([bucket_name, normalize_sql(sql_query), sorted(partitions)])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _remember(self, key, data):
+        """Add a buffer to the memory tier, evicting least recently used ones"""
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get(self, key):
+        """
+        Look up a cached result, counting the hit or miss
+
+        Returns:
+            pandas.DataFrame or None: Result on a hit, None on a miss
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+
+        if data is None and self.disk:
+            handle = self.disk.open('results', key, '', RESULT_SUFFIX)
+            if handle is not None:
+                with handle:
+                    data = handle.read()
+                self._remember(key, data)
+
+        result = None
+        if data is not None:
+            try:
+                result = deserialize_result(data)
+            except Exception as e:
+                print(f"Error reading cached result: {str(e)}")
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def set(self, key, df):
+        """
+        Store a result unless it cannot be serialized or is over the entry limit
+
+        Returns:
+            bytes or None: The serialized result, for callers that store it
+            elsewhere too, or None if it could not be serialized
+        """
+        try:
+            data = serialize_result(df)
+        except Exception as e:
+            print(f"Error caching result: {str(e)}")
+            return None
+
+        if len(data) <= self.max_entry_bytes:
+            self.set_bytes(key, data)
+        return data
+
+    def set_bytes(self, key, data):
+        """Store an already serialized result"""
+        self._remember(key, data)
+        if self.disk:
+            try:
+                self.disk.put_stream('results', key, '', io.BytesIO(data), RESULT_SUFFIX)
+            except OSError as e:
+                print(f"Error writing cached result: {str(e)}")
+
+    def stats(self):
+        """Get hit/miss counters for this process"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+def get_default_result_cache():
+    """
+    Get the process-wide result cache
+
+    Results spill to a subdirectory of CACHE_ROOT when one is configured.
+    Returns None when RESULT_CACHE is "none".
+    """
+    global _default_cache
+
+    if not ENABLED:
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            cache_dir = os.path.join(CACHE_ROOT, 'results') if CACHE_ROOT else None
+            _default_cache = ResultCache(cache_dir=cache_dir)
+        return _default_cache
@@ -0,0 +1,155 @@
+"""
+Result Store Module for Text-to-SQL Chatbot
+Keeps query results server-side under a result ID so they can be served a
+page at a time instead of in one response
+"""
+
+import os
+import re
+import json
+import uuid
+import base64
+import threading
+from src.models.client_pool import get_aws_client
+from src.models.partition_cache import CACHE_ROOT
+from src.models.result_cache import ResultCache, deserialize_result, serialize_result
+
+# Rows per page when the client does not ask for a page size
+DEFAULT_PAGE_SIZE = int(os.environ.get('RESULT_PAGE_SIZE', '500'))
+
+# Largest page a client may ask for
+MAX_PAGE_SIZE = int(os.environ.get('RESULT_MAX_PAGE_SIZE', '5000'))
+
+# Byte budget for stored results held in memory; 1/16 of the Lambda function's
+# memory there, as it comes out of the same memory as the request's frames
+_lambda_mb = int(os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE', '0'))
+DEFAULT_MAX_BYTES = int(os.environ.get(
+    'RESULT_STORE_MAX_BYTES', str((_lambda_mb // 16 or 64) * 1024 * 1024)
+))
+
+# Byte budget for stored results in the local cache directory
+DEFAULT_MAX_DISK_BYTES = int(os.environ.get('RESULT_STORE_DISK_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# Prefix for copies in the data bucket, so any container can serve later pages
+# (needs s3:PutObject; expire the prefix with a lifecycle rule). Empty disables.
+S3_PREFIX = os.environ.get('RESULT_STORE_S3_PREFIX', '')
+
+# Result sets larger than this many bytes (compressed) are not stored
+DEFAULT_MAX_ENTRY_BYTES = int(os.environ.get('RESULT_STORE_MAX_ENTRY_BYTES', str(64 * 1024 * 1024)))
+
+_RESULT_ID = re.compile(r'^[0-9a-f]{32}$')
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def encode_cursor(offset):
+    """Encode the offset of the next page as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps({'offset': offset}).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor from encode_cursor()
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))['offset']
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError('Invalid cursor')
+    return offset
+
+def page_size_from(value):
+    """Clamp a requested page size, using the default when none is given"""
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+class ResultStore:
+    """Result sets held in the local cache and, optionally, the bucket"""
+
+    def __init__(self, cache, s3_prefix=S3_PREFIX):
+        """Initialize the store over a ResultCache"""
+        self.cache = cache
+        self.s3_prefix = s3_prefix
+
+    def _s3_key(self, result_id):
+        """Build the S3 key of a stored result"""
+        return f"{self.s3_prefix}{result_id}.arrows"
+
+    def save(self, df, bucket_name=None, data=None):
+        """
+        Store a result set
+
+        Args:
+            df (pandas.DataFrame): Query results
+            bucket_name (str, optional): Bucket for the shared copy
+            data (bytes, optional): df already serialized by serialize_result
+
+        Returns:
+            str or None: Result ID, or None if the results could not be stored
+        """
+        if data is None:
+            try:
+                data = serialize_result(df)
+            except Exception as e:
+                print(f"Error storing result: {str(e)}")
+                return None
+
+        if len(data) > self.cache.max_entry_bytes:
+            return None
+
+        result_id = uuid.uuid4().hex
+        self.cache.set_bytes(result_id, data)
+
+        if self.s3_prefix and bucket_name:
+            try:
+                get_aws_client('s3').put_object(
+                    Bucket=bucket_name, Key=self._s3_key(result_id), Body=data
+                )
+            except Exception as e:
+                print(f"Error writing result to S3: {str(e)}")
+        return result_id
+
+    def load(self, result_id, bucket_name=None):
+        """
+        Load a stored result set
+
+        Returns:
+            pandas.DataFrame or None: Results, or None if the ID is unknown
+            or has expired
+        """
+        if not _RESULT_ID.match(result_id or ''):
+            return None
+
+        df = self.cache.get(result_id)
+        if df is not None or not (self.s3_prefix and bucket_name):
+            return df
+
+        try:
+            response = get_aws_client('s3').get_object(
+                Bucket=bucket_name, Key=self._s3_key(result_id)
+            )
+            data = response['Body'].read()
+        except Exception:
+            return None
+
+        self.cache.set_bytes(result_id, data)
+        return deserialize_result(data)
+
+def get_default_result_store():
+    """Get the process-wide result store, spilling to CACHE_ROOT when set"""
+    global _default_store
+
+    with _default_store_lock:
+        if _default_store is None:
+            cache_dir = os.path.join(CACHE_ROOT, 'result-sets') if CACHE_ROOT else None
+            _default_store = ResultStore(ResultCache(
+                max_bytes=DEFAULT_MAX_BYTES,
+                cache_dir=cache_dir,
+                max_disk_bytes=DEFAULT_MAX_DISK_BYTES,
+                max_entry_bytes=DEFAULT_MAX_ENTRY_BYTES
+            ))
+        return _default_store
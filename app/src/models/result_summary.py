@@ -0,0 +1,170 @@
+"""
+Result Summary Module for Text-to-SQL Chatbot
+Turns a result set into a compact description for explanation prompts that
+fits a token budget: row counts, per-column statistics, top values and the
+first and last rows
+"""
+
+import os
+import math
+import threading
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+# Tokens the results section of an explanation prompt may use
+DEFAULT_TOKEN_BUDGET = int(os.environ.get('SUMMARY_TOKEN_BUDGET', '1500'))
+
+# Results with at most this many rows are shown in full when they fit the budget
+MAX_FULL_ROWS = int(os.environ.get('SUMMARY_MAX_FULL_ROWS', '50'))
+
+# Average characters per token of each provider's tokenizer on tabular text;
+# rough, but close enough to stay inside a budget
+CHARS_PER_TOKEN = {
+    'bedrock': 3.5,
+    'openai': 4.0,
+    'gemini': 4.0,
+}
+DEFAULT_CHARS_PER_TOKEN = 3.5
+
+# (head rows, tail rows, top values per column), tried in order until the
+# summary fits the budget
+_LEVELS = [(10, 5, 5), (5, 3, 3), (3, 1, 2), (2, 0, 1), (0, 0, 0)]
+
+# Rows rendered to estimate the size of the full result set
+_ESTIMATE_ROWS = 100
+
+# Longest value shown in column statistics
+_MAX_VALUE_CHARS = 40
+
+ResultSummary = namedtuple('ResultSummary', ['text', 'tokens', 'full_tokens'])
+
+_totals = {'summaries': 0, 'tokens': 0, 'full_tokens': 0}
+_totals_lock = threading.Lock()
+
+def estimate_tokens(text, provider_name=None):
+    """Estimate how many tokens a provider's tokenizer splits text into"""
+    chars_per_token = CHARS_PER_TOKEN.get((provider_name or '').lower(), DEFAULT_CHARS_PER_TOKEN)
+    return int(math.ceil(len(text) / chars_per_token))
+
+def _short(value):
+    """Render a value for column statistics, cutting long text"""
+    text = str(value)
+    if len(text) > _MAX_VALUE_CHARS:
+        text = text[:_MAX_VALUE_CHARS - 3] + '...'
+    return text
+
+def _number(value):
+    """Render a number for column statistics with at most six significant digits"""
+    if isinstance(value, (float, np.floating)):
+        return f"{value:.6g}"
+    return _short(value)
+
+def _column_stats(name, series, top_k):
+    """Describe one column in a single line"""
+    nulls = int(series.isna().sum())
+    parts = [f"{nulls} nulls"] if nulls else []
+    values = series.dropna()
+
+    if values.empty:
+        parts.append('no values')
+    elif pd.api.types.is_bool_dtype(series):
+        parts.append(f"{int(values.sum())} true, {int((~values.astype(bool)).sum())} false")
+    elif pd.api.types.is_numeric_dtype(series):
+        parts.append(f"min {_number(values.min())}, max {_number(values.max())}, "
+                     f"mean {values.mean():.6g}")
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        parts.append(f"from {_short(values.min())} to {_short(values.max())}")
+    else:
+        counts = values.astype(str).value_counts()
+        parts.append(f"{len(counts)} distinct")
+        if top_k:
+            top = ', '.join(f"{_short(value)} ({count})" for value, count in counts.head(top_k).items())
+            parts.append(f"top: {top}")
+
+    return f"- {name} ({series.dtype}): " + '; '.join(parts)
+
+def _render(df, head, tail, top_k):
+    """Build the summary text for one level of detail"""
+    lines = [f"{len(df)} rows x {len(df.columns)} columns", "Columns:"]
+    lines.extend(_column_stats(name, df[name], top_k) for name in df.columns)
+
+    if head:
+        lines.append(f"First {min(head, len(df))} rows:")
+        lines.append(df.head(head).to_string())
+    if tail and len(df) > head:
+        tail = min(tail, len(df) - head)
+        lines.append(f"Last {tail} rows:")
+        lines.append(df.tail(tail).to_string())
+    return '\n'.join(lines)
+
+def _full_tokens(df, provider_name):
+    """
+    Estimate the tokens of the whole result set rendered as a table
+
+    Only the first rows are rendered; the rest are assumed to be the same size.
+    """
+    if len(df) <= _ESTIMATE_ROWS:
+        return estimate_tokens(df.to_string(), provider_name)
+    sample = estimate_tokens(df.head(_ESTIMATE_ROWS).to_string(), provider_name)
+    return int(sample * len(df) / _ESTIMATE_ROWS)
+
+def _fit(text, budget, provider_name):
+    """Cut a summary down to the budget line by line, as a last resort"""
+    lines = text.split('\n')
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines + ['...']), provider_name) > budget:
+        lines.pop()
+    return '\n'.join(lines + ['...'])
+
+def summarize_results(df, provider_name=None, token_budget=None):
+    """
+    Summarize a result set for an explanation prompt
+
+    Small results are included whole. Larger ones are described by their
+    column statistics and first and last rows, with less detail until the
+    summary fits the budget.
+
+    Args:
+        df (pandas.DataFrame): Query results
+        provider_name (str, optional): Provider the prompt is for, used to
+            estimate tokens
+        token_budget (int, optional): Tokens the summary may use
+
+    Returns:
+        ResultSummary: Summary text, its estimated tokens, and the estimated
+        tokens of the full result set
+    """
+    budget = token_budget or DEFAULT_TOKEN_BUDGET
+    full_tokens = _full_tokens(df, provider_name)
+
+    text = None
+    if len(df) <= MAX_FULL_ROWS:
+        full = f"{len(df)} rows x {len(df.columns)} columns\n{df.to_string()}"
+        if estimate_tokens(full, provider_name) <= budget:
+            text = full
+
+    if text is None:
+        for head, tail, top_k in _LEVELS:
+            text = _render(df, head, tail, top_k)
+            if estimate_tokens(text, provider_name) <= budget:
+                break
+        else:
+            text = _fit(text, budget, provider_name)
+
+    summary = ResultSummary(text, estimate_tokens(text, provider_name), full_tokens)
+    with _totals_lock:
+        _totals['summaries'] += 1
+        _totals['tokens'] += summary.tokens
+        _totals['full_tokens'] += summary.full_tokens
+    return summary
+
+def summary_stats():
+    """
+    Get totals of estimated prompt sizes since the process started
+
+    Returns:
+        dict: Summaries built, and estimated tokens of the summaries and of
+        the full result sets they replaced
+    """
+    with _totals_lock:
+        return dict(_totals)
@@ -4,130 +4,852 @@ Handles access to gzipped CSV files stored in S3 buckets
 """
 
 import os
-import io
-import gzip
-import boto3
+import threading
 import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
+from src.models import columnar
+from src.models.client_pool import DEFAULT_AWS_POOL_CONNECTIONS, get_aws_client
+from src.models.csv_schema import (
+    DEFAULT_BLOCK_BYTES, SchemaViolation, conform_frame, convert_csv, narrow_integers, read_csv,
+    widen_integers
+)
+from src.models.frame_memory import (
+    MemoryBudget, MemoryBudgetExceeded, combine_frames, compact_frame, frame_bytes, process_memory
+)
+from src.models.incremental import IncrementalQuery
+from src.models.partition_cache import get_default_cache
+from src.models.partition_manifest import PartitionManifest
+from src.models.partition_workers import (
+    DEFAULT_PROCESS_WORKERS, discard_pool, get_pool, submit, to_frame
+)
+from src.models.schema_catalog import SchemaCatalogStore
+from src.models.sql_analysis import apply_predicates, date_bounds
+from src.models.sql_engine import DEFAULT_TABLE_NAME, QueryError, SQLEngine
+
+# Number of concurrent LIST/GET requests used when loading a date range
+DEFAULT_MAX_WORKERS = int(os.environ.get('S3_FETCH_WORKERS', '8'))
+
+# Unseen partitions folded into the schema catalog per request
+DEFAULT_CATALOG_REFRESH = int(os.environ.get('CATALOG_REFRESH_PARTITIONS', '4'))
+
+# Columns whose values are known to fall on the day of the partition holding
+# them, e.g. "event_time"; none by default, so days are only pruned when the
+# dataset's layout has been declared
+DEFAULT_PARTITION_DATE_COLUMNS = [
+    column.strip()
+    for column in os.environ.get('PARTITION_DATE_COLUMNS', '').split(',')
+    if column.strip()
+]
+
+# Converts CSV partitions in the local cache to Arrow files, off the request path
+_materializer = ThreadPoolExecutor(max_workers=1)
+_materializing = set()
+_materializing_lock = threading.Lock()
+
+def dates_between(start_date, end_date):
+    """List every day from start_date to end_date inclusive"""
+    date_list = []
+    current_date = start_date
+    while current_date <= end_date:
+        date_list.append(current_date)
+        current_date += timedelta(days=1)
+    return date_list
 
 class S3DataAccess:
     """Class for accessing and querying data from S3 buckets"""
     
-    def __init__(self, bucket_name, base_path="csv-data/"):
-        """Initialize S3 data access with bucket name and base path"""
+    def __init__(self, bucket_name, base_path="csv-data/", max_workers=None, block_bytes=None,
+                 cache=None, columnar_path=columnar.DEFAULT_COLUMNAR_PATH,
+                 partition_date_columns=None, process_workers=None):
+        """
+        Initialize S3 data access with bucket name and base path
+        
+        Partitions are cached on local disk when a PartitionCache is given or
+        one is configured for the process (see partition_cache.get_default_cache).
+        Parquet copies under columnar_path are preferred over the CSV files;
+        pass an empty columnar_path to always read CSV. Date predicates on
+        partition_date_columns are used to prune daily partitions. With
+        process_workers, partitions are loaded in that many worker processes
+        (see partition_workers).
+        """
         self.bucket_name = bucket_name
         self.base_path = base_path
-        self.session = boto3.Session()
-        self.s3_client = self.session.client('s3')
+        self.columnar_path = columnar_path
+        self.partition_date_columns = (
+            DEFAULT_PARTITION_DATE_COLUMNS if partition_date_columns is None
+            else partition_date_columns
+        )
+        self.max_workers = max(1, max_workers or DEFAULT_MAX_WORKERS)
+        self.block_bytes = max(1, block_bytes or DEFAULT_BLOCK_BYTES)
+        self.process_workers = max(0, DEFAULT_PROCESS_WORKERS if process_workers is None else process_workers)
+        self.cache = cache if cache is not None else get_default_cache()
+        self.sql_engine = SQLEngine()
+        # Timings and counters for the last operations, reported with query responses
+        self.stats = {}
+        # Shared across requests; the pool is sized so parallel fetches don't queue on it
+        self.s3_client = get_aws_client(
+            's3',
+            max_pool_connections=max(DEFAULT_AWS_POOL_CONNECTIONS, self.max_workers)
+        )
+        self.manifest = PartitionManifest.for_dataset(
+            self.s3_client, bucket_name, base_path, columnar_path, self.max_workers
+        )
+        self.catalog_store = SchemaCatalogStore(self.s3_client, bucket_name, base_path)
     
     def get_available_date_range(self):
         """Get the available date range in the S3 bucket"""
         try:
-            # List all objects in the bucket with the prefix
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=self.base_path
-            )
-            
-            if 'Contents' not in response:
-                return None, None
-            
-            # Extract dates from the object keys
-            dates = []
-            for obj in response.get('Contents', []):
-                key = obj['Key']
-                # Parse date from key format: csv-data/year=YYYY/month=MM/day=DD/
-                parts = key.split('/')
-                if len(parts) >= 4:
-                    try:
-                        year_part = parts[1]
-                        month_part = parts[2]
-                        day_part = parts[3]
-                        
-                        year = int(year_part.split('=')[1])
-                        month = int(month_part.split('=')[1])
-                        day = int(day_part.split('=')[1])
-                        
-                        dates.append(datetime(year, month, day))
-                    except (IndexError, ValueError):
-                        continue
-            
-            if not dates:
-                return None, None
-                
-            return min(dates), max(dates)
+            self.manifest.refresh()
+            return self.manifest.date_range()
         
         except Exception as e:
             print(f"Error getting available date range: {str(e)}")
             return None, None
     
-    def get_data_for_date_range(self, start_date, end_date, limit=None):
+    def get_data_for_date_range(self, start_date, end_date, limit=None, columns=None,
+                                predicates=None, budget=None):
         """
         Get data for a specific date range
         
+        Partitions are planned from the partition manifest, then downloaded,
+        parsed and compacted on a bounded thread pool. They are combined in
+        date and key order regardless of the order in which the downloads
+        complete.
+        
+        Partitions are counted against a memory budget in that order, and
+        are loaded ahead only while they fit in what it has left. When the
+        next one does not fit, loading stops: in degrade mode the partitions
+        loaded so far are returned and self.stats['memory']['degraded'] is
+        set.
+        
         Args:
             start_date (datetime): Start date
             end_date (datetime): End date
             limit (int, optional): Maximum number of files to process
+            columns (list, optional): Columns to load; all columns when None
+            predicates (list, optional): sql_analysis.Predicate filters applied
+                to each partition as it is loaded
+            budget (MemoryBudget, optional): Budget for the loaded frames;
+                the configured default when None
             
         Returns:
             pandas.DataFrame: Combined data for the date range
+            
+        Raises:
+            MemoryBudgetExceeded: If the data does not fit and the budget
+            does not allow a partial result
+            SchemaViolation: If a partition does not match the dataset's
+            pinned column types
         """
+        budget = budget or MemoryBudget()
         try:
-            # Generate list of dates in the range
-            date_list = []
-            current_date = start_date
-            while current_date <= end_date:
-                date_list.append(current_date)
-                current_date += timedelta(days=1)
-            
-            # Get data for each date
+            partitions = self._plan_partitions(start_date, end_date)
+            if limit:
+                partitions = partitions[:limit]
+            
             all_data = []
-            file_count = 0
-            
-            for date in date_list:
-                year = date.year
-                month = date.month
-                day = date.day
-                
-                # Construct prefix for this date
-                prefix = f"{self.base_path}year={year}/month={month:02d}/day={day:02d}/"
-                
-                # List objects with this prefix
-                response = self.s3_client.list_objects_v2(
-                    Bucket=self.bucket_name,
-                    Prefix=prefix
-                )
-                
-                # Process each file
-                for obj in response.get('Contents', []):
-                    key = obj['Key']
-                    if key.endswith('.csv.gz'):
-                        # Get the file content
-                        file_obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
-                        file_content = file_obj['Body'].read()
-                        
-                        # Decompress and read as CSV
-                        with gzip.GzipFile(fileobj=io.BytesIO(file_content)) as gzipped:
-                            df = pd.read_csv(io.BytesIO(gzipped.read()))
-                            all_data.append(df)
-                            
-                            file_count += 1
-                            if limit and file_count >= limit:
-                                break
-                    
-                if limit and file_count >= limit:
-                    break
+            frames = self._iter_partitions(partitions, columns, predicates, budget=budget)
+            try:
+                for df, _, _, nbytes in frames:
+                    if not budget.reserve(nbytes):
+                        break
+                    all_data.append(df)
+            finally:
+                frames.close()
+            return self._combine_loaded(all_data, len(partitions) - len(all_data), budget)
+            
+        except (MemoryBudgetExceeded, SchemaViolation):
+            raise
+        except Exception as e:
+            print(f"Error getting data for date range: {str(e)}")
+            return pd.DataFrame()
+    
+    def execute_incremental(self, start_date, end_date, plan, columns=None, predicates=None,
+                            budget=None):
+        """
+        Run a query over a date range one partition at a time
+        
+        Partitions are loaded as in get_data_for_date_range, but each is
+        folded into an incremental.IncrementalQuery and released
+        before the next is taken, so only the query's state (partial
+        aggregates, the current top rows, or the rows the WHERE clause
+        keeps) is held against the budget. A LIMIT query stops loading once
+        it has its rows.
+        
+        Args:
+            start_date (datetime): Start date
+            end_date (datetime): End date
+            plan (IncrementalPlan): Plan from incremental.plan_query
+            columns (list, optional): Columns to load; all columns when None
+            predicates (list, optional): sql_analysis.Predicate filters applied
+                to each partition as it is loaded
+            budget (MemoryBudget, optional): Budget for the query's state;
+                the configured default when None
             
-            # Combine all dataframes
-            if not all_data:
-                return pd.DataFrame()
-                
-            return pd.concat(all_data, ignore_index=True)
+        Returns:
+            tuple: (pandas.DataFrame results, error message or None); the
+            results are None when the range has no partitions
+            
+        Raises:
+            MemoryBudgetExceeded: If the query's state does not fit the budget
+            SchemaViolation: If a partition does not match the dataset's
+            pinned column types
+        """
+        try:
+            partitions = self._plan_partitions(start_date, end_date)
+        except Exception as e:
+            print(f"Error running incremental query: {str(e)}")
+            return pd.DataFrame(), f"Error loading data: {str(e)}"
+        return self._execute_incremental(partitions, plan, columns, predicates, budget)
+    
+    def load_or_execute_incremental(self, start_date, end_date, plan, columns=None,
+                                    predicates=None, budget=None):
+        """
+        Load a date range, or run a query over it one partition at a time when
+        it does not fit
+        
+        Partitions are loaded as in get_data_for_date_range. When the next one
+        does not fit in what the budget has left, the partitions loaded so far
+        are folded into an incremental.IncrementalQuery as in
+        execute_incremental, which reads only the rest, so no partition is
+        read twice.
+        
+        Args:
+            start_date (datetime): Start date
+            end_date (datetime): End date
+            plan (IncrementalPlan): Plan from incremental.plan_query
+            columns (list, optional): Columns to load; all columns when None
+            predicates (list, optional): sql_analysis.Predicate filters applied
+                to each partition as it is loaded
+            budget (MemoryBudget, optional): Budget for the loaded frames;
+                the configured default when None
+            
+        Returns:
+            tuple: (pandas.DataFrame data or None, pandas.DataFrame results or
+            None, error message or None); the data is set when the whole range
+            fit, the results when it was queried one partition at a time
+            
+        Raises:
+            MemoryBudgetExceeded: If the query's state does not fit the budget
+            SchemaViolation: If a partition does not match the dataset's
+            pinned column types
+        """
+        budget = budget or MemoryBudget()
+        loaded = []
+        overflow = False
+        try:
+            partitions = self._plan_partitions(start_date, end_date)
+            frames = self._iter_partitions(partitions, columns, predicates, budget=budget)
+            try:
+                for df, _, _, nbytes in frames:
+                    loaded.append(df)
+                    available = budget.available()
+                    if available is not None and nbytes > available:
+                        overflow = True
+                        break
+                    budget.reserve(nbytes)
+            finally:
+                frames.close()
             
+            if not overflow:
+                return self._combine_loaded(loaded, 0, budget), None, None
+        except (MemoryBudgetExceeded, SchemaViolation):
+            raise
         except Exception as e:
             print(f"Error getting data for date range: {str(e)}")
+            return pd.DataFrame(), None, None
+        
+        # The frames are released as they are folded in
+        df = None
+        results, error = self._execute_incremental(partitions, plan, columns, predicates,
+                                                   budget, loaded)
+        return None, results, error
+    
+    def _combine_loaded(self, all_data, skipped, budget):
+        """
+        Combine loaded partitions and record their stats
+        
+        Args:
+            all_data (list): Frames in date and key order
+            skipped (int): Partitions of the range left out for the budget
+            budget (MemoryBudget): Budget the frames were counted against
+            
+        Returns:
+            pandas.DataFrame: Combined data
+        """
+        if not all_data:
             return pd.DataFrame()
+        
+        files_loaded = len(all_data)
+        combined = combine_frames(all_data)
+        self.stats['files_loaded'] = files_loaded
+        self.stats['rows_loaded'] = len(combined)
+        self.stats['columns_loaded'] = len(combined.columns)
+        self.stats['memory'] = dict({
+            'frame_bytes': frame_bytes(combined),
+            'budget_bytes': budget.limit_bytes or None,
+            'degraded': bool(skipped),
+            'partitions_skipped': skipped,
+        }, **process_memory())
+        return combined
+    
+    def _execute_incremental(self, partitions, plan, columns=None, predicates=None, budget=None,
+                             loaded=None):
+        """
+        Run a query over partitions one at a time, as in execute_incremental
+        
+        Args:
+            partitions (list): Partition tuples in date and key order
+            plan (IncrementalPlan): Plan from incremental.plan_query
+            columns (list, optional): Columns to load; all columns when None
+            predicates (list, optional): sql_analysis.Predicate filters
+            budget (MemoryBudget, optional): Budget for the query's state
+            loaded (list, optional): Frames already loaded for the first
+                partitions; they are folded in and released, and only the
+                partitions after them are read
+            
+        Returns:
+            tuple: (pandas.DataFrame results, error message or None)
+        """
+        query = IncrementalQuery(plan, self.sql_engine, budget)
+        loaded = loaded or []
+        skip = max(len(loaded), 1)
+        frames = None
+        try:
+            if partitions:
+                if not loaded:
+                    loaded.append(compact_frame(self._read_partition(partitions[0], columns, predicates)))
+                # The first partition settles the strategy and the query run on the others
+                query.add(loaded.pop(0))
+                while loaded and not query.done:
+                    query.add(loaded.pop(0))
+                del loaded[:]
+                if not query.done:
+                    frames = self._iter_partitions(partitions[skip:], columns, predicates,
+                                                   query.partition_sql, query.budget)
+                    for partial, rows, elapsed_ms, _ in frames:
+                        query.fold(partial, rows, elapsed_ms)
+                        del partial
+                        if query.done:
+                            break
+            results = query.result()
+        except QueryError as e:
+            return pd.DataFrame(), f"Error executing query: {str(e)}"
+        except (MemoryBudgetExceeded, SchemaViolation):
+            raise
+        except Exception as e:
+            print(f"Error running incremental query: {str(e)}")
+            return pd.DataFrame(), f"Error loading data: {str(e)}"
+        finally:
+            if frames is not None:
+                frames.close()
+        
+        if results is None:
+            return None, None
+        incremental_stats = query.stats()
+        self.stats['files_loaded'] = incremental_stats['partitions_read']
+        self.stats['rows_loaded'] = incremental_stats['rows_read']
+        self.stats['execution_ms'] = round(query.execution_ms, 2)
+        self.stats['incremental'] = incremental_stats
+        self.stats['memory'] = dict({
+            'frame_bytes': incremental_stats['peak_state_bytes'],
+            'budget_bytes': query.budget.limit_bytes or None,
+            'degraded': False,
+            'partitions_skipped': 0,
+        }, **process_memory())
+        return results, None
+    
+    def prune_date_range(self, start_date, end_date, predicates):
+        """
+        Narrow a date range to the days a query's date predicates allow
+        
+        The number of partition files skipped is recorded in
+        self.stats['partitions_pruned'].
+        
+        Args:
+            start_date (datetime): Requested start date
+            end_date (datetime): Requested end date
+            predicates (list): Predicates from sql_analysis.analyze_query
+            
+        Returns:
+            tuple: (start datetime, end datetime) at day granularity; the start
+            is after the end when no partition can match
+        """
+        start_day = datetime(start_date.year, start_date.month, start_date.day)
+        end_day = datetime(end_date.year, end_date.month, end_date.day)
+        requested = len(self._plan_partitions(start_day, end_day))
+        
+        first, last = date_bounds(predicates or [], self.partition_date_columns)
+        if first is not None:
+            start_day = max(start_day, datetime(first.year, first.month, first.day))
+        if last is not None:
+            end_day = min(end_day, datetime(last.year, last.month, last.day))
+        
+        self.stats['partitions_pruned'] = requested - len(self._plan_partitions(start_day, end_day))
+        return start_day, end_day
+    
+    def get_schema_catalog(self, start_date, end_date, max_new_partitions=None):
+        """
+        Load the dataset's schema catalog, folding in unseen partitions
+        
+        The newest partitions in the range that the catalog has not seen
+        yet are read (at most max_new_partitions per call) and merged in, so
+        the catalog keeps up with new daily data without a full scan.
+        
+        Args:
+            start_date (datetime): Start date
+            end_date (datetime): End date
+            max_new_partitions (int, optional): Cap on partitions read per call
+            
+        Returns:
+            SchemaCatalog: Catalog for this dataset prefix
+        """
+        max_new_partitions = max_new_partitions or DEFAULT_CATALOG_REFRESH
+        store = self.catalog_store
+        catalog = store.load()
+        
+        try:
+            pending = [
+                partition
+                for partition in reversed(self._plan_partitions(start_date, end_date))
+                if partition.etag and not catalog.has_partition(partition.key, partition.etag)
+            ][:max_new_partitions]
+            
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                frames = list(executor.map(self._read_partition, pending))
+            
+            if pending:
+                with catalog.lock:
+                    for partition, df in zip(pending, frames):
+                        catalog.fold(partition.key, partition.etag, df)
+                    # Pinned once the whole batch is in, from its unified dtypes
+                    catalog.pin()
+                    store.save(catalog)
+            
+            self.stats['catalog_partitions_added'] = len(pending)
+            
+        except Exception as e:
+            print(f"Error updating schema catalog: {str(e)}")
+        
+        return catalog
+    
+    def partition_versions(self, start_date, end_date):
+        """
+        Get the versions of the partitions a date range would load
+        
+        Returns:
+            list: (key, etag) pairs, which change whenever the data does
+        """
+        return [
+            (partition.key, partition.etag)
+            for partition in self._plan_partitions(start_date, end_date)
+        ]
+    
+    def _plan_partitions(self, start_date, end_date):
+        """
+        Get the partitions in a date range from the partition manifest
+        
+        The manifest is refreshed first if its TTL has expired.
+        
+        Args:
+            start_date (datetime): Start date
+            end_date (datetime): End date
+            
+        Returns:
+            list: Partition tuples in date and key order
+        """
+        self.manifest.refresh()
+        return [
+            partition
+            for date in dates_between(start_date, end_date)
+            for partition in self.manifest.partitions_for(date)
+        ]
+    
+    def _iter_partitions(self, partitions, columns=None, predicates=None, query=None,
+                         budget=None):
+        """
+        Load partitions and yield them in order
+        
+        Partitions are loaded in worker processes when process_workers is
+        set and a pool can be started, and otherwise on the thread pool.
+        A query given is run on each partition where it is loaded, so
+        partitions are parsed and pre-aggregated on several cores and only
+        the partials reach this process. If the worker processes die, the
+        partitions not yet yielded are loaded on threads. Closing the
+        generator cancels the loads that have not started.
+        
+        Args:
+            partitions (list): Partitions in order
+            columns (list, optional): Columns to load; all columns when None
+            predicates (list, optional): sql_analysis.Predicate filters
+            query (str, optional): SQL run on each partition where it is
+                loaded, e.g. to pre-aggregate it
+            budget (MemoryBudget, optional): Budget the partitions loaded
+                ahead must fit; the caller reserves each one it keeps
+        
+        Yields:
+            tuple: (pandas.DataFrame partition, compacted, or the query's
+            result; rows loaded; query execution ms; bytes of the loaded
+            partition)
+        """
+        remaining = deque(partitions)
+        # Workers parse against this request's pinned types, not their own copy of the catalog
+        column_types = self.catalog_store.load().column_types()
+        pool = get_pool(self.process_workers, self._dataset()) if self.process_workers else None
+        self.stats['process_workers'] = self.process_workers if pool is not None else 0
+        if pool is not None:
+            load = lambda partition: submit(pool, partition, columns, predicates, query, column_types)
+            try:
+                yield from self._load_ahead(remaining, load, self.process_workers, budget, to_frame)
+                return
+            except BrokenProcessPool as e:
+                print(f"Error in partition worker processes, loading on threads: {str(e)}")
+                discard_pool(self.process_workers, self._dataset())
+                self.stats['process_workers'] = 0
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            load = lambda partition: executor.submit(
+                self._load_partition, partition, columns, predicates, query, column_types
+            )
+            yield from self._load_ahead(remaining, load, self.max_workers, budget)
+    
+    def _load_ahead(self, remaining, load, window, budget=None, decode=None):
+        """
+        Yield the results of loads in order, keeping up to window submitted
+        
+        Under a budget with a limit, partitions loaded ahead count against
+        what it has left: the first is loaded alone, then only as many are
+        loaded ahead as fit at the size of the largest loaded so far.
+        Partitions are taken from the front of remaining; those submitted
+        but not yielded are put back when the generator stops, so a failed
+        pool can be replaced by another.
+        """
+        loading = deque()
+        largest = 0
+        try:
+            while True:
+                available = budget.available() if budget is not None else None
+                ahead = window
+                if available is not None:
+                    ahead = min(window, max(1, available // largest)) if largest else 1
+                while remaining and len(loading) < ahead:
+                    loading.append((remaining[0], load(remaining[0])))
+                    remaining.popleft()
+                if not loading:
+                    break
+                df, rows, elapsed_ms, nbytes = loading[0][1].result()
+                loading.popleft()
+                largest = max(largest, nbytes)
+                yield (decode(df) if decode else df), rows, elapsed_ms, nbytes
+                del df
+        finally:
+            for partition, future in reversed(loading):
+                future.cancel()
+                remaining.appendleft(partition)
+    
+    def _load_partition(self, partition, columns=None, predicates=None, query=None,
+                        column_types=None):
+        """
+        Load and compact a partition, optionally running a query on it
+        
+        Returns:
+            tuple: (pandas.DataFrame partition or query result, rows loaded,
+            query execution ms, bytes of the loaded partition)
+        """
+        df = compact_frame(self._read_partition(partition, columns, predicates, column_types))
+        rows = len(df)
+        nbytes = frame_bytes(df)
+        elapsed_ms = 0.0
+        if query:
+            df, elapsed_ms = self.sql_engine.execute(df, query)
+        return df, rows, elapsed_ms, nbytes
+    
+    def _dataset(self):
+        """Get what worker processes need to read this dataset"""
+        return (self.bucket_name, self.base_path, self.columnar_path, tuple(self.partition_date_columns))
+    
+    def _read_partition(self, partition, columns=None, predicates=None, column_types=None):
+        """
+        Load a single partition, preferring columnar copies over CSV
+        
+        Sources are tried in order: the Arrow file in the local cache
+        (memory-mapped), the Parquet copy in S3, then the gzipped CSV.
+        Whatever is loaded from S3 is materialized into the local cache as
+        Arrow so later reads of the same version are column-selective; CSV
+        partitions are converted in the background, and the request parses
+        only the requested columns, filtering block by block. Every source
+        is held to the dataset's pinned column types.
+        
+        Args:
+            partition (Partition): Partition to load
+            columns (list, optional): Columns to load; all columns when None
+            predicates (list, optional): Filters to apply while loading
+            column_types (dict, optional): Pinned column types; the
+                catalog's when None
+            
+        Returns:
+            pandas.DataFrame: Parsed partition
+            
+        Raises:
+            SchemaViolation: If the partition does not match the pinned types
+        """
+        cacheable = self.cache is not None and partition.etag
+        if column_types is None:
+            column_types = self.catalog_store.load().column_types()
+        
+        if cacheable:
+            path = self.cache.path(self.bucket_name, partition.key, partition.etag,
+                                   columnar.FEATHER_SUFFIX)
+            df = None
+            if path is not None:
+                try:
+                    df = columnar.read_feather(path, columns)
+                except (OSError, ValueError) as e:
+                    print(f"Error reading cached partition {partition.key}: {str(e)}")
+            if df is not None:
+                df = conform_frame(df, column_types, partition.key)
+                return apply_predicates(df, predicates)
+        
+        if partition.columnar_key:
+            file_obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=partition.columnar_key)
+            body = file_obj['Body']
+            try:
+                data = body.read()
+            finally:
+                body.close()
+            
+            if cacheable:
+                # Decoded once with every column for the cache, then narrowed
+                df = conform_frame(columnar.read_parquet_bytes(data).to_pandas(),
+                                   column_types, partition.key)
+                self._materialize(partition, df)
+                if columns is not None:
+                    wanted = set(columns)
+                    df = df[[column for column in df.columns if column in wanted]]
+            else:
+                df = conform_frame(columnar.read_parquet_bytes(data, columns).to_pandas(),
+                                   column_types, partition.key)
+            return apply_predicates(df, predicates)
+        
+        # Only the requested columns are parsed; with a cache, the CSV is kept
+        # on disk and converted to a full Arrow copy in the background
+        etag = partition.etag if cacheable else None
+        try:
+            df = self._read_csv_partition(partition.key, etag, columns=columns,
+                                          predicates=predicates, column_types=column_types)
+        except SchemaViolation as violation:
+            # Decimals in a column pinned as integers widen its pin instead of failing
+            wider = widen_integers(column_types)
+            if wider == column_types:
+                raise
+            try:
+                df = self._read_csv_partition(partition.key, etag, columns=columns,
+                                              predicates=predicates, column_types=wider)
+            except SchemaViolation:
+                raise violation
+            df, widened = narrow_integers(df, column_types)
+            if widened:
+                self._widen_pins(widened)
+                column_types = dict(column_types, **widened)
+        if cacheable:
+            self._materialize_later(partition, column_types)
+        return df
+    
+    def _widen_pins(self, widened):
+        """Widen the catalog's pinned types and save it"""
+        catalog = self.catalog_store.load()
+        with catalog.lock:
+            catalog.widen(widened)
+            self.catalog_store.save(catalog)
+    
+    def _materialize(self, partition, df):
+        """
+        Store a parsed partition in the local cache as an Arrow file
+        
+        Returns:
+            bool: True if the partition was written
+        """
+        tmp_path = self.cache.reserve()
+        try:
+            columnar.write_feather(df, tmp_path)
+        except Exception as e:
+            # e.g. object columns mixing strings and numbers
+            print(f"Error converting partition {partition.key} to Arrow: {str(e)}")
+            os.remove(tmp_path)
+            return False
+        
+        self.cache.commit(tmp_path, self.bucket_name, partition.key, partition.etag,
+                          columnar.FEATHER_SUFFIX)
+        return True
+    
+    def _materialize_later(self, partition, column_types):
+        """
+        Queue conversion of a CSV partition in the local cache to an Arrow
+        file with every column, so later queries can read any columns of it
+        without parsing CSV
+        
+        Conversions run one at a time on a background thread, streaming a
+        block at a time. On Lambda they pause while the function is frozen
+        between invocations.
+        """
+        token = (self.bucket_name, partition.key, partition.etag)
+        with _materializing_lock:
+            if token in _materializing:
+                return
+            _materializing.add(token)
+        _materializer.submit(self._materialize_csv, partition, column_types, token)
+    
+    def _materialize_csv(self, partition, column_types, token):
+        """Convert a cached CSV partition to a cached Arrow file, then drop the CSV"""
+        try:
+            cached = self.cache.open(self.bucket_name, partition.key, partition.etag)
+            if cached is None:
+                return
+            tmp_path = self.cache.reserve()
+            try:
+                with cached:
+                    convert_csv(cached, tmp_path, column_types, self.block_bytes, partition.key)
+            except Exception as e:
+                print(f"Error converting partition {partition.key} to Arrow: {str(e)}")
+                os.remove(tmp_path)
+                return
+            
+            self.cache.commit(tmp_path, self.bucket_name, partition.key, partition.etag,
+                              columnar.FEATHER_SUFFIX)
+            # The Arrow copy supersedes the cached CSV for this version
+            self.cache.discard(self.bucket_name, partition.key, partition.etag)
+        finally:
+            with _materializing_lock:
+                _materializing.discard(token)
+    
+    def _read_csv_partition(self, key, etag=None, columns=None, predicates=None,
+                            column_types=None):
+        """
+        Download, decompress and parse a single CSV partition
+        
+        Args:
+            key (str): S3 object key of a gzipped CSV file
+            etag (str, optional): ETag from the listing, used as the cache key
+            columns (list, optional): Columns to parse; all columns when None
+            predicates (list, optional): Filters to apply to each block
+            column_types (dict, optional): Pinned column types to parse with
+            
+        Returns:
+            pandas.DataFrame: Parsed partition
+        """
+        if self.cache is not None and etag:
+            cached = self._open_cached_partition(key, etag)
+            if cached is not None:
+                with cached:
+                    return self._parse_csv_stream(cached, columns, predicates, column_types, key)
+        
+        file_obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+        body = file_obj['Body']
+        try:
+            return self._parse_csv_stream(body, columns, predicates, column_types, key)
+        finally:
+            body.close()
+    
+    def _open_cached_partition(self, key, etag):
+        """
+        Open a partition from the local cache, downloading it on a miss
+        
+        Args:
+            key (str): S3 object key
+            etag (str): ETag from the listing
+            
+        Returns:
+            file object or None: Open cached file, or None if it could not be
+            cached (e.g. it was evicted straight away by a small budget)
+        """
+        cached = self.cache.open(self.bucket_name, key, etag)
+        if cached is not None:
+            return cached
+        
+        file_obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+        # Key the entry by the version actually downloaded, in case the
+        # object was rewritten after it was listed
+        etag = file_obj.get('ETag', etag)
+        body = file_obj['Body']
+        try:
+            self.cache.put_stream(self.bucket_name, key, etag, body)
+        finally:
+            body.close()
+        
+        return self.cache.open(self.bucket_name, key, etag)
+    
+    def _parse_csv_stream(self, stream, columns=None, predicates=None, column_types=None,
+                          source=None):
+        """
+        Parse a gzipped CSV stream without buffering the whole file
+        
+        The stream is gunzipped incrementally and parsed block by block on
+        Arrow's multithreaded CSV reader, so neither the compressed nor the
+        decompressed bytes are ever held in memory in full. Only the
+        requested columns are parsed, with the pinned types and dates as
+        timestamps, and predicates are applied to each block before it is
+        kept.
+        
+        Args:
+            stream: Readable binary file-like object (e.g. a StreamingBody)
+            columns (list, optional): Columns to parse; all columns when None
+            predicates (list, optional): Filters to apply to each block
+            column_types (dict, optional): Pinned column types; inferred when None
+            source (str, optional): Key of the partition, for error messages
+            
+        Returns:
+            pandas.DataFrame: Parsed data
+            
+        Raises:
+            SchemaViolation: If a value does not convert to its pinned type
+        """
+        return read_csv(
+            stream, column_types, columns,
+            batch_filter=lambda df: apply_predicates(df, predicates),
+            block_bytes=self.block_bytes,
+            source=source
+        )
+    
+    def backfill_columnar(self, start_date, end_date, overwrite=False):
+        """
+        Write Parquet copies of the CSV partitions in a date range
+        
+        Partitions that already have a Parquet copy newer than their CSV are
+        skipped unless overwrite is set. Each copy records the ETag of the
+        CSV object it was converted from.
+        
+        Args:
+            start_date (datetime): First day to convert
+            end_date (datetime): Last day to convert
+            overwrite (bool): Rewrite copies that are already current
+            
+        Returns:
+            tuple: (number converted, number skipped)
+        """
+        if not self.columnar_path:
+            raise ValueError("A columnar path is required to backfill partitions")
+        
+        self.manifest.refresh(force=True)
+        partitions = self._plan_partitions(start_date, end_date)
+        pending = [p for p in partitions if overwrite or not p.columnar_key]
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(self._convert_partition, pending))
+        
+        return len(pending), len(partitions) - len(pending)
+    
+    def _convert_partition(self, partition):
+        """Convert one CSV partition to Parquet and upload it"""
+        df = self._read_csv_partition(partition.key,
+                                      column_types=self.catalog_store.load().column_types())
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=columnar.columnar_key_for(partition.key, self.base_path, self.columnar_path),
+            Body=columnar.to_parquet_bytes(df, partition.etag)
+        )
     
     def get_schema_from_data(self, df):
         """
@@ -143,7 +865,7 @@ class S3DataAccess:
             return "No data available to generate schema."
         
         schema_info = []
-        schema_info.append("Table Schema:")
+        schema_info.append(f"Table Schema (table name: {DEFAULT_TABLE_NAME}):")
         
         for column in df.columns:
             dtype = df[column].dtype
@@ -173,49 +895,21 @@ class S3DataAccess:
         """
         Execute a SQL query on a dataframe
         
+        The query runs on an embedded DuckDB engine, so joins, aggregates,
+        GROUP BY, ORDER BY, LIMIT and CTEs are all supported. The execution
+        time is recorded in self.stats['execution_ms'].
+        
         Args:
             df (pandas.DataFrame): Dataframe to query
             query (str): SQL query to execute
             
         Returns:
-            pandas.DataFrame: Query results
+            tuple: (pandas.DataFrame results, error message or None)
         """
         try:
-            # For simplicity, we'll use pandas query capabilities
-            # In a real implementation, you might want to use a SQL engine like DuckDB or SQLite
-            
-            # Basic parsing to extract the SELECT and WHERE parts
-            query = query.strip()
-            if not query.lower().startswith('select'):
-                return pd.DataFrame(), "Query must start with SELECT"
-            
-            # Very simple query parser - this would need to be much more robust in production
-            if 'where' in query.lower():
-                select_part = query.lower().split('where')[0]
-                where_part = query.lower().split('where')[1]
-                
-                # Extract columns
-                columns_str = select_part.replace('select', '').strip()
-                if columns_str == '*':
-                    result = df.copy()
-                else:
-                    columns = [c.strip() for c in columns_str.split(',')]
-                    result = df[columns]
-                
-                # Apply where condition (very simplified)
-                # This is a very basic implementation and would need to be enhanced
-                result = result.query(where_part)
-                
-            else:
-                # Just select columns
-                columns_str = query.lower().replace('select', '').strip()
-                if columns_str == '*':
-                    result = df.copy()
-                else:
-                    columns = [c.strip() for c in columns_str.split(',')]
-                    result = df[columns]
-            
-            return result, None
-            
-        except Exception as e:
+            result, elapsed_ms = self.sql_engine.execute(df, query)
+        except QueryError as e:
             return pd.DataFrame(), f"Error executing query: {str(e)}"
+        
+        self.stats['execution_ms'] = round(elapsed_ms, 2)
+        return result, None
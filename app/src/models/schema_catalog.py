@@ -0,0 +1,371 @@
+"""
+Schema Catalog Module for Text-to-SQL Chatbot
+Keeps a persisted summary of each dataset's schema so LLM prompts can be
+built without scanning the data
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from src.models.csv_schema import pinned_type
+from src.models.partition_cache import CACHE_ROOT
+from src.models.sql_engine import DEFAULT_TABLE_NAME
+
+# Rows kept in the reservoir sample shown to the LLM
+DEFAULT_SAMPLE_SIZE = int(os.environ.get('CATALOG_SAMPLE_SIZE', '20'))
+
+# Rows shown to the LLM; taken from the first rows seen and never replaced,
+# so the prompt prefix stays the same as partitions are folded in
+PROMPT_SAMPLE_ROWS = 5
+
+# Distinct example values kept per column
+EXAMPLES_PER_COLUMN = 3
+
+# Longest example value shown in the prompt
+MAX_EXAMPLE_CHARS = 30
+
+# SQL types shown to the LLM for pandas dtype and pinned type prefixes; anything
+# else is VARCHAR
+_SQL_TYPES = (
+    ('int', 'BIGINT'),
+    ('uint', 'UBIGINT'),
+    ('float', 'DOUBLE'),
+    ('bool', 'BOOLEAN'),
+    ('datetime64', 'TIMESTAMP'),
+    ('timestamp', 'TIMESTAMP'),
+)
+
+# Also write the catalog back to the bucket (needs s3:PutObject on _catalog/)
+WRITE_TO_S3 = os.environ.get('SCHEMA_CATALOG_S3', '').lower() in ('1', 'true', 'yes')
+
+# Catalogs already loaded by this process, keyed by (bucket, base path)
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+def unify_dtypes(first, second):
+    """
+    Get a dtype that can hold values of two partition dtypes
+
+    Integers widen to floats (a partition with nulls parses as float), and
+    anything else that disagrees falls back to object.
+    """
+    if first is None:
+        return second
+    if second is None or first == second:
+        return first
+
+    numeric = ('int', 'uint', 'float')
+    if first.startswith(numeric) and second.startswith(numeric):
+        return 'float64'
+    return 'object'
+
+def sql_type(dtype):
+    """Get the SQL type name the query engine uses for a pandas dtype or pinned type"""
+    for prefix, name in _SQL_TYPES:
+        if dtype and dtype.startswith(prefix):
+            return name
+    return 'VARCHAR'
+
+def _example(value):
+    """Render an example value compactly, cutting long text"""
+    text = json.dumps(value) if isinstance(value, str) else str(value)
+    if len(text) > MAX_EXAMPLE_CHARS:
+        text = text[:MAX_EXAMPLE_CHARS - 3] + '...'
+    return text
+
+def _to_json_values(series):
+    """Convert a column to JSON-safe Python values"""
+    return json.loads(series.to_json(orient='values', date_format='iso'))
+
+class SchemaCatalog:
+    """
+    Column names, unified dtypes, examples, null rates and a reservoir sample
+
+    Each column's type is also pinned once a batch of partitions with
+    values in it has been folded in; partitions are parsed against the
+    pinned types, which only ever widen (int64 to float64).
+    What the prompt shows (types, examples, whether a column has nulls and
+    the prompt sample) settles after the first partitions, so the prompt
+    prefix and the SQL cache keys built on it stay stable.
+    """
+
+    def __init__(self, data=None):
+        """Initialize from the dictionary produced by to_dict()"""
+        data = data or {}
+        self.columns = data.get('columns', {})
+        self.row_count = data.get('row_count', 0)
+        self.partitions = data.get('partitions', {})
+        self.sample = data.get('sample', [])
+        # Catalogs saved before the prompt sample existed freeze the head of their reservoir
+        self.prompt_sample = data.get('prompt_sample', self.sample[:PROMPT_SAMPLE_ROWS])
+        # Held while folding partitions into a catalog shared across requests,
+        # and by the readers while they copy what they render
+        self.lock = threading.Lock()
+
+    @property
+    def empty(self):
+        """True until a partition has been folded in"""
+        return not self.columns
+
+    @property
+    def column_names(self):
+        """Column names in first-seen order"""
+        with self.lock:
+            return list(self.columns)
+
+    def to_dict(self):
+        """Serialize the catalog for persisting"""
+        return {
+            'columns': self.columns,
+            'row_count': self.row_count,
+            'partitions': self.partitions,
+            'sample': self.sample,
+            'prompt_sample': self.prompt_sample,
+        }
+
+    def column_types(self):
+        """
+        Get the pinned column types to parse partitions with
+
+        Returns:
+            dict: Column -> csv_schema.ARROW_TYPES key, empty until a
+            partition has been folded in
+        """
+        with self.lock:
+            return {
+                column: entry['pinned']
+                for column, entry in self.columns.items()
+                # Catalogs saved before null columns were left unpinned pinned them as strings
+                if entry.get('pinned') and entry['examples']
+            }
+
+    def has_partition(self, key, etag):
+        """Check whether this version of a partition has been folded in"""
+        return self.partitions.get(key) == etag
+
+    def fold(self, key, etag, df, sample_size=DEFAULT_SAMPLE_SIZE):
+        """
+        Merge a newly loaded partition into the catalog
+
+        Args:
+            key (str): Partition key
+            etag (str): Partition ETag
+            df (pandas.DataFrame): All columns of the partition
+            sample_size (int): Size of the reservoir sample
+        """
+        if self.has_partition(key, etag):
+            return
+
+        for column in df.columns:
+            series = df[column]
+            entry = self.columns.setdefault(str(column), {
+                'dtype': None, 'rows': 0, 'nulls': 0, 'examples': []
+            })
+            if not entry['examples']:
+                # Only nulls so far, which fit any type
+                entry['dtype'] = str(series.dtype)
+            elif series.notna().any():
+                entry['dtype'] = unify_dtypes(entry['dtype'], str(series.dtype))
+            entry['rows'] += len(series)
+            entry['nulls'] += int(series.isna().sum())
+
+            if len(entry['examples']) < EXAMPLES_PER_COLUMN:
+                values = series.dropna().drop_duplicates().head(EXAMPLES_PER_COLUMN)
+                for value in _to_json_values(values):
+                    if value not in entry['examples'] and len(entry['examples']) < EXAMPLES_PER_COLUMN:
+                        entry['examples'].append(value)
+
+        if len(self.prompt_sample) < PROMPT_SAMPLE_ROWS:
+            head = df.head(PROMPT_SAMPLE_ROWS - len(self.prompt_sample))
+            self.prompt_sample.extend(json.loads(head.to_json(orient='records', date_format='iso')))
+        self._sample_rows(df, sample_size)
+        self.row_count += len(df)
+        self.partitions[key] = etag
+
+    def pin(self):
+        """
+        Pin the types of columns that have values but no pinned type yet
+
+        Called once a batch of partitions has been folded in, so a column's
+        first pin comes from its dtype unified across the whole batch.
+        Columns with only nulls so far stay unpinned, as any type fits them.
+        """
+        for entry in self.columns.values():
+            if not entry['examples']:
+                entry['pinned'] = None
+            elif not entry.get('pinned'):
+                entry['pinned'] = pinned_type(entry['dtype'], entry['examples'])
+
+    def widen(self, columns):
+        """
+        Widen pinned types, e.g. int64 to float64 once a partition has decimals
+
+        Called with self.lock held, as fold() and pin() are.
+
+        Args:
+            columns (dict): Column -> wider pinned type
+        """
+        for column, pinned in columns.items():
+            entry = self.columns.get(column)
+            if entry is not None:
+                entry['pinned'] = pinned
+                entry['dtype'] = unify_dtypes(entry['dtype'], pinned)
+
+    def _sample_rows(self, df, sample_size):
+        """
+        Update the reservoir sample with a partition's rows (Algorithm R)
+
+        Row t of the stream replaces a random slot with probability
+        sample_size / (t + 1), evaluated for the whole partition at once.
+        """
+        if df.empty:
+            return
+
+        rng = np.random.default_rng()
+        positions = np.arange(self.row_count, self.row_count + len(df))
+        fill = max(0, sample_size - len(self.sample))
+
+        accepted = np.zeros(len(df), dtype=bool)
+        accepted[:fill] = True
+        slots = np.full(len(df), -1)
+        if len(df) > fill:
+            rest = positions[fill:]
+            draws = rng.integers(0, rest + 1)
+            accepted[fill:] = draws < sample_size
+            slots[fill:] = draws
+
+        rows = json.loads(df[accepted].to_json(orient='records', date_format='iso'))
+        for row, slot in zip(rows, slots[accepted]):
+            if slot < 0:
+                self.sample.append(row)
+            else:
+                self.sample[slot] = row
+
+    def get_schema_string(self):
+        """
+        Render the schema for the LLM prompt
+
+        One line per column: name, SQL type, whether it has nulls, and
+        example values. Null shares are left out, since they change with
+        every partition folded in.
+
+        Returns:
+            str: Schema information as a string
+        """
+        if self.empty:
+            return "No data available to generate schema."
+
+        schema_info = [f"Table {DEFAULT_TABLE_NAME} (column TYPE, nulls, examples):"]
+        # Held so a partition being folded in does not change the columns mid-render
+        with self.lock:
+            for column, entry in self.columns.items():
+                parts = [f"{column} {sql_type(entry.get('pinned') or entry['dtype'])}"]
+                if entry['nulls']:
+                    parts.append("nullable")
+                if entry['examples']:
+                    parts.append("e.g. " + " | ".join(_example(value) for value in entry['examples']))
+                schema_info.append(", ".join(parts))
+        return "\n".join(schema_info)
+
+    def get_sample_frame(self):
+        """Get the reservoir sample as a DataFrame"""
+        with self.lock:
+            sample, columns = list(self.sample), list(self.columns)
+        return pd.DataFrame(sample, columns=columns)
+
+    def get_sample_data(self, rows=5):
+        """
+        Render the prompt sample for the LLM prompt as CSV, which needs no padding
+
+        Returns:
+            str: Sample data as a string
+        """
+        with self.lock:
+            sample, columns = self.prompt_sample[:rows], list(self.columns)
+        if not sample:
+            return "No data available for sampling."
+        frame = pd.DataFrame(sample, columns=columns)
+        return frame.to_csv(index=False).strip()
+
+    def empty_frame(self):
+        """Get a zero-row frame with the catalog's columns and dtypes"""
+        with self.lock:
+            dtypes = {column: entry['dtype'] for column, entry in self.columns.items()}
+        columns = {}
+        for column, dtype in dtypes.items():
+            try:
+                columns[column] = pd.Series(dtype=dtype)
+            except TypeError:
+                columns[column] = pd.Series(dtype='object')
+        return pd.DataFrame(columns)
+
+class SchemaCatalogStore:
+    """Loads and saves a dataset's catalog in the local cache and the bucket"""
+
+    def __init__(self, s3_client, bucket_name, base_path):
+        """Initialize the store for one dataset prefix"""
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.base_path = base_path
+        # Sidecar object kept outside the data prefix so listings never see it
+        self.s3_key = f"_catalog/{base_path}schema.json"
+
+        self.local_path = None
+        if CACHE_ROOT:
+            digest = hashlib.sha256(f"{bucket_name}/{base_path}".encode('utf-8')).hexdigest()
+            self.local_path = os.path.join(CACHE_ROOT, 'catalog', f"{digest}.json")
+
+    def load(self):
+        """
+        Load the catalog, trying this process, the local cache, then the bucket
+
+        Returns:
+            SchemaCatalog: Loaded catalog, empty if none was found
+        """
+        with _loaded_lock:
+            catalog = _loaded.get((self.bucket_name, self.base_path))
+        if catalog is not None:
+            return catalog
+
+        data = None
+        if self.local_path and os.path.exists(self.local_path):
+            try:
+                with open(self.local_path) as handle:
+                    data = json.load(handle)
+            except (OSError, ValueError) as e:
+                print(f"Error reading local schema catalog: {str(e)}")
+
+        if data is None:
+            try:
+                response = self.s3_client.get_object(Bucket=self.bucket_name, Key=self.s3_key)
+                data = json.loads(response['Body'].read())
+            except Exception:
+                # No sidecar yet; the catalog is built from partitions
+                data = None
+
+        catalog = SchemaCatalog(data)
+        with _loaded_lock:
+            _loaded[(self.bucket_name, self.base_path)] = catalog
+        return catalog
+
+    def save(self, catalog):
+        """Persist the catalog to the local cache and, if enabled, the bucket"""
+        body = json.dumps(catalog.to_dict(), default=str)
+
+        if self.local_path:
+            os.makedirs(os.path.dirname(self.local_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.local_path), suffix='.tmp')
+            with os.fdopen(fd, 'w') as handle:
+                handle.write(body)
+            os.replace(tmp_path, self.local_path)
+
+        if WRITE_TO_S3:
+            try:
+                self.s3_client.put_object(Bucket=self.bucket_name, Key=self.s3_key,
+                                          Body=body.encode('utf-8'))
+            except Exception as e:
+                print(f"Error writing schema catalog to S3: {str(e)}")
@@ -0,0 +1,99 @@
+"""
+Serialization Module for Text-to-SQL Chatbot
+Encodes result frames for API responses in a single pass, as row records,
+column arrays or Arrow IPC
+"""
+
+import json
+
+# Wire formats for result rows
+RECORDS = 'records'
+COLUMNS = 'columns'
+ARROW = 'arrow'
+FORMATS = (RECORDS, COLUMNS, ARROW)
+
+# Media type of Arrow IPC stream responses
+ARROW_MIME = 'application/vnd.apache.arrow.stream'
+
+# Schema metadata entry holding the rest of the response in Arrow responses
+ARROW_METADATA_KEY = b'response'
+
+def frame_json(df, fmt=RECORDS):
+    """
+    Encode a frame as JSON text
+
+    records is a list of row objects. columns is {"fields": [{"name",
+    "dtype"}], "data": {name: [values]}, "length": rows}, which repeats no
+    column names and encodes each column as one array. Timestamps are
+    written as ISO-8601 text.
+
+    Args:
+        df (pandas.DataFrame): Frame to encode
+        fmt (str): records or columns
+
+    Returns:
+        str: JSON text
+    """
+    if fmt != COLUMNS:
+        return df.to_json(orient='records', date_format='iso')
+
+    fields = json.dumps([
+        {'name': str(name), 'dtype': str(dtype)} for name, dtype in df.dtypes.items()
+    ])
+    arrays = ','.join(
+        f"{json.dumps(str(name))}:{df.iloc[:, i].to_json(orient='values', date_format='iso')}"
+        for i, name in enumerate(df.columns)
+    )
+    return f'{{"fields":{fields},"data":{{{arrays}}},"length":{len(df)}}}'
+
+def dumps(payload, fmt=RECORDS):
+    """
+    Serialize a response payload to JSON, encoding frames in place
+
+    DataFrame values are written with frame_json() straight into the
+    output, so rows are encoded once instead of being converted to Python
+    objects and encoded again. Lists of payloads (e.g. batch answers) are
+    serialized the same way.
+
+    Returns:
+        str: JSON text
+    """
+    # Imported here so the format constants load without pandas
+    import pandas as pd
+    encoded = {}
+    for key, value in payload.items():
+        if isinstance(value, pd.DataFrame):
+            encoded[key] = frame_json(value, fmt)
+        elif isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+            encoded[key] = '[' + ','.join(dumps(item, fmt) for item in value) + ']'
+    rest = {key: value for key, value in payload.items() if key not in encoded}
+    text = json.dumps(rest, default=str)
+    if not encoded:
+        return text
+
+    pieces = ','.join(f"{json.dumps(key)}:{value}" for key, value in encoded.items())
+    return text[:-1] + (',' if rest else '') + pieces + '}'
+
+def arrow_stream(df, payload=None):
+    """
+    Encode a frame as an Arrow IPC stream
+
+    Args:
+        df (pandas.DataFrame): Result rows
+        payload (dict, optional): Other response fields, stored as JSON in
+            the schema metadata under ARROW_METADATA_KEY
+
+    Returns:
+        bytes: Stream contents
+    """
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if payload:
+        metadata = dict(table.schema.metadata or {})
+        metadata[ARROW_METADATA_KEY] = json.dumps(payload, default=str).encode('utf-8')
+        table = table.replace_schema_metadata(metadata)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,485 @@
+"""
+SQL Analysis Module for Text-to-SQL Chatbot
+Extracts the columns and simple filters a generated query needs, so partition
+loading can skip unused columns and rows before the query runs
+"""
+
+import re
+import operator
+import pandas as pd
+from collections import namedtuple
+
+Token = namedtuple('Token', ['kind', 'value'])
+
+# A filter that can be applied to each chunk while a partition is loaded.
+# op is one of =, !=, <, <=, >, >=, in, not in, between, is null, is not null
+Predicate = namedtuple('Predicate', ['column', 'op', 'values'])
+
+# columns is None when every column is needed (e.g. SELECT *)
+QueryAnalysis = namedtuple('QueryAnalysis', ['columns', 'predicates'])
+
+_TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+|--[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<op><=|>=|<>|!=|==|\|\||::|[=<>])
+  | (?P<punct>.)
+""", re.VERBOSE | re.DOTALL)
+
+_COMPARISONS = {
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<>': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+# Comparison to use when the operands of a comparison are swapped
+_FLIPPED = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+# Literals that can bound a partition day; anything else is not pruned on
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+# Keywords that end a WHERE clause
+_CLAUSE_END = {'GROUP', 'ORDER', 'LIMIT', 'OFFSET', 'HAVING', 'QUALIFY', 'WINDOW', 'FETCH'}
+
+# Keywords that mean a WHERE clause may not filter the base table directly
+_NOT_SIMPLE = {'JOIN', 'WITH', 'UNION', 'INTERSECT', 'EXCEPT'}
+
+def tokenize(sql):
+    """
+    Split SQL into tokens, dropping whitespace and comments
+
+    Returns:
+        list: Token tuples. Identifiers keep their original spelling; quoted
+        identifiers and string literals are unquoted.
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(sql):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == 'space':
+            continue
+        if kind == 'string':
+            tokens.append(Token('string', text[1:-1].replace("''", "'")))
+        elif kind == 'quoted':
+            tokens.append(Token('quoted', text[1:-1].replace('""', '"')))
+        else:
+            tokens.append(Token(kind, text))
+    return tokens
+
+def _is_keyword(token, *words):
+    """Check whether a token is one of the given unquoted keywords"""
+    return token.kind == 'ident' and token.value.upper() in words
+
+def _column_lookup(columns):
+    """Map lowercase names to real column names, preferring exact matches"""
+    lookup = {}
+    for column in columns:
+        lookup.setdefault(str(column).lower(), column)
+    return lookup
+
+def _resolve_column(token, lookup):
+    """Resolve an identifier token to a column name, or None"""
+    if token.kind not in ('ident', 'quoted'):
+        return None
+    return lookup.get(token.value.lower())
+
+def referenced_columns(tokens, columns):
+    """
+    Find the columns a query references
+
+    Args:
+        tokens (list): Tokens of the query
+        columns (list): Columns of the table
+
+    Returns:
+        list or None: Referenced columns in table order, or None when the
+        query needs every column (a star or COLUMNS() expression)
+    """
+    lookup = _column_lookup(columns)
+    found = set()
+    for i, token in enumerate(tokens):
+        if token.value == '*' and token.kind == 'punct':
+            previous = tokens[i - 1] if i else None
+            if previous is None or previous.value in (',', '.') or _is_keyword(previous, 'SELECT', 'DISTINCT'):
+                return None
+        if _is_keyword(token, 'COLUMNS'):
+            return None
+
+        column = _resolve_column(token, lookup)
+        if column is not None:
+            found.add(column)
+
+    return [column for column in columns if column in found]
+
+def _is_simple(tokens):
+    """
+    Check that the query is a single SELECT over one table, so conditions
+    in its WHERE clause filter the base rows directly
+    """
+    if sum(1 for token in tokens if _is_keyword(token, 'SELECT')) != 1:
+        return False
+    if any(_is_keyword(token, *_NOT_SIMPLE) for token in tokens):
+        return False
+
+    # A comma at the top level of the FROM clause is an implicit join
+    depth = 0
+    in_from = False
+    for token in tokens:
+        if token.value == '(':
+            depth += 1
+        elif token.value == ')':
+            depth -= 1
+        elif depth == 0 and _is_keyword(token, 'FROM'):
+            in_from = True
+        elif depth == 0 and in_from and (_is_keyword(token, 'WHERE', *_CLAUSE_END)):
+            in_from = False
+        elif depth == 0 and in_from and token.value == ',':
+            return False
+    return True
+
+def _where_conjuncts(tokens):
+    """
+    Split the top-level WHERE clause into AND-ed conditions
+
+    Returns:
+        list: Token lists, one per condition; empty if there is no WHERE
+        clause or it has a top-level OR
+    """
+    depth = 0
+    start = None
+    end = len(tokens)
+    for i, token in enumerate(tokens):
+        if token.value == '(':
+            depth += 1
+        elif token.value == ')':
+            depth -= 1
+        elif depth == 0 and start is None and _is_keyword(token, 'WHERE'):
+            start = i + 1
+        elif depth == 0 and start is not None and (_is_keyword(token, *_CLAUSE_END) or token.value == ';'):
+            end = i
+            break
+
+    if start is None:
+        return []
+
+    conjuncts = []
+    current = []
+    depth = 0
+    in_between = False
+    for token in tokens[start:end]:
+        if token.value == '(':
+            depth += 1
+        elif token.value == ')':
+            depth -= 1
+        elif depth == 0 and _is_keyword(token, 'OR'):
+            return []
+        elif depth == 0 and _is_keyword(token, 'BETWEEN'):
+            in_between = True
+        elif depth == 0 and _is_keyword(token, 'AND'):
+            if in_between:
+                in_between = False
+            else:
+                conjuncts.append(current)
+                current = []
+                continue
+        current.append(token)
+
+    conjuncts.append(current)
+    return [conjunct for conjunct in conjuncts if conjunct]
+
+def _parse_literal(tokens, i):
+    """
+    Parse a literal starting at tokens[i]
+
+    Returns:
+        tuple: (value, next index), or (None, i) if there is no literal.
+        DATE/TIMESTAMP literals are returned as pandas Timestamps.
+    """
+    if i >= len(tokens):
+        return None, i
+    token = tokens[i]
+
+    if _is_keyword(token, 'DATE', 'TIMESTAMP') and i + 1 < len(tokens) and tokens[i + 1].kind == 'string':
+        try:
+            return pd.Timestamp(tokens[i + 1].value), i + 2
+        except ValueError:
+            return None, i
+
+    sign = 1
+    if token.value == '-' and i + 1 < len(tokens) and tokens[i + 1].kind == 'number':
+        sign = -1
+        i += 1
+        token = tokens[i]
+
+    if token.kind == 'number':
+        text = token.value
+        number = float(text) if any(c in text for c in '.eE') else int(text)
+        return sign * number, i + 1
+
+    if token.kind == 'string' and sign == 1:
+        return token.value, i + 1
+
+    return None, i
+
+def _parse_column(tokens, i, lookup):
+    """
+    Parse a possibly table-qualified column reference starting at tokens[i]
+
+    Returns:
+        tuple: (column name, next index), or (None, i)
+    """
+    if i + 2 < len(tokens) and tokens[i + 1].value == '.' and tokens[i].kind in ('ident', 'quoted'):
+        i += 2
+    if i < len(tokens):
+        column = _resolve_column(tokens[i], lookup)
+        if column is not None:
+            return column, i + 1
+    return None, i
+
+def _parse_literal_list(tokens, i):
+    """Parse a parenthesized list of literals, returning (values, next index)"""
+    if i >= len(tokens) or tokens[i].value != '(':
+        return None, i
+    values = []
+    i += 1
+    while i < len(tokens):
+        value, i = _parse_literal(tokens, i)
+        if value is None:
+            return None, i
+        values.append(value)
+        if i < len(tokens) and tokens[i].value == ',':
+            i += 1
+        elif i < len(tokens) and tokens[i].value == ')':
+            return tuple(values), i + 1
+        else:
+            return None, i
+    return None, i
+
+def _parse_predicate(tokens, lookup):
+    """
+    Parse one condition into a Predicate
+
+    Supports comparisons between a column and a literal (either way
+    round), IN and NOT IN lists, BETWEEN and IS [NOT] NULL.
+
+    Returns:
+        Predicate or None: None if the condition is not one of these forms
+    """
+    column, i = _parse_column(tokens, 0, lookup)
+    if column is None:
+        # literal <op> column
+        value, i = _parse_literal(tokens, 0)
+        if value is None or i >= len(tokens) or tokens[i].value not in _COMPARISONS:
+            return None
+        op = tokens[i].value
+        column, end = _parse_column(tokens, i + 1, lookup)
+        if column is None or end != len(tokens):
+            return None
+        return Predicate(column, _FLIPPED.get(op, op), (value,))
+
+    rest = tokens[i:]
+    words = [token.value.upper() if token.kind == 'ident' else None for token in rest]
+
+    if rest and rest[0].value in _COMPARISONS:
+        value, end = _parse_literal(rest, 1)
+        if value is not None and end == len(rest):
+            return Predicate(column, rest[0].value, (value,))
+        return None
+
+    if words[:2] == ['IS', 'NULL'] and len(rest) == 2:
+        return Predicate(column, 'is null', ())
+    if words[:3] == ['IS', 'NOT', 'NULL'] and len(rest) == 3:
+        return Predicate(column, 'is not null', ())
+
+    negated = words[:1] == ['NOT']
+    offset = 1 if negated else 0
+
+    if words[offset:offset + 1] == ['IN']:
+        values, end = _parse_literal_list(rest, offset + 1)
+        if values is not None and end == len(rest):
+            return Predicate(column, 'not in' if negated else 'in', values)
+        return None
+
+    if words[:1] == ['BETWEEN']:
+        low, end = _parse_literal(rest, 1)
+        if low is None or end >= len(rest) or not _is_keyword(rest[end], 'AND'):
+            return None
+        high, end = _parse_literal(rest, end + 1)
+        if high is not None and end == len(rest):
+            return Predicate(column, 'between', (low, high))
+
+    return None
+
+def analyze_query(sql, columns):
+    """
+    Work out which columns and rows a query can possibly read
+
+    Filters are only extracted from single-table queries whose WHERE clause
+    is a plain conjunction; anything that cannot be proven to filter the
+    base rows is left for the SQL engine.
+
+    Args:
+        sql (str): Generated SQL
+        columns (list): Columns of the table being queried
+
+    Returns:
+        QueryAnalysis: Columns to load and predicates to apply while loading
+    """
+    tokens = tokenize(sql)
+    lookup = _column_lookup(columns)
+
+    predicates = []
+    if _is_simple(tokens):
+        for conjunct in _where_conjuncts(tokens):
+            predicate = _parse_predicate(conjunct, lookup)
+            if predicate is not None:
+                predicates.append(predicate)
+
+    needed = referenced_columns(tokens, columns)
+    if needed == [] and len(columns):
+        # COUNT(*) and constant queries still need the row count
+        needed = [columns[0]]
+
+    return QueryAnalysis(needed, predicates)
+
+def _to_day_bounds(predicate):
+    """
+    Get the range of days a predicate on a date or timestamp column allows
+
+    Returns:
+        tuple: (first date or None, last date or None); (None, None) if the
+        predicate does not bound the column
+    """
+    stamps = []
+    for value in predicate.values:
+        if isinstance(value, pd.Timestamp):
+            stamps.append(value)
+        elif isinstance(value, str) and _ISO_DATE.match(value):
+            # Only ISO literals order the same way as ISO strings in the data
+            try:
+                stamps.append(pd.Timestamp(value))
+            except ValueError:
+                return None, None
+        else:
+            return None, None
+
+    if not stamps or any(stamp.tzinfo is not None for stamp in stamps):
+        return None, None
+
+    if predicate.op in ('=', '==', 'in', 'between'):
+        return min(stamps).date(), max(stamps).date()
+    if predicate.op in ('>', '>='):
+        return stamps[0].date(), None
+    if predicate.op == '<=':
+        return None, stamps[0].date()
+    if predicate.op == '<':
+        # Strictly before midnight excludes that whole day
+        return None, (stamps[0] - pd.Timedelta(1, unit='ns')).date()
+    return None, None
+
+def date_bounds(predicates, date_columns):
+    """
+    Derive the range of days a query can touch from its date predicates
+
+    Args:
+        predicates (list): Predicates from analyze_query
+        date_columns (list): Columns whose values fall on their partition day
+
+    Returns:
+        tuple: (first date or None, last date or None)
+    """
+    wanted = {str(column).lower() for column in date_columns}
+    first, last = None, None
+    for predicate in predicates:
+        if str(predicate.column).lower() not in wanted:
+            continue
+        low, high = _to_day_bounds(predicate)
+        if low is not None and (first is None or low > first):
+            first = low
+        if high is not None and (last is None or high < last):
+            last = high
+    return first, last
+
+def _comparable(series, values):
+    """
+    Prepare a column and literals for comparison with SQL semantics
+
+    Returns:
+        tuple: (series, values), or (None, None) when the column type and
+        literal types do not match in a way pandas can compare exactly
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return None, None
+
+    if pd.api.types.is_datetime64_dtype(series.dtype):
+        try:
+            return series, tuple(pd.Timestamp(value) for value in values if not isinstance(value, (int, float)))
+        except ValueError:
+            return None, None
+
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        if all(isinstance(value, (int, float)) for value in values):
+            return series, values
+        return None, None
+
+    if pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype):
+        if all(isinstance(value, str) for value in values):
+            return series.astype(str), values
+
+    return None, None
+
+def predicate_mask(df, predicate):
+    """
+    Evaluate a predicate against a frame
+
+    Rows where the column is NULL never satisfy a comparison, matching SQL.
+
+    Returns:
+        pandas.Series or None: Boolean mask, or None if the predicate cannot
+        be evaluated exactly on this frame and must be left to the engine
+    """
+    if predicate.column not in df.columns:
+        return None
+    series = df[predicate.column]
+
+    if predicate.op == 'is null':
+        return series.isna()
+    if predicate.op == 'is not null':
+        return series.notna()
+
+    valid = series.notna()
+    compare, values = _comparable(series, predicate.values)
+    if compare is None or len(values) != len(predicate.values):
+        return None
+
+    if predicate.op in _COMPARISONS:
+        return valid & _COMPARISONS[predicate.op](compare, values[0])
+    if predicate.op == 'between':
+        return valid & (compare >= values[0]) & (compare <= values[1])
+    if predicate.op == 'in':
+        return valid & compare.isin(values)
+    if predicate.op == 'not in':
+        return valid & ~compare.isin(values)
+    return None
+
+def apply_predicates(df, predicates):
+    """Filter a frame by every predicate that can be evaluated on it"""
+    mask = None
+    for predicate in predicates or []:
+        predicate_result = predicate_mask(df, predicate)
+        if predicate_result is not None:
+            mask = predicate_result if mask is None else mask & predicate_result
+
+    if mask is None:
+        return df
+    return df[mask.to_numpy(dtype=bool)]
@@ -0,0 +1,147 @@
+"""
+SQL Engine Module for Text-to-SQL Chatbot
+Runs generated SQL against loaded DataFrames on an embedded DuckDB database
+"""
+
+import os
+import time
+import duckdb
+import pandas as pd
+
+# Name the LLM is told to query; any other table name in the SQL resolves to the same frame
+DEFAULT_TABLE_NAME = 'data'
+
+# Worker threads DuckDB may use per query (0 lets DuckDB use every core)
+DEFAULT_THREADS = int(os.environ.get('SQL_ENGINE_THREADS', '0'))
+
+def _quote(name):
+    """Quote an identifier for DuckDB"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+def widening_casts(df):
+    """
+    Get casts restoring the SQL types of compacted columns
+
+    Compacted frames hold narrow integers, float32 and categoricals. Without
+    these casts DuckDB would overflow narrow integer arithmetic and order
+    categoricals by code rather than by value.
+
+    Returns:
+        list: 'CAST(...) AS ...' expressions, empty when nothing was compacted
+    """
+    casts = []
+    for name, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            sql_type = 'VARCHAR'
+        elif dtype.kind in ('i', 'u') and dtype.itemsize < 8:
+            sql_type = 'BIGINT'
+        elif dtype.kind == 'f' and dtype.itemsize < 8:
+            sql_type = 'DOUBLE'
+        else:
+            continue
+        casts.append(f"CAST({_quote(name)} AS {sql_type}) AS {_quote(name)}")
+    return casts
+
+class QueryError(Exception):
+    """Raised when generated SQL is rejected or fails to execute"""
+    pass
+
+class SQLEngine:
+    """Vectorized SQL execution over pandas DataFrames using DuckDB"""
+
+    def __init__(self, table_name=DEFAULT_TABLE_NAME, threads=DEFAULT_THREADS):
+        """Initialize the engine with the table name the data is exposed as"""
+        self.table_name = table_name
+        self.threads = threads
+
+    def _connect(self, df, query):
+        """
+        Open an isolated in-memory database with the frame registered
+
+        The frame is registered under the default table name and under every
+        table the query references, so self-joins and invented table names
+        both resolve. File and network access are disabled.
+        """
+        config = {'enable_external_access': False}
+        if self.threads:
+            config['threads'] = self.threads
+        connection = duckdb.connect(':memory:', config=config)
+
+        # Registering a DataFrame is zero-copy: DuckDB scans its arrays directly.
+        # Compacted columns are widened by a view, one vector at a time.
+        names = {self.table_name} | duckdb.get_table_names(query)
+        casts = widening_casts(df)
+        if casts:
+            connection.register('__frame', df)
+            for name in names:
+                connection.execute(
+                    f"CREATE VIEW {_quote(name)} AS SELECT * REPLACE ({', '.join(casts)}) FROM __frame"
+                )
+        else:
+            for name in names:
+                connection.register(name, df)
+
+        connection.execute("SET lock_configuration = true")
+        return connection
+
+    def validate(self, query):
+        """
+        Check that the SQL is a single read-only statement
+
+        Raises:
+            QueryError: If the SQL does not parse or is not a single SELECT
+        """
+        try:
+            statements = duckdb.extract_statements(query)
+        except duckdb.Error as e:
+            raise QueryError(f"Could not parse query: {str(e)}")
+
+        if len(statements) != 1:
+            raise QueryError("Query must contain exactly one statement")
+
+        if statements[0].type != duckdb.StatementType.SELECT:
+            raise QueryError("Query must be a SELECT statement")
+
+    def explain(self, df, query):
+        """
+        Get the physical plan DuckDB would run for a query
+
+        Returns:
+            str: Plan as text
+        """
+        self.validate(query)
+        connection = self._connect(df, query)
+        try:
+            rows = connection.execute(f"EXPLAIN {query}").fetchall()
+        finally:
+            connection.close()
+        return "\n".join(row[1] for row in rows)
+
+    def execute(self, df, query):
+        """
+        Execute a query against a frame
+
+        Args:
+            df (pandas.DataFrame): Data to query
+            query (str): SQL query
+
+        Returns:
+            tuple: (pandas.DataFrame result, execution time in milliseconds)
+
+        Raises:
+            QueryError: If the query is rejected or fails
+        """
+        query = query.strip().rstrip(';')
+        self.validate(query)
+
+        connection = self._connect(df, query)
+        try:
+            started = time.perf_counter()
+            result = connection.execute(query).df()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        except duckdb.Error as e:
+            raise QueryError(str(e))
+        finally:
+            connection.close()
+
+        return result, elapsed_ms
@@ -3,26 +3,52 @@ Main API routes for Text-to-SQL Chatbot
 Handles all backend API endpoints for query processing
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 import json
-import pandas as pd
-from datetime import datetime
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import os
 import sys
 
-# Import custom modules
+# Import custom modules. The data modules load pandas, pyarrow and duckdb, so
+# they are imported in the functions that use them; cold starts and requests
+# that touch no data don't pay for them.
+from src.models.llm_cache import get_default_sql_cache
 from src.models.llm_provider import get_provider
-from src.models.s3_data_access import S3DataAccess
+from src.models.llm_resilience import LLMTimeoutError, latency_stats
+from src.models.partition_workers import DEFAULT_PROCESS_WORKERS
+from src.models.prompt_builder import prompt_cache_stats
+from src.models.serialization import ARROW, ARROW_MIME, FORMATS, RECORDS, arrow_stream, dumps
+from src import startup_profile
 
 # Create blueprint
 api_bp = Blueprint('api', __name__)
 
+# Most questions one batch request may ask
+MAX_BATCH_QUESTIONS = int(os.environ.get('BATCH_MAX_QUESTIONS', '20'))
+
+# When pushed-down queries run one partition at a time
+INCREMENTAL_MODES = ('auto', 'always', 'never')
+
 # Global variables for configuration
 CONFIG = {
     'default_provider': 'bedrock',
     'default_model': 'anthropic.claude-3-sonnet-20240229-v1:0',
     'bucket_name': None,
-    'api_keys': {}
+    'api_keys': {},
+    # Generate SQL before loading data and load only what it references
+    'pushdown': True,
+    # Run pushed-down queries one partition at a time: 'auto' when the range
+    # does not fit the memory budget, 'always', or 'never'
+    'incremental': os.environ.get('INCREMENTAL_QUERIES', 'auto').lower(),
+    # Worker processes that load and pre-aggregate partitions; 0 uses threads only
+    'process_workers': DEFAULT_PROCESS_WORKERS,
+    # Backup provider and model that slow or failing LLM calls are hedged to
+    'hedge': {
+        'provider': os.environ.get('LLM_HEDGE_PROVIDER') or None,
+        'model': os.environ.get('LLM_HEDGE_MODEL') or None
+    }
 }
 
 @api_bp.route('/config', methods=['GET', 'POST'])
@@ -43,6 +69,28 @@ def config():
         if 'bucket_name' in data:
             CONFIG['bucket_name'] = data['bucket_name']
         
+        if 'pushdown' in data:
+            CONFIG['pushdown'] = bool(data['pushdown'])
+        
+        if 'incremental' in data:
+            mode = _incremental_mode(data['incremental'])
+            if mode is None:
+                return jsonify({'error': f"incremental must be one of {', '.join(INCREMENTAL_MODES)}"}), 400
+            CONFIG['incremental'] = mode
+        
+        if 'process_workers' in data:
+            try:
+                CONFIG['process_workers'] = max(0, int(data['process_workers'] or 0))
+            except (TypeError, ValueError):
+                return jsonify({'error': 'process_workers must be an integer'}), 400
+        
+        if 'hedge' in data:
+            # e.g. {"provider": "openai", "model": "gpt-4o-mini"}; a null provider disables hedging
+            CONFIG['hedge'] = {
+                'provider': (data['hedge'] or {}).get('provider'),
+                'model': (data['hedge'] or {}).get('model')
+            }
+        
         if 'api_keys' in data:
             # Merge with existing keys
             CONFIG['api_keys'].update(data['api_keys'])
@@ -57,13 +105,14 @@ def config():
 @api_bp.route('/available-dates', methods=['GET'])
 def available_dates():
     """Get available date range from S3 bucket"""
+    from src.models.s3_data_access import S3DataAccess
     bucket_name = CONFIG.get('bucket_name')
     
     if not bucket_name:
         return jsonify({'error': 'S3 bucket not configured'}), 400
     
     # Create S3 data access object
-    s3_access = S3DataAccess(bucket_name)
+    s3_access = S3DataAccess(bucket_name, process_workers=CONFIG['process_workers'])
     
     # Get available date range
     start_date, end_date = s3_access.get_available_date_range()
@@ -76,22 +125,111 @@ def available_dates():
         'end_date': end_date.strftime('%Y-%m-%d')
     })
 
-@api_bp.route('/query', methods=['POST'])
-def query():
-    """Process a natural language query and return results"""
-    data = request.json
+def _first_page(results, page_size, bucket_name, serialized=None):
+    """
+    Store a result set and get its first page
     
-    # Validate request
-    if 'question' not in data:
-        return jsonify({'error': 'Question is required'}), 400
+    The full result set is kept server-side and only the first page is
+    sent; if it cannot be stored, every row is sent. Results that fit in
+    one page are not stored.
     
-    question = data['question']
+    Args:
+        results (pandas.DataFrame): Query results
+        page_size (int): Rows in the first page
+        bucket_name (str): Bucket for the shared copy
+        serialized (bytes, optional): results already serialized for the
+            result cache, reused for the stored copy
+    
+    Returns:
+        dict: results (the page), result_id, total_rows and next_cursor
+    """
+    from src.models.result_store import encode_cursor, get_default_result_store
+    if len(results) <= page_size:
+        return {'results': results, 'result_id': None, 'total_rows': len(results), 'next_cursor': None}
+    
+    result_id = get_default_result_store().save(results, bucket_name, serialized)
+    page = results if result_id is None else results.iloc[:page_size]
+    return {
+        'results': page,
+        'result_id': result_id,
+        'total_rows': len(results),
+        'next_cursor': encode_cursor(len(page)) if len(page) < len(results) else None
+    }
+
+def _partial_warning(s3_access):
+    """Get a warning when the memory budget left part of the date range out, else None"""
+    memory = s3_access.stats.get('memory') or {}
+    if not memory.get('degraded'):
+        return None
+    return (
+        f"The date range did not fit in memory, so its last {memory['partitions_skipped']} "
+        f"partition(s) were left out and these results are incomplete. "
+        f"Choose a shorter date range for complete results."
+    )
+
+def _approximate_warning(s3_access):
+    """Get a warning when an incremental run estimated distinct counts or quantiles, else None"""
+    incremental = s3_access.stats.get('incremental') or {}
+    if not incremental.get('approximate'):
+        return None
+    return (
+        "The date range was queried one partition at a time, so distinct counts "
+        "and quantiles in these results are estimates."
+    )
+
+def _incremental_mode(value):
+    """Get the incremental mode of a setting, accepting booleans; None when invalid"""
+    if isinstance(value, bool):
+        return 'always' if value else 'never'
+    mode = str(value).lower()
+    return mode if mode in INCREMENTAL_MODES else None
+
+def _hedge_provider(provider_name, model):
+    """
+    Get the configured backup provider for hedged LLM calls
+    
+    Returns:
+        LLMProvider or None: None when hedging is off, the backup is the
+        primary itself, or its API key is missing
+    """
+    hedge_name = (CONFIG['hedge'].get('provider') or '').lower()
+    hedge_model = CONFIG['hedge'].get('model')
+    if not hedge_name or (hedge_name == provider_name.lower() and hedge_model in (None, model)):
+        return None
+    
+    api_key = None
+    if hedge_name != 'bedrock':
+        api_key = CONFIG['api_keys'].get(hedge_name)
+        if not api_key:
+            print(f"Error configuring hedge provider: API key not configured for {hedge_name}")
+            return None
+    
+    try:
+        return get_provider(hedge_name, api_key, hedge_model, use_cache=False, resilient=False)
+    except ValueError as e:
+        print(f"Error configuring hedge provider: {str(e)}")
+        return None
+
+def _prepare_query(data):
+    """
+    Validate the settings of a query request and set up what it needs
+    
+    Args:
+        data (dict): Request body
+    
+    Returns:
+        tuple: (setup, error). setup holds provider_name, model, bucket_name,
+        start_date, end_date, page_size, llm, s3_access and catalog; error is
+        a (payload, status) pair, and setup None, when the request is invalid.
+    """
+    from src.models.result_store import page_size_from
+    from src.models.s3_data_access import S3DataAccess
     provider_name = data.get('provider', CONFIG['default_provider'])
     model = data.get('model', CONFIG['default_model'])
     bucket_name = CONFIG.get('bucket_name')
     
     if not bucket_name:
-        return jsonify({'error': 'S3 bucket not configured'}), 400
+        return None, ({'error': 'S3 bucket not configured'}, 400)
     
     # Parse date range
     try:
@@ -101,58 +239,508 @@ def query():
         else:
             # Default to last 30 days
             end_date = datetime.now()
-            start_date = end_date - pd.Timedelta(days=30)
+            start_date = end_date - timedelta(days=30)
     except ValueError:
-        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        return None, ({'error': 'Invalid date format. Use YYYY-MM-DD'}, 400)
+    
+    try:
+        page_size = page_size_from(data.get('page_size'))
+    except (TypeError, ValueError):
+        return None, ({'error': 'page_size must be an integer'}, 400)
     
     # Get API key for the selected provider
     api_key = None
     if provider_name.lower() != 'bedrock':  # Bedrock uses AWS credentials
         api_key = CONFIG['api_keys'].get(provider_name.lower())
         if not api_key:
-            return jsonify({'error': f'API key not configured for {provider_name}'}), 400
+            return None, ({'error': f'API key not configured for {provider_name}'}, 400)
+    
+    # Create LLM provider
+    try:
+        llm = get_provider(provider_name, api_key, model, backup=_hedge_provider(provider_name, model))
+    except ValueError as e:
+        return None, ({'error': str(e)}, 400)
     
     # Create S3 data access object
-    s3_access = S3DataAccess(bucket_name)
+    s3_access = S3DataAccess(bucket_name, process_workers=CONFIG['process_workers'])
     
-    # Get data for the date range
-    df = s3_access.get_data_for_date_range(start_date, end_date)
+    # The catalog holds the schema and a sample, so the prompt can be built
+    # without waiting for the date range to load
+    catalog = s3_access.get_schema_catalog(start_date, end_date)
     
-    if df.empty:
-        return jsonify({'error': 'No data available for the specified date range'}), 404
+    if catalog.empty:
+        return None, ({'error': 'No data available for the specified date range'}, 404)
+    
+    return {
+        'provider_name': provider_name,
+        'model': model,
+        'bucket_name': bucket_name,
+        'start_date': start_date,
+        'end_date': end_date,
+        'page_size': page_size,
+        'llm': llm,
+        's3_access': s3_access,
+        'catalog': catalog
+    }, None
+
+def _run_query(data, context):
+    """
+    Run a query request, yielding each stage as soon as it is ready
     
-    # Generate schema information
-    schema = s3_access.get_schema_from_data(df)
+    Args:
+        data (dict): Request body
+        context (dict): Filled with the LLM provider ('llm') and the result
+            frame ('results') before the final stage is yielded
     
-    # Get sample data
-    sample_data = s3_access.get_sample_data(df)
+    Yields:
+        tuple: (stage, payload, status). Stages are 'sql', then 'results';
+        an 'error' stage ends the run early.
+    """
+    import pandas as pd
+    from src.models.csv_schema import SchemaViolation
+    from src.models.frame_memory import MemoryBudgetExceeded
+    from src.models.incremental import plan_query
+    from src.models.result_cache import get_default_result_cache
+    from src.models.sql_analysis import analyze_query
     
-    # Create LLM provider
+    # Validate request
+    if 'question' not in data:
+        yield 'error', {'error': 'Question is required'}, 400
+        return
+    
+    question = data['question']
+    setup, error = _prepare_query(data)
+    if error:
+        yield ('error',) + error
+        return
+    
+    provider_name, bucket_name = setup['provider_name'], setup['bucket_name']
+    start_date, end_date = setup['start_date'], setup['end_date']
+    page_size, llm = setup['page_size'], setup['llm']
+    s3_access, catalog = setup['s3_access'], setup['catalog']
+    
+    schema = catalog.get_schema_string()
+    sample_data = catalog.get_sample_data()
+    
+    # Results are cached per SQL and partition versions, so new data misses
+    result_cache = get_default_result_cache()
+    cache_key = None
+    results = None
+    serialized = None
+    # Set when the results were computed one partition at a time
+    incremental = False
+    
+    if data.get('pushdown', CONFIG['pushdown']):
+        # Generate SQL first and let it decide which columns and rows are loaded
+        try:
+            sql_query = llm.generate_sql(question, schema, sample_data)
+        except LLMTimeoutError as e:
+            yield 'error', {'error': str(e)}, 504
+            return
+        yield 'sql', {'sql_query': sql_query}, 200
+        
+        analysis = analyze_query(sql_query, catalog.column_names)
+        s3_access.stats['predicates_pushed_down'] = len(analysis.predicates)
+        
+        # Only fetch the days the query's date filters can match
+        query_start, query_end = s3_access.prune_date_range(start_date, end_date, analysis.predicates)
+        
+        # A cached result makes both loading and execution unnecessary
+        if result_cache:
+            partitions = s3_access.partition_versions(query_start, query_end)
+            if partitions:
+                cache_key = result_cache.make_key(bucket_name, sql_query, partitions)
+                results = result_cache.get(cache_key)
+        
+        if results is None:
+            mode = _incremental_mode(data.get('incremental', CONFIG['incremental']))
+            plan = plan_query(sql_query, catalog.column_names) if mode in ('auto', 'always') else None
+            df = None
+            error = None
+            try:
+                if plan and mode == 'auto':
+                    # Queried a partition at a time only if the range does not
+                    # fit, folding in the partitions loaded until then
+                    df, results, error = s3_access.load_or_execute_incremental(
+                        query_start, query_end, plan,
+                        columns=analysis.columns,
+                        predicates=analysis.predicates
+                    )
+                elif plan:
+                    results, error = s3_access.execute_incremental(
+                        query_start, query_end, plan,
+                        columns=analysis.columns,
+                        predicates=analysis.predicates
+                    )
+                else:
+                    df = s3_access.get_data_for_date_range(
+                        query_start, query_end,
+                        columns=analysis.columns,
+                        predicates=analysis.predicates
+                    )
+            except MemoryBudgetExceeded as e:
+                yield 'error', {'error': str(e)}, 413
+                return
+            except SchemaViolation as e:
+                yield 'error', {'error': str(e)}, 422
+                return
+            if error:
+                llm.reject_sql(sql_query)
+                yield 'error', {'error': error}, 400
+                return
+            incremental = results is not None
+            if df is None and not incremental:
+                df = pd.DataFrame()
+            
+            # Predicates may legitimately filter out every row or every day, so
+            # only a frame without columns and without pruning means no data
+            if not incremental and len(df.columns) == 0:
+                if not s3_access.stats['partitions_pruned']:
+                    yield 'error', {'error': 'No data available for the specified date range'}, 404
+                    return
+                df = catalog.empty_frame()
+    else:
+        # Load the date range while the LLM generates SQL
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            loading = executor.submit(s3_access.get_data_for_date_range, start_date, end_date)
+            try:
+                sql_query = llm.generate_sql(question, schema, sample_data)
+            except LLMTimeoutError as e:
+                yield 'error', {'error': str(e)}, 504
+                return
+            yield 'sql', {'sql_query': sql_query}, 200
+            try:
+                df = loading.result()
+            except MemoryBudgetExceeded as e:
+                yield 'error', {'error': str(e)}, 413
+                return
+            except SchemaViolation as e:
+                yield 'error', {'error': str(e)}, 422
+                return
+        
+        if df.empty:
+            yield 'error', {'error': 'No data available for the specified date range'}, 404
+            return
+        
+        # The range is loaded alongside SQL generation, so a hit only skips execution
+        if result_cache:
+            cache_key = result_cache.make_key(
+                bucket_name, sql_query, s3_access.partition_versions(start_date, end_date)
+            )
+            results = result_cache.get(cache_key)
+    
+    if getattr(llm, 'last_hit', None) is not None:
+        s3_access.stats['sql_cache_hit'] = llm.last_hit
+    
+    from_cache = results is not None and not incremental
+    # Only a result computed here can be missing part of the range or estimated
+    warning = None if from_cache else _partial_warning(s3_access) or _approximate_warning(s3_access)
+    
+    # Execute query
+    if not from_cache:
+        if not incremental:
+            results, error = s3_access.execute_query(df, sql_query)
+            
+            if error:
+                # Retrying the question should ask the LLM again, not repeat the broken SQL
+                llm.reject_sql(sql_query)
+                yield 'error', {'error': error}, 400
+                return
+        
+        # Partial or estimated results must not stand in for exact ones
+        if cache_key and not warning:
+            serialized = result_cache.set(cache_key, results)
+    llm.confirm_sql(sql_query)
+    
+    context['llm'] = llm
+    context['provider_name'] = provider_name.lower()
+    context['results'] = results
+    payload = dict(
+        {'question': question, 'sql_query': sql_query},
+        **_first_page(results, page_size, bucket_name, serialized),
+        from_cache=from_cache,
+        stats=s3_access.stats
+    )
+    if warning:
+        payload['warning'] = warning
+    yield 'results', payload, 200
+
+def _summarize(context):
+    """
+    Summarize the results for the explanation prompt
+    
+    Returns:
+        tuple: (summary text, estimated prompt tokens of the summary and of
+        the full result set)
+    """
+    from src.models.result_summary import summarize_results
+    summary = summarize_results(context['results'], context['provider_name'])
+    return summary.text, {'summary': summary.tokens, 'full_results': summary.full_tokens}
+
+def _sse(event, payload, fmt=RECORDS):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {dumps(payload, fmt)}\n\n"
+
+def _response_format(data=None):
+    """
+    Get the wire format for result rows
+    
+    It comes from the request body or query string ("format"), or from an
+    Accept header asking for Arrow; records is the default.
+    
+    Raises:
+        ValueError: If the format is not supported
+    """
+    fmt = (data or {}).get('format') or request.args.get('format')
+    if not fmt and ARROW_MIME in request.headers.get('Accept', ''):
+        fmt = ARROW
+    fmt = fmt or RECORDS
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}. Use one of {', '.join(FORMATS)}")
+    return fmt
+
+def _respond(payload, fmt):
+    """Serialize a response whose 'results' entry is a DataFrame, encoding it once"""
+    if fmt == ARROW:
+        payload = dict(payload)
+        rows = payload.pop('results')
+        return Response(arrow_stream(rows, payload), mimetype=ARROW_MIME)
+    return Response(dumps(payload, fmt), mimetype='application/json')
+
+@api_bp.route('/query', methods=['POST'])
+def query():
+    """Process a natural language query and return results"""
     try:
-        llm = get_provider(provider_name, api_key, model)
+        fmt = _response_format(request.json)
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     
-    # Generate SQL query
-    sql_query = llm.generate_sql(question, schema, sample_data)
+    context = {}
+    response = {}
+    for stage, payload, status in _run_query(request.json, context):
+        if stage == 'error':
+            return jsonify(payload), status
+        response.update(payload)
     
-    # Execute query
-    results, error = s3_access.execute_query(df, sql_query)
+    # Generate explanation from a summary rather than the full result set
+    summary, response['stats']['explain_prompt_tokens'] = _summarize(context)
+    try:
+        response['explanation'] = context['llm'].explain_results(
+            response['question'], response['sql_query'], summary
+        )
+    except LLMTimeoutError as e:
+        # The results are still worth returning without an explanation
+        print(f"Error generating explanation: {str(e)}")
+        response['explanation'] = f"No explanation is available: {str(e)}."
+    
+    return _respond(response, fmt)
+
+@api_bp.route('/query/stream', methods=['POST'])
+def query_stream():
+    """
+    Process a natural language query as a Server-Sent Events stream
+    
+    The SQL and the result rows are sent as soon as they are ready, followed
+    by the explanation as it is generated. Events are 'sql', 'results',
+    'token' (explanation text), 'done' (with the explanation prompt size) and
+    'error'.
+    """
+    try:
+        fmt = _response_format(request.json)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if fmt == ARROW:
+        return jsonify({'error': 'Arrow is not available for streaming; use records or columns'}), 400
+    
+    context = {}
+    stages = _run_query(request.json, context)
     
+    # Request validation errors are returned as plain JSON before streaming starts
+    stage, payload, status = next(stages)
+    if stage == 'error':
+        return jsonify(payload), status
+    
+    def events():
+        yield _sse(stage, payload, fmt)
+        for stage_name, stage_payload, _ in stages:
+            yield _sse(stage_name, stage_payload, fmt)
+            if stage_name == 'error':
+                return
+        
+        try:
+            summary, prompt_tokens = _summarize(context)
+            for text in context['llm'].explain_results_stream(
+                stage_payload['question'], stage_payload['sql_query'], summary
+            ):
+                yield _sse('token', {'text': text})
+        except Exception as e:
+            print(f"Error streaming explanation: {str(e)}")
+            yield _sse('error', {'error': f"Error generating explanation: {str(e)}"})
+            return
+        
+        yield _sse('done', {'explain_prompt_tokens': prompt_tokens})
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop proxies such as nginx from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
+
+async def _generate_all(llm, questions, schema, sample_data):
+    """Generate SQL for every question concurrently; failed questions get their exception"""
+    return await asyncio.gather(
+        *(llm.agenerate_sql(question, schema, sample_data) for question in questions),
+        return_exceptions=True
+    )
+
+@api_bp.route('/query/batch', methods=['POST'])
+def query_batch():
+    """
+    Answer several questions over the same date range with one data load
+    
+    The date range is loaded while SQL is generated for every question
+    concurrently, and each query then runs against the shared frame. The
+    body is as for /api/query, with "questions" (a list) instead of
+    "question". Each entry of "results" has the question and either its
+    SQL and first page of rows (as in /api/query, without an explanation)
+    or an error.
+    """
+    from src.models.csv_schema import SchemaViolation
+    from src.models.frame_memory import MemoryBudgetExceeded
+    from src.models.result_cache import get_default_result_cache
+    
+    data = request.json or {}
+    try:
+        fmt = _response_format(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if fmt == ARROW:
+        return jsonify({'error': 'Arrow is not available for batches; use records or columns'}), 400
+    
+    questions = data.get('questions')
+    if (not isinstance(questions, list) or not questions
+            or not all(isinstance(question, str) and question.strip() for question in questions)):
+        return jsonify({'error': 'questions must be a non-empty list of questions'}), 400
+    if len(questions) > MAX_BATCH_QUESTIONS:
+        return jsonify({'error': f'At most {MAX_BATCH_QUESTIONS} questions can be asked at once'}), 400
+    
+    setup, error = _prepare_query(data)
     if error:
-        return jsonify({'error': error}), 400
+        return jsonify(error[0]), error[1]
+    
+    bucket_name, page_size = setup['bucket_name'], setup['page_size']
+    start_date, end_date = setup['start_date'], setup['end_date']
+    s3_access, catalog, llm = setup['s3_access'], setup['catalog'], setup['llm']
+    
+    # Load the date range once, while the LLM generates every query
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        loading = executor.submit(s3_access.get_data_for_date_range, start_date, end_date)
+        sql_queries = asyncio.run(_generate_all(
+            llm, questions, catalog.get_schema_string(), catalog.get_sample_data()
+        ))
+        try:
+            df = loading.result()
+        except MemoryBudgetExceeded as e:
+            return jsonify({'error': str(e)}), 413
+        except SchemaViolation as e:
+            return jsonify({'error': str(e)}), 422
+    
+    if df.empty:
+        return jsonify({'error': 'No data available for the specified date range'}), 404
     
-    # Convert results to JSON
-    results_json = results.to_json(orient='records')
+    result_cache = get_default_result_cache()
+    partitions = s3_access.partition_versions(start_date, end_date) if result_cache else None
+    warning = _partial_warning(s3_access)
     
-    # Generate explanation
-    explanation = llm.explain_results(question, sql_query, results.to_string())
+    answers = []
+    for question, sql_query in zip(questions, sql_queries):
+        if isinstance(sql_query, Exception):
+            print(f"Error generating SQL: {str(sql_query)}")
+            answers.append({'question': question, 'error': f"Error generating SQL: {str(sql_query)}"})
+            continue
+        
+        answer = {'question': question, 'sql_query': sql_query}
+        cache_key = None
+        results = None
+        serialized = None
+        if partitions:
+            cache_key = result_cache.make_key(bucket_name, sql_query, partitions)
+            results = result_cache.get(cache_key)
+        
+        from_cache = results is not None
+        if not from_cache:
+            results, error = s3_access.execute_query(df, sql_query)
+            if error:
+                llm.reject_sql(sql_query)
+                answer['error'] = error
+                answers.append(answer)
+                continue
+            answer['execution_ms'] = s3_access.stats.pop('execution_ms', None)
+            if cache_key and not warning:
+                serialized = result_cache.set(cache_key, results)
+        
+        llm.confirm_sql(sql_query)
+        answer.update(_first_page(results, page_size, bucket_name, serialized))
+        answer['from_cache'] = from_cache
+        answers.append(answer)
+    
+    response = {'results': answers, 'stats': s3_access.stats}
+    if warning:
+        response['warning'] = warning
+    return Response(dumps(response, fmt), mimetype='application/json')
+
+@api_bp.route('/results/<result_id>', methods=['GET'])
+def result_page(result_id):
+    """
+    Get a page of a stored result set
+    
+    Query parameters are cursor (from next_cursor; the first page when
+    omitted), page_size and format.
+    """
+    from src.models.result_store import (
+        decode_cursor, encode_cursor, get_default_result_store, page_size_from
+    )
+    
+    try:
+        offset = decode_cursor(request.args['cursor']) if 'cursor' in request.args else 0
+        page_size = page_size_from(request.args.get('page_size'))
+        fmt = _response_format()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    results = get_default_result_store().load(result_id, CONFIG.get('bucket_name'))
+    if results is None:
+        return jsonify({'error': 'Result not found or expired. Please run the query again.'}), 404
+    
+    page = results.iloc[offset:offset + page_size]
+    next_offset = offset + len(page)
+    
+    return _respond({
+        'result_id': result_id,
+        'results': page,
+        'total_rows': len(results),
+        'offset': offset,
+        'next_cursor': encode_cursor(next_offset) if next_offset < len(results) else None
+    }, fmt)
+
+@api_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Get cache counters, explanation prompt sizes, SQL prompt cache usage, LLM
+    latency histograms and, when profiling is enabled, startup timings
+    """
+    from src.models.result_cache import get_default_result_cache
+    from src.models.result_summary import summary_stats
     
+    sql_cache = get_default_sql_cache()
+    result_cache = get_default_result_cache()
     return jsonify({
-        'question': question,
-        'sql_query': sql_query,
-        'results': json.loads(results_json),
-        'explanation': explanation
+        'sql_cache': sql_cache.stats() if sql_cache else None,
+        'result_cache': result_cache.stats() if result_cache else None,
+        'result_summary': summary_stats(),
+        'prompt_cache': prompt_cache_stats(),
+        'llm_latency': latency_stats(),
+        'startup': startup_profile.timings()
     })
 
 @api_bp.route('/providers', methods=['GET'])
@@ -0,0 +1,71 @@
+"""
+Startup Profiling Module for Text-to-SQL Chatbot
+Records how long imports and one-time initialization take, to keep Lambda
+cold starts in check
+
+Set STARTUP_PROFILE=1 to enable. Timings are printed as one JSON line after
+the first invocation and returned by /api/metrics.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+ENABLED = os.environ.get('STARTUP_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+# Process start, approximated by the first import of this module
+STARTED_AT = time.perf_counter()
+
+_timings = []
+_lock = threading.Lock()
+_reported = False
+
+@contextmanager
+def timed(label):
+    """
+    Time a block, e.g. an import or a client initialization
+
+    Does nothing unless profiling is enabled.
+    """
+    if not ENABLED:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with _lock:
+            _timings.append({'step': label, 'ms': round(elapsed_ms, 2)})
+
+def timings():
+    """
+    Get the recorded timings
+
+    Returns:
+        dict: Steps in the order they finished, and milliseconds since the
+        process started importing the app, or None when profiling is disabled
+    """
+    if not ENABLED:
+        return None
+    with _lock:
+        steps = list(_timings)
+    return {
+        'steps': steps,
+        'since_start_ms': round((time.perf_counter() - STARTED_AT) * 1000, 2),
+    }
+
+def report_once():
+    """Print the timings as a JSON line the first time this is called"""
+    global _reported
+
+    if not ENABLED:
+        return
+    with _lock:
+        if _reported:
+            return
+        _reported = True
+    print(json.dumps({'startup_profile': timings()}))
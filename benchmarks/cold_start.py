@@ -0,0 +1,155 @@
+"""
+Cold Start Benchmark for Text-to-SQL Chatbot
+Measures how long a fresh interpreter takes to import the Lambda entry point
+and serve a first request, to catch regressions in cold-start time
+
+    python benchmarks/cold_start.py --runs 5 --max-ms 1500
+
+Each run starts a new Python process with STARTUP_PROFILE=1, so the report
+includes the app's own step timings, and -X importtime, so it also lists the
+slowest packages to import. The data modules (pandas, pyarrow, duckdb and the
+app modules built on them) are imported on the first query rather than at
+cold start; their import time is reported separately. Secrets Manager is
+disabled; no AWS calls are made.
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+
+# Modules the API imports on the first query
+DATA_MODULES = [
+    'src.models.s3_data_access', 'src.models.result_cache', 'src.models.result_store',
+    'src.models.result_summary', 'src.models.sql_analysis', 'src.models.incremental',
+]
+
+# Packages that should only be imported once a query needs data
+DATA_PACKAGES = ('pandas', 'numpy', 'pyarrow', 'duckdb')
+
+# Imports the entry point, sends it one API request through the Lambda handler,
+# then imports what the first query would
+RUN_SCRIPT = """
+import sys, json, time
+started = time.perf_counter()
+import src.main as main
+imported = time.perf_counter()
+main.lambda_handler({'httpMethod': 'GET', 'path': '/api/providers', 'headers': {}}, None)
+handled = time.perf_counter()
+sys.stderr.write('DATA_IMPORTS\\n')
+sys.stderr.flush()
+for module in %r:
+    __import__(module)
+data_imported = time.perf_counter()
+print('COLD_START ' + json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_request_ms': (handled - imported) * 1000,
+    'data_import_ms': (data_imported - handled) * 1000,
+}))
+""" % (DATA_MODULES,)
+
+_IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)')
+
+def run_once(python):
+    """
+    Start a fresh interpreter and time the cold start
+
+    Returns:
+        tuple: (timings dict, startup profile dict or None, {package:
+        cumulative us} at cold start, {module: cumulative us} of the data
+        imports)
+    """
+    env = dict(os.environ, STARTUP_PROFILE='1', SECRET_NAME='', PYTHONDONTWRITEBYTECODE='1')
+    completed = subprocess.run(
+        [python, '-X', 'importtime', '-c', RUN_SCRIPT],
+        cwd=APP_DIR, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark run failed:\n{completed.stderr[-2000:]}")
+
+    timings = None
+    profile = None
+    for line in completed.stdout.splitlines():
+        if line.startswith('COLD_START '):
+            timings = json.loads(line[len('COLD_START '):])
+        elif line.startswith('{"startup_profile"'):
+            profile = json.loads(line)['startup_profile']
+
+    # Cumulative time of each top-level package where it was first imported
+    # (a package imported by another one is counted in both). After the
+    # marker, the data modules and the packages first imported with them.
+    imports = {}
+    data_imports = {}
+    cold = True
+    for line in completed.stderr.splitlines():
+        if line == 'DATA_IMPORTS':
+            cold = False
+            continue
+        match = _IMPORT_TIME.match(line)
+        if not match:
+            continue
+        module = match.group(3)
+        if cold and '.' not in module:
+            imports[module] = int(match.group(2))
+        elif not cold and (module in DATA_MODULES or '.' not in module):
+            data_imports[module] = int(match.group(2))
+
+    return timings, profile, imports, data_imports
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description='Benchmark Lambda cold-start time')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start')
+    parser.add_argument('--python', default=sys.executable, help='Interpreter to benchmark')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='Fail if the median import plus first request exceeds this')
+    args = parser.parse_args(argv)
+
+    totals = []
+    data_totals = []
+    profile = None
+    imports = {}
+    data_imports = {}
+    for _ in range(args.runs):
+        timings, profile, imports, data_imports = run_once(args.python)
+        total = timings['import_ms'] + timings['first_request_ms']
+        totals.append(total)
+        data_totals.append(timings['data_import_ms'])
+        print(f"import {timings['import_ms']:.0f} ms, first request "
+              f"{timings['first_request_ms']:.0f} ms, total {total:.0f} ms, "
+              f"data modules on first query {timings['data_import_ms']:.0f} ms")
+
+    median = statistics.median(totals)
+    print(f"\nMedian cold start: {median:.0f} ms (min {min(totals):.0f}, max {max(totals):.0f})")
+
+    if profile:
+        print("\nStartup steps (last run):")
+        for step in profile['steps']:
+            print(f"  {step['ms']:8.1f} ms  {step['step']}")
+
+    print("\nSlowest packages, cumulative (last run):")
+    for module, micros in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {micros / 1000:8.1f} ms  {module}")
+
+    early = [package for package in DATA_PACKAGES if package in imports]
+    if early:
+        print(f"\nImported at cold start, though only queries need them: {', '.join(early)}")
+
+    print(f"\nData modules, imported on the first query: median {statistics.median(data_totals):.0f} ms")
+    print("Slowest of them and the packages they load, cumulative (last run):")
+    for module, micros in sorted(data_imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {micros / 1000:8.1f} ms  {module}")
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"\nCold start regression: {median:.0f} ms exceeds the {args.max_ms:.0f} ms budget")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
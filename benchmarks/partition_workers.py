@@ -0,0 +1,91 @@
+"""
+Partition Workers Benchmark for Text-to-SQL Chatbot
+Times loading a date range on threads and in worker processes, optionally
+running a query one partition at a time, to check what the process pool buys
+on a given host
+
+    python benchmarks/partition_workers.py --bucket my-bucket \
+        --start 2025-01-01 --end 2025-01-31 --workers 0 2 4 \
+        --sql "SELECT country, count(*) AS n FROM data GROUP BY country"
+
+A worker count of 0 loads on threads in this process. Leave CACHE_ROOT unset
+so every run downloads and parses the partitions. The bucket is read with the
+usual AWS credentials.
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+from datetime import datetime
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+sys.path.insert(0, APP_DIR)
+
+def run_once(args, workers):
+    """
+    Load the date range once
+
+    Returns:
+        tuple: (milliseconds, rows loaded, worker processes that served it)
+    """
+    from src.models.frame_memory import MemoryBudget
+    from src.models.incremental import plan_query
+    from src.models.s3_data_access import S3DataAccess
+
+    start = datetime.strptime(args.start, '%Y-%m-%d')
+    end = datetime.strptime(args.end, '%Y-%m-%d')
+    access = S3DataAccess(args.bucket, args.base_path, process_workers=workers)
+    plan = None
+    if args.sql:
+        columns = access.get_schema_catalog(start, end).column_names
+        plan = plan_query(args.sql, columns)
+        if plan is None:
+            raise RuntimeError('The query cannot run one partition at a time')
+
+    started = time.perf_counter()
+    if plan is not None:
+        _, error = access.execute_incremental(start, end, plan, budget=MemoryBudget(0))
+        if error:
+            raise RuntimeError(error)
+    else:
+        access.get_data_for_date_range(start, end, budget=MemoryBudget(0))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return elapsed_ms, access.stats.get('rows_loaded', 0), access.stats.get('process_workers', 0)
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description='Benchmark partition loading in worker processes')
+    parser.add_argument('--bucket', required=True, help='Bucket holding the dataset')
+    parser.add_argument('--base-path', default='csv-data/', help='Prefix of the CSV partitions')
+    parser.add_argument('--start', required=True, help='First day, YYYY-MM-DD')
+    parser.add_argument('--end', required=True, help='Last day, YYYY-MM-DD')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, os.cpu_count() or 1],
+                        help='Worker process counts to compare; 0 loads on threads')
+    parser.add_argument('--sql', default=None,
+                        help='Query to run one partition at a time instead of loading the range')
+    parser.add_argument('--runs', type=int, default=3, help='Timed runs per worker count')
+    args = parser.parse_args(argv)
+
+    print(f"{os.cpu_count()} CPUs")
+    medians = {}
+    for workers in args.workers:
+        # The first run starts the pool, so it is reported but not timed
+        elapsed_ms, rows, served = run_once(args, workers)
+        print(f"workers {workers}: warm-up {elapsed_ms:.0f} ms, {rows} rows, served by {served} processes")
+        timings = [run_once(args, workers)[0] for _ in range(args.runs)]
+        medians[workers] = statistics.median(timings)
+        print(f"workers {workers}: median {medians[workers]:.0f} ms "
+              f"(min {min(timings):.0f}, max {max(timings):.0f})")
+
+    baseline = medians.get(0)
+    if baseline:
+        print("\nSpeedup over threads:")
+        for workers, median in medians.items():
+            if workers:
+                print(f"  {workers} processes: {baseline / median:.2f}x")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())